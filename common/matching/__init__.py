@@ -0,0 +1,13 @@
+# Shared MDM matching for every domain (zones, vendors): compiled normalization, blocking,
+# a scorer registry driven by the rules YAML, batched fuzzy scoring, clustering and the
+# golden-record crosswalk.
+from common.matching.normalize import Normalizer, get_normalizer
+from common.matching.scoring import SCORERS, combine, get_scorer, prefilter_threshold, register_scorer
+from common.matching.config import FieldSpec, MatchConfig, load_match_config
+from common.matching.blocking import build_blocks, blocking_keys, parse_methods, soundex, MinHashLSH
+from common.matching.engine import (
+    Match, find_candidates, find_matches, match_against, match_records_against,
+    normalize_columns, rescore, score_matrices,
+)
+from common.matching.clusters import UnionFind, clusters_from_pairs
+from common.matching.xref import XrefResolver
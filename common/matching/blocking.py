@@ -0,0 +1,128 @@
+# Candidate generation for record matching.
+#
+# Every record is mapped to a set of blocking keys; only records that share a key are
+# compared. Keys from several methods can be combined ("token,prefix,minhash"): a pair
+# is a candidate if ANY method puts both records in the same block.
+import zlib
+import hashlib
+from collections import defaultdict
+
+import numpy as np
+
+BLOCKING_METHODS = ("token", "prefix", "phonetic", "minhash", "none")
+
+# Tokens too short or too common to be useful as blocks on their own
+MIN_TOKEN_LEN = 2
+DEFAULT_MAX_BLOCK_SIZE = 5000
+
+_SOUNDEX = {c: str(d) for d, letters in enumerate(["aeiouyhw", "bfpv", "cgjkqsxz", "dt", "l", "mn", "r"])
+            for c in letters}
+
+def soundex(token: str) -> str:
+    token = "".join(c for c in token.lower() if c.isalpha())
+    if not token:
+        return ""
+    out = [token[0].upper()]
+    last = _SOUNDEX.get(token[0], "")
+    for c in token[1:]:
+        code = _SOUNDEX.get(c, "")
+        if code and code != "0" and code != last:
+            out.append(code)
+        if c not in "hw":
+            last = code
+    return ("".join(out) + "000")[:4]
+
+def token_keys(name: str):
+    return {f"t:{t}" for t in name.split() if len(t) >= MIN_TOKEN_LEN}
+
+def prefix_keys(name: str, length: int = 4):
+    compact = name.replace(" ", "")
+    return {f"p:{compact[:length]}"} if compact else set()
+
+def phonetic_keys(name: str):
+    return {f"s:{soundex(t)}" for t in name.split() if len(t) >= MIN_TOKEN_LEN}
+
+class MinHashLSH:
+    # Character n-gram MinHash with banded LSH. Pairs whose n-gram Jaccard similarity
+    # exceeds roughly (1/bands) ** (1/rows) collide in at least one band. The default
+    # 16 bands x 4 rows puts that at ~0.5; short names share trigrams like "inc" or "llc",
+    # so a much lower threshold degrades into all-pairs candidate generation.
+    # Configured per domain under blocking.minhash in the match rules YAML.
+    PRIME = (1 << 61) - 1
+
+    def __init__(self, num_perm: int = 64, bands: int = 16, ngram: int = 3, seed: int = 7):
+        if num_perm % bands:
+            raise ValueError("num_perm must be divisible by bands")
+        self.num_perm, self.bands, self.rows, self.ngram = num_perm, bands, num_perm // bands, ngram
+        rng = np.random.default_rng(seed)
+        self.a = rng.integers(1, self.PRIME, size=num_perm, dtype=np.uint64)
+        self.b = rng.integers(0, self.PRIME, size=num_perm, dtype=np.uint64)
+
+    @property
+    def threshold(self) -> float:
+        return (1 / self.bands) ** (1 / self.rows)
+
+    def signature(self) -> str:
+        # Keys from a different shape never match: persisted indexes must be rebuilt
+        return f"minhash({self.num_perm}/{self.bands}/{self.ngram})"
+
+    def shingles(self, name: str):
+        padded = f" {name} "
+        n = self.ngram
+        grams = {padded[i:i + n] for i in range(max(1, len(padded) - n + 1))}
+        return np.fromiter((zlib.crc32(g.encode()) for g in grams), dtype=np.uint64)
+
+    def keys(self, name: str):
+        if not name:
+            return set()
+        h = self.shingles(name)
+        # (a*x + b) mod p for every permutation x shingle; uint64 wraparound is fine for hashing
+        sig = ((np.outer(self.a, h) + self.b[:, None]) % self.PRIME).min(axis=1)
+        return {
+            f"m:{band}:{hashlib.blake2b(sig[band * self.rows:(band + 1) * self.rows].tobytes(), digest_size=8).hexdigest()}"
+            for band in range(self.bands)
+        }
+
+def blocking_keys(name: str, methods, minhash: MinHashLSH = None, prefix_len: int = 4):
+    keys = set()
+    for m in methods:
+        if m == "token":
+            keys |= token_keys(name)
+        elif m == "prefix":
+            keys |= prefix_keys(name, prefix_len)
+        elif m == "phonetic":
+            keys |= phonetic_keys(name)
+        elif m == "minhash":
+            keys |= (minhash or MinHashLSH()).keys(name)
+        elif m == "none":
+            keys.add("all")
+        else:
+            raise ValueError(f"Unknown blocking method {m!r} (expected one of {BLOCKING_METHODS})")
+    return keys
+
+def parse_methods(spec) -> list:
+    if isinstance(spec, str):
+        spec = spec.split(",")
+    return [m.strip() for m in spec if m and m.strip()]
+
+def build_blocks(names, methods, max_block_size: int = DEFAULT_MAX_BLOCK_SIZE, prefix_len: int = 4,
+                 minhash: MinHashLSH = None):
+    """Return ({key: [record index, ...]}, [oversized keys]) for normalized names.
+
+    Blocks with a single record are dropped; blocks above max_block_size (stop-word
+    tokens like "llc") are dropped and reported, except the "none" catch-all block.
+    """
+    methods = parse_methods(methods)
+    if "minhash" in methods:
+        minhash = minhash or MinHashLSH()
+    blocks = defaultdict(list)
+    for i, name in enumerate(names):
+        if not name:
+            continue
+        for k in blocking_keys(name, methods, minhash, prefix_len):
+            blocks[k].append(i)
+
+    oversized = [k for k, v in blocks.items() if len(v) > max_block_size and k != "all"]
+    for k in oversized:
+        del blocks[k]
+    return {k: v for k, v in blocks.items() if len(v) > 1}, oversized
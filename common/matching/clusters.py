@@ -0,0 +1,48 @@
+# Entity clustering over matched pairs: union-find with path compression + union by size.
+from collections import defaultdict
+
+class UnionFind:
+    def __init__(self, items=()):
+        self.parent = {}
+        self.size = {}
+        for x in items:
+            self.add(x)
+
+    def add(self, x):
+        if x not in self.parent:
+            self.parent[x] = x
+            self.size[x] = 1
+
+    def find(self, x):
+        self.add(x)
+        root = x
+        while self.parent[root] != root:
+            root = self.parent[root]
+        # Path compression: point every node on the path straight at the root
+        while self.parent[x] != root:
+            self.parent[x], x = root, self.parent[x]
+        return root
+
+    def union(self, a, b):
+        ra, rb = self.find(a), self.find(b)
+        if ra == rb:
+            return ra
+        if self.size[ra] < self.size[rb]:
+            ra, rb = rb, ra
+        self.parent[rb] = ra
+        self.size[ra] += self.size[rb]
+        return ra
+
+    def groups(self):
+        # {root: sorted members} for every cluster with more than one member
+        out = defaultdict(list)
+        for x in self.parent:
+            out[self.find(x)].append(x)
+        return {r: sorted(m) for r, m in out.items() if len(m) > 1}
+
+def clusters_from_pairs(pairs):
+    """Connected components of (a, b) pairs, so A~B and B~C end up in one cluster."""
+    uf = UnionFind()
+    for a, b in pairs:
+        uf.union(a, b)
+    return list(uf.groups().values())
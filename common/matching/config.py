@@ -0,0 +1,62 @@
+# Match rules YAML -> MatchConfig, with the same semantics for every domain.
+#
+#   thresholds:    auto_merge / steward_review (zones may instead give
+#                  duplicate_detection.similarity_threshold as the review threshold)
+#   fields:        [{name, weight, method, column?}]; method is a scorer in scoring.SCORERS
+#   normalization: {lowercase, strip_punctuation}, applied to every field
+#   duplicate_detection.block_on: columns a pair must share before it is scored
+#   blocking.minhash: {num_perm, bands, ngram} LSH shape; candidates need an n-gram
+#                  Jaccard of roughly (1/bands) ** (bands/num_perm)
+import yaml
+
+from common.matching.blocking import MinHashLSH
+from common.matching.normalize import get_normalizer
+from common.matching.scoring import get_scorer
+
+class FieldSpec:
+    def __init__(self, spec: dict):
+        self.name = spec["name"]
+        self.column = spec.get("column", self.name)
+        self.weight = float(spec.get("weight", 1.0))
+        self.method = spec.get("method", "string_similarity")
+        self.scorer = get_scorer(self.method)
+
+    def __repr__(self):
+        return f"FieldSpec({self.name!r}, weight={self.weight}, method={self.method!r})"
+
+class MatchConfig:
+    def __init__(self, spec: dict):
+        self.spec = spec
+        self.fields = [FieldSpec(f) for f in spec.get("fields", [])]
+        if not self.fields:
+            raise ValueError("match rules define no fields")
+        self.weights = {f.name: f.weight for f in self.fields}
+
+        th = spec.get("thresholds", {})
+        dd = spec.get("duplicate_detection", {})
+        self.review_threshold = float(th.get("steward_review", dd.get("similarity_threshold", 0.0)))
+        self.auto_threshold = float(th["auto_merge"]) if "auto_merge" in th else None
+        self.block_on = list(dd.get("block_on", []))
+        self.normalization = spec.get("normalization", {})
+        self.normalizer = get_normalizer(self.normalization)
+        self.minhash = dict(spec.get("blocking", {}).get("minhash") or {})
+
+    @property
+    def primary(self) -> FieldSpec:
+        # Candidate generation runs on the heaviest fuzzy field; the rest are rescored per pair
+        fuzzy = [f for f in self.fields if f.method != "exact"] or self.fields
+        return max(fuzzy, key=lambda f: f.weight)
+
+    def minhash_lsh(self) -> MinHashLSH:
+        return MinHashLSH(**self.minhash)
+
+    def recommendation(self, confidence: float) -> str:
+        if self.auto_threshold is not None and confidence >= self.auto_threshold:
+            return "AUTO_MERGE"
+        if confidence >= self.review_threshold:
+            return "STEWARD_REVIEW"
+        return "MANUAL"
+
+def load_match_config(path: str) -> MatchConfig:
+    with open(path, "r", encoding="utf-8") as f:
+        return MatchConfig(yaml.safe_load(f))
@@ -0,0 +1,189 @@
+# Blocked fuzzy matching: normalize once, generate candidate blocks, score each block
+# with rapidfuzz's batched cdist (C++, releases the GIL) and fan blocks out to processes.
+import os
+from collections import defaultdict, namedtuple
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from common.matching.blocking import build_blocks, DEFAULT_MAX_BLOCK_SIZE
+from common.matching.scoring import StringSimilarity, combine, get_scorer, prefilter_threshold
+
+# Kept for callers that imported the blend weights from here
+JW_WEIGHT = StringSimilarity.JW_WEIGHT
+LEV_WEIGHT = StringSimilarity.LEV_WEIGHT
+
+# Blocks are grouped into tasks of roughly this many pairwise comparisons
+TASK_COMPARISONS = 2_000_000
+
+# left/right: record indexes; fields: {field: score}; parts: scorer components (rationale)
+Match = namedtuple("Match", "left right confidence fields parts")
+
+def score_matrices(left, right, min_confidence: float = 0.0):
+    """Blended string_similarity matrix plus its two components for two lists of names."""
+    conf, parts = get_scorer("string_similarity").matrix(left, right, min_confidence)
+    return conf, parts["lev_ratio"], parts["jaro_winkler"]
+
+def _pick(parts, x, y):
+    return {k: float(v[x, y]) for k, v in parts.items()}
+
+def match_against(left, right, min_confidence: float = 0.8, scorer: str = "string_similarity"):
+    """Score every left name against every right name (e.g. changed records vs. the
+    candidates that share a blocking key with them).
+
+    Returns [(left index, right index, score, parts)] for pairs >= min_confidence.
+    """
+    if not left or not right:
+        return []
+    scores, parts = get_scorer(scorer).matrix(left, right, min_confidence)
+    a, b = np.nonzero(scores >= min_confidence)
+    return [(x, y, float(scores[x, y]), _pick(parts, x, y)) for x, y in zip(a.tolist(), b.tolist())]
+
+def _score_blocks(task):
+    # task: (names, [index list per block], min_confidence, scorer) -> [(i, j, score, parts)]
+    names, blocks, min_conf, scorer = task
+    scorer = get_scorer(scorer)
+    out = []
+    for idx in blocks:
+        block_names = [names[i] for i in idx]
+        scores, parts = scorer.matrix(block_names, block_names, min_conf)
+        a, b = np.nonzero(np.triu(scores >= min_conf, k=1))
+        for x, y in zip(a.tolist(), b.tolist()):
+            i, j = idx[x], idx[y]
+            out.append((min(i, j), max(i, j), float(scores[x, y]), _pick(parts, x, y)))
+    return out
+
+def _plan_tasks(blocks):
+    tasks, current, cost = [], [], 0
+    for idx in sorted(blocks.values(), key=len, reverse=True):
+        current.append(idx)
+        cost += len(idx) * len(idx)
+        if cost >= TASK_COMPARISONS:
+            tasks.append(current)
+            current, cost = [], 0
+    if current:
+        tasks.append(current)
+    return tasks
+
+def find_candidates(names, blocking="token,prefix", min_confidence: float = 0.8,
+                    workers: int = None, max_block_size: int = DEFAULT_MAX_BLOCK_SIZE,
+                    scorer: str = "string_similarity", minhash=None):
+    """Candidate pairs among already-normalized names.
+
+    Returns ({(i, j): (score, parts)} with i < j, stats dict).
+    """
+    workers = workers or os.cpu_count() or 1
+    blocks, oversized = build_blocks(names, blocking, max_block_size=max_block_size, minhash=minhash)
+    tasks = _plan_tasks(blocks)
+
+    if workers > 1 and len(tasks) > 1:
+        # Each task ships only the names it needs
+        payloads = []
+        for t in tasks:
+            used = sorted({i for idx in t for i in idx})
+            local = {i: n for n, i in enumerate(used)}
+            payloads.append((used, ([names[i] for i in used], [[local[i] for i in idx] for idx in t],
+                                    min_confidence, scorer)))
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = pool.map(_score_blocks, [p for _, p in payloads])
+            scored = []
+            for (used, _), res in zip(payloads, results):
+                scored.extend((used[i], used[j], s, p) for i, j, s, p in res)
+    else:
+        scored = [row for t in tasks for row in _score_blocks((names, t, min_confidence, scorer))]
+
+    pairs = {}
+    for i, j, score, parts in scored:
+        if i == j:
+            continue
+        pairs[(i, j)] = (score, parts)
+
+    stats = {
+        "records": len(names),
+        "blocks": len(blocks),
+        "oversized_blocks_skipped": len(oversized),
+        "comparisons": int(sum(len(v) * (len(v) - 1) // 2 for v in blocks.values())),
+        "candidates": len(pairs),
+    }
+    return pairs, stats
+
+def normalize_columns(config, columns):
+    # {field name: normalized list} for every configured field, one pass per column
+    return {f.name: config.normalizer.list(columns[f.column]) for f in config.fields}
+
+def rescore(config, left_norm, right_norm, candidates):
+    """Combine the primary-field scores of candidate pairs with every other field.
+
+    candidates: {(left i, right j): (primary score, parts)}. Returns [Match] with
+    confidence >= config.review_threshold.
+    """
+    if not candidates:
+        return []
+    keys = list(candidates)
+    li = np.fromiter((i for i, _ in keys), dtype=np.int64, count=len(keys))
+    ri = np.fromiter((j for _, j in keys), dtype=np.int64, count=len(keys))
+    primary = config.primary.name
+    field_scores = {primary: np.fromiter((candidates[k][0] for k in keys), dtype=np.float32, count=len(keys))}
+    for f in config.fields:
+        if f.name == primary:
+            continue
+        a = [left_norm[f.name][i] for i in li]
+        b = [right_norm[f.name][j] for j in ri]
+        field_scores[f.name], _ = f.scorer.pairwise(a, b)
+
+    conf = combine(field_scores, config.weights)
+    keep = np.nonzero(conf >= config.review_threshold)[0]
+    return [Match(int(li[k]), int(ri[k]), float(conf[k]),
+                  {name: (None if np.isnan(s[k]) else float(s[k])) for name, s in field_scores.items()},
+                  candidates[keys[k]][1])
+            for k in keep.tolist()]
+
+def find_matches(config, columns, blocking="token,prefix", workers: int = None,
+                 max_block_size: int = DEFAULT_MAX_BLOCK_SIZE, full_group_max: int = 0):
+    """Duplicate pairs within one set of records, scored with the configured fields.
+
+    columns: {column name: raw values} covering every field (and config.block_on).
+    Records only pair up within the same config.block_on group; groups of at most
+    full_group_max records are compared all-vs-all instead of blocked.
+    Returns ([Match] with left < right, stats).
+    """
+    norm = normalize_columns(config, columns)
+    primary = config.primary
+    pre = prefilter_threshold(config.weights, primary.name, config.review_threshold)
+
+    n = len(norm[primary.name])
+    if config.block_on:
+        keys = list(zip(*(config.normalizer.list(columns[c]) for c in config.block_on)))
+        groups = defaultdict(list)
+        for i, k in enumerate(keys):
+            groups[k].append(i)
+        groups = [g for g in groups.values() if len(g) > 1]
+    else:
+        groups = [list(range(n))]
+
+    minhash = config.minhash_lsh()
+    candidates, stats = {}, defaultdict(int)
+    for idx in groups:
+        names = [norm[primary.name][i] for i in idx]
+        method = "none" if len(idx) <= full_group_max else blocking
+        pairs, st = find_candidates(names, method, pre, workers, max_block_size, scorer=primary.method,
+                                    minhash=minhash)
+        for (a, b), hit in pairs.items():
+            candidates[(idx[a], idx[b])] = hit
+        for k, v in st.items():
+            stats[k] += v
+    stats["groups"] = len(groups)
+    stats["prefilter_threshold"] = round(pre, 4)
+
+    matches = rescore(config, norm, norm, candidates)
+    stats["matches"] = len(matches)
+    return sorted(matches, key=lambda m: (m.left, m.right)), dict(stats)
+
+def match_records_against(config, left_columns, right_columns):
+    """Every left record vs every right record, scored with the configured fields."""
+    left_norm = normalize_columns(config, left_columns)
+    right_norm = normalize_columns(config, right_columns)
+    primary = config.primary
+    pre = prefilter_threshold(config.weights, primary.name, config.review_threshold)
+    hits = match_against(left_norm[primary.name], right_norm[primary.name], pre, scorer=primary.method)
+    return rescore(config, left_norm, right_norm, {(x, y): (s, p) for x, y, s, p in hits})
@@ -0,0 +1,68 @@
+# Text normalization shared by every matching domain.
+#
+# The config is the `normalization:` block of a match rules YAML. Patterns are compiled
+# once per config (get_normalizer is cached) and whole columns are normalized with
+# pyarrow compute kernels over their distinct values only.
+import re
+from functools import lru_cache
+
+import pyarrow as pa
+import pyarrow.compute as pc
+
+class Normalizer:
+    def __init__(self, lowercase: bool = True, strip_punctuation: bool = True,
+                 collapse_whitespace: bool = True):
+        self.lowercase = lowercase
+        self.strip_punctuation = strip_punctuation
+        self.collapse_whitespace = collapse_whitespace
+        # Without lowercasing, upper-case letters must survive punctuation stripping
+        self.punct_pattern = r"[^a-z0-9\s]" if lowercase else r"[^A-Za-z0-9\s]"
+        self._punct = re.compile(self.punct_pattern)
+        self._space = re.compile(r"\s+")
+
+    def __call__(self, s) -> str:
+        s = "" if s is None or s != s else str(s)  # None / NaN -> ""
+        if self.lowercase:
+            s = s.lower()
+        if self.strip_punctuation:
+            s = self._punct.sub("", s)
+        if self.collapse_whitespace:
+            s = self._space.sub(" ", s)
+        return s.strip()
+
+    def array(self, values) -> pa.Array:
+        """Normalize a whole column (list, numpy/pandas, pyarrow) -> pyarrow string array."""
+        if isinstance(values, pa.ChunkedArray):
+            values = values.combine_chunks()
+        if not isinstance(values, pa.Array):
+            values = pa.array(values, type=pa.string(), from_pandas=True)
+        elif not pa.types.is_string(values.type) and not pa.types.is_dictionary(values.type):
+            values = pc.cast(values, pa.string())
+
+        # Work on the distinct values only, then expand back through the indices
+        encoded = values if pa.types.is_dictionary(values.type) else pc.dictionary_encode(values)
+        d = pc.cast(encoded.dictionary, pa.string())
+        if self.lowercase:
+            d = pc.utf8_lower(d)
+        if self.strip_punctuation:
+            d = pc.replace_substring_regex(d, pattern=self.punct_pattern, replacement="")
+        if self.collapse_whitespace:
+            d = pc.replace_substring_regex(d, pattern=r"\s+", replacement=" ")
+        d = pc.utf8_trim_whitespace(d)
+        return pc.fill_null(pc.take(d, encoded.indices), "")
+
+    def list(self, values) -> list:
+        return self.array(values).to_pylist()
+
+@lru_cache(maxsize=None)
+def _normalizer(lowercase: bool, strip_punctuation: bool, collapse_whitespace: bool) -> Normalizer:
+    return Normalizer(lowercase, strip_punctuation, collapse_whitespace)
+
+def get_normalizer(cfg=None, **overrides) -> Normalizer:
+    # Accepts the YAML block ({lowercase, strip_punctuation}) and the older strip_punct key
+    cfg = {**(cfg or {}), **overrides}
+    if "strip_punct" in cfg:
+        cfg.setdefault("strip_punctuation", cfg.pop("strip_punct"))
+    return _normalizer(bool(cfg.get("lowercase", True)),
+                       bool(cfg.get("strip_punctuation", True)),
+                       bool(cfg.get("collapse_whitespace", True)))
@@ -0,0 +1,121 @@
+# Scorer registry + weighted combiner.
+#
+# A rules YAML lists fields as {name, weight, method}; `method` names a scorer here.
+# Every scorer works on already-normalized values in two shapes:
+#   matrix(left, right, score_cutoff) -> (scores[len(left), len(right)], parts)
+#   pairwise(a, b)                    -> (scores[len(a)], parts)       (a[k] vs b[k])
+# Scores are 0..1 float32; NaN means "no evidence" (a side is empty) and is left out of
+# the weighted combination. `parts` are named component scores kept for rationale.
+import numpy as np
+from rapidfuzz import process
+from rapidfuzz.distance import JaroWinkler
+from rapidfuzz.fuzz import ratio
+
+SCORERS = {}
+
+def register_scorer(name: str):
+    def wrap(cls):
+        SCORERS[name] = cls()
+        return cls
+    return wrap
+
+def get_scorer(name: str):
+    try:
+        return SCORERS[name]
+    except KeyError:
+        raise ValueError(f"Unknown match method {name!r} (expected one of {sorted(SCORERS)})") from None
+
+def _empty_mask(values):
+    return np.fromiter((not v for v in values), dtype=bool, count=len(values))
+
+def _mark_missing_pairwise(scores, a, b):
+    scores[_empty_mask(a) | _empty_mask(b)] = np.nan
+    return scores
+
+def _mark_missing_matrix(scores, left, right):
+    scores[_empty_mask(left)[:, None] | _empty_mask(right)[None, :]] = np.nan
+    return scores
+
+class _RapidfuzzScorer:
+    # One rapidfuzz scorer, normalized to 0..1
+    scorer = None
+    scale = 1.0
+
+    def matrix(self, left, right, score_cutoff: float = 0.0, workers: int = 1):
+        scores = process.cdist(left, right, scorer=self.scorer, score_cutoff=score_cutoff * self.scale or None,
+                               dtype=np.float32, workers=workers) / self.scale
+        return _mark_missing_matrix(scores, left, right), {}
+
+    def pairwise(self, a, b):
+        scores = process.cpdist(a, b, scorer=self.scorer, dtype=np.float32) / self.scale
+        return _mark_missing_pairwise(scores, a, b), {}
+
+@register_scorer("indel_ratio")
+class IndelRatio(_RapidfuzzScorer):
+    # Normalized Indel similarity; same scale as difflib.SequenceMatcher.ratio()
+    scorer = staticmethod(ratio)
+    scale = 100.0
+
+@register_scorer("jaro_winkler")
+class JaroWinklerScorer(_RapidfuzzScorer):
+    scorer = staticmethod(JaroWinkler.normalized_similarity)
+
+@register_scorer("string_similarity")
+class StringSimilarity:
+    # Blend of Jaro-Winkler (prefix-friendly) and Levenshtein/Indel ratio (edit distance)
+    JW_WEIGHT = 0.55
+    LEV_WEIGHT = 0.45
+
+    def _blend(self, lev, jw, lev_cutoff):
+        conf = np.clip(self.JW_WEIGHT * jw + self.LEV_WEIGHT * lev, 0.0, 1.0)
+        if lev_cutoff > 0:
+            conf[lev == 0] = 0.0
+        return conf
+
+    def matrix(self, left, right, score_cutoff: float = 0.0, workers: int = 1):
+        # Pairs whose ratio alone cannot reach score_cutoff (even with a perfect
+        # Jaro-Winkler) are cut off inside rapidfuzz and come back as 0
+        lev_cutoff = max(0.0, (score_cutoff - self.JW_WEIGHT) / self.LEV_WEIGHT) * 100
+        lev = process.cdist(left, right, scorer=ratio, score_cutoff=lev_cutoff,
+                            dtype=np.float32, workers=workers) / 100.0
+        jw = process.cdist(left, right, scorer=JaroWinkler.normalized_similarity,
+                           dtype=np.float32, workers=workers)
+        conf = _mark_missing_matrix(self._blend(lev, jw, lev_cutoff), left, right)
+        return conf, {"lev_ratio": lev, "jaro_winkler": jw}
+
+    def pairwise(self, a, b):
+        lev = process.cpdist(a, b, scorer=ratio, dtype=np.float32) / 100.0
+        jw = process.cpdist(a, b, scorer=JaroWinkler.normalized_similarity, dtype=np.float32)
+        conf = _mark_missing_pairwise(self._blend(lev, jw, 0.0), a, b)
+        return conf, {"lev_ratio": lev, "jaro_winkler": jw}
+
+@register_scorer("exact")
+class Exact:
+    def matrix(self, left, right, score_cutoff: float = 0.0, workers: int = 1):
+        scores = (np.asarray(left, dtype=object)[:, None] == np.asarray(right, dtype=object)[None, :])
+        return _mark_missing_matrix(scores.astype(np.float32), left, right), {}
+
+    def pairwise(self, a, b):
+        scores = (np.asarray(a, dtype=object) == np.asarray(b, dtype=object)).astype(np.float32)
+        return _mark_missing_pairwise(scores, a, b), {}
+
+def combine(field_scores: dict, weights: dict):
+    """Weighted mean of per-field score arrays, renormalized over the fields that have
+    evidence (non-NaN) for each pair. Pairs with no evidence at all score 0."""
+    num = den = 0.0
+    for name, scores in field_scores.items():
+        w = float(weights[name])
+        have = ~np.isnan(scores)
+        num = num + w * np.where(have, scores, 0.0)
+        den = den + w * have
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return np.where(den > 0, num / np.where(den > 0, den, 1.0), 0.0).astype(np.float32)
+
+def prefilter_threshold(weights: dict, primary: str, min_confidence: float) -> float:
+    """Lowest primary-field score that can still reach min_confidence once the other
+    fields are added: assumes they all score 1.0 (or are missing, which renormalizes)."""
+    total = float(sum(weights.values()))
+    w = float(weights[primary])
+    if total <= 0 or w <= 0:
+        return 0.0
+    return max(0.0, min(min_confidence, (min_confidence * total - (total - w)) / w))
@@ -0,0 +1,84 @@
+# Golden-record resolution over the mdm.vendor_xref crosswalk (sql/day9_vendor_xref.sql).
+#
+#   resolver = XrefResolver.from_db(conn)
+#   resolver.resolve(17)                      -> golden vendor_id for one id
+#   resolver.resolve_many(trips["VendorID"])  -> vectorized remap of a whole column
+#
+# Ids that were never merged resolve to themselves.
+import numpy as np
+
+# Above this max id the dense lookup table gets wasteful; fall back to a sorted search
+DENSE_MAX_ID = 50_000_000
+
+class XrefResolver:
+    def __init__(self, mapping=None):
+        self.parent = {}
+        self._lut = None
+        for src, golden in (mapping or {}).items():
+            self.add(src, golden)
+
+    @classmethod
+    def from_db(cls, conn, table: str = "mdm.vendor_xref"):
+        with conn.cursor() as cur:
+            cur.execute(f"SELECT source_vendor_id, golden_vendor_id FROM {table};")
+            return cls(dict(cur.fetchall()))
+
+    def add(self, source_id: int, golden_id: int):
+        source_id, golden_id = int(source_id), int(golden_id)
+        if source_id != golden_id:
+            self.parent[source_id] = golden_id
+            self._lut = None
+
+    def resolve(self, vendor_id: int) -> int:
+        root, seen = vendor_id, set()
+        while root in self.parent and root not in seen:
+            seen.add(root)
+            root = self.parent[root]
+        # Path compression: later lookups along this chain are one hop
+        for node in seen:
+            if node != root:
+                self.parent[node] = root
+        return root
+
+    def flattened(self):
+        return {src: self.resolve(src) for src in list(self.parent)}
+
+    def _tables(self):
+        if self._lut is None:
+            flat = self.flattened()
+            src = np.fromiter(flat.keys(), dtype=np.int64, count=len(flat))
+            dst = np.fromiter(flat.values(), dtype=np.int64, count=len(flat))
+            max_id = int(src.max()) if len(src) else -1
+            if max_id <= DENSE_MAX_ID:
+                lut = np.arange(max_id + 1, dtype=np.int64)
+                lut[src] = dst
+                self._lut = ("dense", lut)
+            else:
+                order = np.argsort(src)
+                self._lut = ("sorted", (src[order], dst[order]))
+        return self._lut
+
+    def resolve_many(self, vendor_ids):
+        """Remap an array-like of ids (numpy, pandas Series, list) in one vectorized pass.
+
+        Float input keeps NaN as NaN; the result has the input's shape.
+        """
+        arr = np.asarray(vendor_ids)
+        if arr.dtype.kind == "f":
+            valid = ~np.isnan(arr)
+            out = arr.copy()
+            out[valid] = self.resolve_many(arr[valid].astype(np.int64))
+            return out
+
+        ids = arr.astype(np.int64, copy=False)
+        out = ids.copy()
+        kind, table = self._tables()
+        if kind == "dense":
+            inside = (ids >= 0) & (ids < len(table))
+            out[inside] = table[ids[inside]]
+        else:
+            src, dst = table
+            pos = np.searchsorted(src, ids).clip(max=max(len(src) - 1, 0))
+            hit = (src[pos] == ids) if len(src) else np.zeros(ids.shape, dtype=bool)
+            out[hit] = dst[pos[hit]]
+        return out.astype(arr.dtype, copy=False) if arr.dtype.kind in "iu" else out
@@ -0,0 +1,62 @@
+"""Parallel, dependency-ordered materialized view refresh.
+
+Uses the SQL side in sql/00_admin/003_mv_refresh_subsystem.sql:
+analytics.mv_refresh_plan() gives each MV a dependency level; MVs of one level are
+independent, so they refresh concurrently on separate pooled connections, one level after
+the other. analytics.refresh_mv() does the skip-if-unchanged check, the CONCURRENTLY
+refresh and the duration log row.
+
+Usage:
+    pool = ThreadedConnectionPool(1, workers, dsn)
+    results = refresh_all(pool, workers=4)      # [(mv, level, status, seconds)]
+"""
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+def refresh_plan(conn, schema: str = "analytics"):
+    # {level: [mv, ...]} in refresh order
+    with conn.cursor() as cur:
+        cur.execute("SELECT mv::text, level FROM analytics.mv_refresh_plan(%s) ORDER BY level, mv::text;", (schema,))
+        levels = defaultdict(list)
+        for mv, level in cur.fetchall():
+            levels[level].append(mv)
+    return dict(sorted(levels.items()))
+
+def refresh_one(pool, mv: str, force: bool = False, run_id: str = None):
+    conn = pool.getconn()
+    try:
+        conn.autocommit = True  # each MV refreshes (and logs) in its own transaction
+        t0 = time.time()
+        with conn.cursor() as cur:
+            cur.execute("SELECT analytics.refresh_mv(%s::regclass, %s, %s);", (mv, force, run_id))
+            status = cur.fetchone()[0]
+        return status, time.time() - t0
+    finally:
+        pool.putconn(conn)
+
+def refresh_all(pool, schema: str = "analytics", workers: int = 4, force: bool = False, run_id: str = None):
+    conn = pool.getconn()
+    try:
+        conn.autocommit = True
+        levels = refresh_plan(conn, schema)
+    finally:
+        pool.putconn(conn)
+
+    results = []
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as ex:
+        for level, mvs in levels.items():
+            # a level starts only after every MV it reads from has been refreshed
+            futures = {mv: ex.submit(refresh_one, pool, mv, force, run_id) for mv in mvs}
+            errors = []
+            for mv, fut in futures.items():
+                try:
+                    status, seconds = fut.result()
+                except Exception as e:
+                    errors.append(f"{mv}: {e}")
+                    continue
+                results.append((mv, level, status, seconds))
+                print(f"level {level} {mv}: {status} ({seconds:.2f}s)")
+            if errors:
+                raise RuntimeError("MV refresh failed: " + "; ".join(errors))
+    return results
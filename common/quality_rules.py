@@ -0,0 +1,424 @@
+"""Compile governance/quality_rules.yaml into executable predicates.
+
+One rule set, three backends:
+  - pyarrow / pandas: vectorized boolean masks (True = row passes)
+  - Spark: a single combined Column for DataFrame.filter
+  - SQL: a WHERE clause
+
+Usage:
+    rules = load_ruleset(stage="validated").for_columns(table.schema.names)
+    ok = rules.arrow_valid(batch)              # pa.BooleanArray
+    df = df.filter(rules.spark_condition())    # pyspark
+    where = rules.sql_where()                  # "(...) AND (...)"
+
+    python -m common.quality_rules --stage validated --backend sql
+"""
+import os
+import sys
+import argparse
+import operator
+from functools import lru_cache
+
+import yaml
+import numpy as np
+
+DEFAULT_RULES_PATH = os.getenv("QUALITY_RULES", "governance/quality_rules.yaml")
+
+# Python operators work on pandas Series, pyarrow Expressions and Spark Columns alike
+COMPARE_OPS = {
+    "<": operator.lt, "<=": operator.le, ">": operator.gt, ">=": operator.ge,
+    "=": operator.eq, "!=": operator.ne,
+}
+
+# Dense bitmaps are used for integer lookup keys up to this value; above it we
+# fall back to a hash set.
+DENSE_LOOKUP_MAX_KEY = 10_000_000
+
+def read_text(path: str) -> str:
+    if path.startswith("s3://"):
+        import boto3
+        bucket, _, key = path[len("s3://"):].partition("/")
+        obj = boto3.client("s3").get_object(Bucket=bucket, Key=key)
+        return obj["Body"].read().decode("utf-8")
+    with open(path, "r", encoding="utf-8") as f:
+        return f.read()
+
+@lru_cache(maxsize=None)
+def lookup_keys(csv_path: str, key: str):
+    # Cached per (file, key): every stage/batch reuses the same key set
+    import pandas as pd
+    keys = pd.read_csv(csv_path, usecols=[key])[key].dropna()
+    try:
+        return np.unique(keys.astype(np.int64).to_numpy())
+    except (TypeError, ValueError):
+        return np.unique(keys.astype(str).to_numpy())
+
+@lru_cache(maxsize=None)
+def dense_lookup(csv_path: str, key: str):
+    keys = lookup_keys(csv_path, key)
+    if keys.dtype.kind != "i" or not len(keys) or keys.min() < 0 or keys.max() > DENSE_LOOKUP_MAX_KEY:
+        return None
+    member = np.zeros(int(keys.max()) + 1, dtype=bool)
+    member[keys] = True
+    return member
+
+@lru_cache(maxsize=None)
+def arrow_value_set(csv_path: str, key: str):
+    import pyarrow as pa
+    return pa.array(lookup_keys(csv_path, key))
+
+def sql_literal(v) -> str:
+    if isinstance(v, str):
+        return "'" + v.replace("'", "''") + "'"
+    return repr(v)
+
+class Rule:
+    def __init__(self, spec: dict, base_dir: str = "."):
+        self.spec = spec
+        self.name = spec["name"]
+        self.type = spec["type"]
+        self.severity = spec.get("severity", "medium")
+        # bool, or {stage: bool, default: bool} when stages treat NULLs differently
+        allow_null = spec.get("allow_null", True)
+        self.allow_null_by_stage = dict(allow_null) if isinstance(allow_null, dict) else {}
+        self.allow_null = bool(self.allow_null_by_stage.get("default", True) if self.allow_null_by_stage
+                               else allow_null)
+        self.stages = list(spec.get("stages", []))
+        self.base_dir = base_dir
+
+        if self.type == "compare_columns":
+            if spec["op"] not in COMPARE_OPS:
+                raise ValueError(f"Rule {self.name}: unsupported op {spec['op']!r}")
+            self.columns = [spec["column_a"], spec["column_b"]]
+        elif self.type == "numeric_range":
+            if spec.get("min") is None and spec.get("max") is None:
+                raise ValueError(f"Rule {self.name}: numeric_range needs min and/or max")
+            self.columns = [spec["column"]]
+        elif self.type == "fk_membership":
+            self.columns = [spec["column"]]
+        else:
+            raise ValueError(f"Rule {self.name}: unknown rule type {self.type!r}")
+
+        self.sample_columns = list(spec.get("sample_columns", self.columns))
+
+    def __repr__(self):
+        return f"Rule({self.name!r}, {self.type!r})"
+
+    # ---- lookup (fk_membership) ----
+
+    def _lookup_path(self):
+        path = self.spec["lookup_csv"]
+        if os.path.isabs(path) or path.startswith("s3://") or os.path.exists(path):
+            return path
+        return os.path.join(self.base_dir, path)
+
+    # ---- pyarrow ----
+
+    def arrow_valid(self, batch):
+        import pyarrow as pa
+        import pyarrow.compute as pc
+
+        if self.type == "compare_columns":
+            a, b = (batch.column(c) for c in self.columns)
+            fn = {
+                "<": pc.less, "<=": pc.less_equal, ">": pc.greater, ">=": pc.greater_equal,
+                "=": pc.equal, "!=": pc.not_equal,
+            }[self.spec["op"]]
+            return pc.fill_null(fn(a, b), self.allow_null)
+
+        x = batch.column(self.columns[0])
+        if self.type == "numeric_range":
+            ok = None
+            if self.spec.get("min") is not None:
+                ok = pc.greater_equal(x, self.spec["min"])
+            if self.spec.get("max") is not None:
+                hi = pc.less_equal(x, self.spec["max"])
+                ok = hi if ok is None else pc.and_kleene(ok, hi)
+            return pc.fill_null(ok, self.allow_null)
+
+        # fk_membership
+        path, key = self._lookup_path(), self.spec["lookup_key"]
+        member = dense_lookup(path, key)
+        if member is None:
+            found = pc.is_in(x, value_set=arrow_value_set(path, key))
+            return pc.if_else(pc.is_valid(x), found, self.allow_null)
+        keys = pc.cast(pc.fill_null(x, -1), pa.int64(), safe=False).to_numpy(zero_copy_only=False)
+        in_range = (keys >= 0) & (keys < len(member))
+        ok = np.zeros(len(keys), dtype=bool)
+        ok[in_range] = member[keys[in_range]]
+        if self.allow_null:
+            ok |= ~pc.is_valid(x).to_numpy(zero_copy_only=False)
+        return pa.array(ok)
+
+    def arrow_expression(self):
+        # pyarrow.dataset filter expression (predicate pushdown)
+        import pyarrow.compute as pc
+
+        fields = [pc.field(c) for c in self.columns]
+        if self.type == "compare_columns":
+            a, b = fields
+            expr = COMPARE_OPS[self.spec["op"]](a, b)
+        elif self.type == "numeric_range":
+            x = fields[0]
+            parts = []
+            if self.spec.get("min") is not None:
+                parts.append(x >= self.spec["min"])
+            if self.spec.get("max") is not None:
+                parts.append(x <= self.spec["max"])
+            expr = parts[0] if len(parts) == 1 else parts[0] & parts[1]
+        else:
+            expr = fields[0].isin(arrow_value_set(self._lookup_path(), self.spec["lookup_key"]))
+
+        if self.allow_null:
+            for f in fields:
+                expr = expr | f.is_null()
+        else:
+            for f in fields:
+                expr = expr & f.is_valid()
+        return expr
+
+    # ---- pandas ----
+
+    def pandas_valid(self, df):
+        import pandas as pd
+
+        nulls = None
+        for c in self.columns:
+            n = df[c].isna()
+            nulls = n if nulls is None else (nulls | n)
+
+        if self.type == "compare_columns":
+            a, b = (df[c] for c in self.columns)
+            ok = COMPARE_OPS[self.spec["op"]](a, b)
+        elif self.type == "numeric_range":
+            x = df[self.columns[0]]
+            ok = pd.Series(True, index=df.index)
+            if self.spec.get("min") is not None:
+                ok &= x >= self.spec["min"]
+            if self.spec.get("max") is not None:
+                ok &= x <= self.spec["max"]
+        else:
+            import pyarrow as pa
+            arr = pa.array(df[self.columns[0]], from_pandas=True)
+            batch = pa.RecordBatch.from_arrays([arr], names=[self.columns[0]])
+            return pd.Series(self.arrow_valid(batch).to_numpy(zero_copy_only=False), index=df.index)
+
+        ok = ok.fillna(False).astype(bool)
+        return (ok | nulls) if self.allow_null else (ok & ~nulls)
+
+    # ---- Spark ----
+
+    def spark_condition(self):
+        from pyspark.sql import functions as F
+
+        cols = [F.col(c) for c in self.columns]
+        if self.type == "compare_columns":
+            a, b = cols
+            cond = COMPARE_OPS[self.spec["op"]](a, b)
+        elif self.type == "numeric_range":
+            x = cols[0]
+            cond = None
+            if self.spec.get("min") is not None:
+                cond = x >= F.lit(self.spec["min"])
+            if self.spec.get("max") is not None:
+                hi = x <= F.lit(self.spec["max"])
+                cond = hi if cond is None else (cond & hi)
+        else:
+            # Spark rewrites large IN lists into an InSet hash lookup evaluated in-task,
+            # equivalent to a broadcast hash semi-join without the extra exchange.
+            keys = lookup_keys(self._lookup_path(), self.spec["lookup_key"])
+            cond = cols[0].isin([k.item() for k in keys])
+
+        nulls = [c.isNull() for c in cols]
+        if self.allow_null:
+            for n in nulls:
+                cond = cond | n
+            return F.coalesce(cond, F.lit(True))
+        for c in cols:
+            cond = cond & c.isNotNull()
+        return F.coalesce(cond, F.lit(False))
+
+    # ---- SQL ----
+
+    def sql_condition(self, alias: str = None) -> str:
+        q = (lambda c: f"{alias}.{c}") if alias else (lambda c: c)
+        cols = [q(c) for c in self.columns]
+
+        if self.type == "compare_columns":
+            cond = f"{cols[0]} {self.spec['op']} {cols[1]}"
+        elif self.type == "numeric_range":
+            parts = []
+            if self.spec.get("min") is not None:
+                parts.append(f"{cols[0]} >= {sql_literal(self.spec['min'])}")
+            if self.spec.get("max") is not None:
+                parts.append(f"{cols[0]} <= {sql_literal(self.spec['max'])}")
+            cond = " AND ".join(parts)
+        elif self.spec.get("lookup_table"):
+            # Planner turns this into a hashed semi-join against the lookup table
+            cond = f"{cols[0]} IN (SELECT {self.spec['lookup_key']} FROM {self.spec['lookup_table']})"
+        else:
+            keys = lookup_keys(self._lookup_path(), self.spec["lookup_key"])
+            cond = f"{cols[0]} IN ({', '.join(sql_literal(k.item()) for k in keys)})"
+
+        if self.allow_null:
+            nulls = " OR ".join(f"{c} IS NULL" for c in cols)
+            return f"({nulls} OR ({cond}))"
+        notnull = " AND ".join(f"{c} IS NOT NULL" for c in cols)
+        return f"({notnull} AND {cond})"
+
+class RuleSet:
+    def __init__(self, rules, dataset: str = None, version=None):
+        self.rules = list(rules)
+        self.dataset = dataset
+        self.version = version
+
+    def __iter__(self):
+        return iter(self.rules)
+
+    def __len__(self):
+        return len(self.rules)
+
+    @property
+    def names(self):
+        return [r.name for r in self.rules]
+
+    @property
+    def columns(self):
+        return sorted({c for r in self.rules for c in r.columns})
+
+    def for_stage(self, stage: str) -> "RuleSet":
+        rules = []
+        for r in self.rules:
+            if stage not in r.stages:
+                continue
+            if stage in r.allow_null_by_stage:
+                r = Rule({**r.spec, "allow_null": bool(r.allow_null_by_stage[stage])}, base_dir=r.base_dir)
+            rules.append(r)
+        return RuleSet(rules, self.dataset, self.version)
+
+    def with_lookup_csv(self, csv_name: str, path: str) -> "RuleSet":
+        # Point fk_membership rules that use csv_name at another copy of the lookup
+        rules = []
+        for r in self.rules:
+            if r.type == "fk_membership" and os.path.basename(r.spec["lookup_csv"]) == os.path.basename(csv_name):
+                r = Rule({**r.spec, "lookup_csv": path}, base_dir=r.base_dir)
+            rules.append(r)
+        return RuleSet(rules, self.dataset, self.version)
+
+    def for_columns(self, available) -> "RuleSet":
+        # Drop rules that reference columns the input does not have
+        available = set(available)
+        return RuleSet([r for r in self.rules if set(r.columns) <= available], self.dataset, self.version)
+
+    # ---- combined predicates ----
+
+    def arrow_valid(self, batch):
+        import pyarrow as pa
+        import pyarrow.compute as pc
+
+        ok = pa.array(np.ones(batch.num_rows, dtype=bool))
+        for r in self.rules:
+            ok = pc.and_(ok, r.arrow_valid(batch))
+        return ok
+
+    # ---- per-row failure bitmasks (bit i set = rule i failed); 0 means the row passed ----
+
+    def rule_bits(self):
+        return {r.name: 1 << i for i, r in enumerate(self.rules)}
+
+    def arrow_failure_bitmask(self, batch):
+        import pyarrow as pa
+
+        mask = np.zeros(batch.num_rows, dtype=np.int64)
+        for bit, r in enumerate(self.rules):
+            failed = ~r.arrow_valid(batch).to_numpy(zero_copy_only=False)
+            mask |= failed.astype(np.int64) << bit
+        return pa.array(mask)
+
+    def pandas_failure_bitmask(self, df):
+        mask = np.zeros(len(df), dtype=np.int64)
+        for bit, r in enumerate(self.rules):
+            mask |= (~r.pandas_valid(df).to_numpy()).astype(np.int64) << bit
+        return mask
+
+    def spark_failure_bitmask(self):
+        from pyspark.sql import functions as F
+
+        mask = F.lit(0).cast("long")
+        for bit, r in enumerate(self.rules):
+            mask = mask + F.when(~r.spark_condition(), F.lit(1 << bit)).otherwise(F.lit(0))
+        return mask.cast("long")
+
+    def arrow_expression(self):
+        import pyarrow.compute as pc
+
+        expr = pc.scalar(True)
+        for r in self.rules:
+            expr = expr & r.arrow_expression()
+        return expr
+
+    def pandas_valid(self, df):
+        import pandas as pd
+
+        ok = pd.Series(True, index=df.index)
+        for r in self.rules:
+            ok &= r.pandas_valid(df)
+        return ok
+
+    def spark_condition(self):
+        from pyspark.sql import functions as F
+
+        cond = F.lit(True)
+        for r in self.rules:
+            cond = cond & r.spark_condition()
+        return cond
+
+    def sql_where(self, alias: str = None) -> str:
+        if not self.rules:
+            return "TRUE"
+        return "\n  AND ".join(r.sql_condition(alias) for r in self.rules)
+
+    def describe(self):
+        # Human-readable rule list for lineage / reports
+        out = []
+        for r in self.rules:
+            s = r.spec
+            if r.type == "compare_columns":
+                out.append(f"{s['column_a']}{s['op']}{s['column_b']}")
+            elif r.type == "numeric_range":
+                bounds = []
+                if s.get("min") is not None:
+                    bounds.append(f"{s['column']}>={s['min']}")
+                if s.get("max") is not None:
+                    bounds.append(f"{s['column']}<={s['max']}")
+                out.append(",".join(bounds))
+            else:
+                out.append(f"{s['column']} in {s['lookup_key']}")
+        return out
+
+def load_ruleset(path: str = DEFAULT_RULES_PATH, stage: str = None) -> RuleSet:
+    cfg = yaml.safe_load(read_text(path))
+    base_dir = "." if path.startswith("s3://") else os.path.dirname(os.path.dirname(os.path.abspath(path)))
+    rules = RuleSet(
+        [Rule(spec, base_dir=base_dir) for spec in cfg.get("rules", [])],
+        dataset=cfg.get("dataset"),
+        version=cfg.get("version"),
+    )
+    return rules.for_stage(stage) if stage else rules
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Compile quality rules for a backend")
+    ap.add_argument("--rules", default=DEFAULT_RULES_PATH)
+    ap.add_argument("--stage")
+    ap.add_argument("--backend", choices=["sql", "arrow"], default="sql")
+    ap.add_argument("--alias")
+    args = ap.parse_args(argv)
+
+    rules = load_ruleset(args.rules, stage=args.stage)
+    if args.backend == "sql":
+        print(rules.sql_where(args.alias))
+    else:
+        print(rules.arrow_expression())
+
+if __name__ == "__main__":
+    sys.exit(main())
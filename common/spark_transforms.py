@@ -0,0 +1,127 @@
+"""Curated-zone Spark transform shared by the Glue job and the local runner.
+
+cast -> (optional month filter) -> partition columns -> quality gate -> zone enrich
+-> column selection -> adaptive, dynamically-overwritten year/month write.
+
+Usage:
+    configure_adaptive(spark, target_file_mb=128)
+    trips = prepare_trips(spark.read.parquet(src), process_month="2025-08")
+    masked, good, gate = quality_gate(trips, rules)
+    out = select_curated(enrich_zones(good, read_zones(spark, zones_csv)))
+    write_curated(out, target)
+    gate_counts(gate)   # (rows_in, rows_out, ["YYYY-MM", ...])
+
+    out, gate = curated_pipeline(trips, zones, rules)   # the same without quarantine
+
+    (Glue ships this with --extra-py-files, next to common/quality_rules.py)
+"""
+from datetime import datetime
+
+from pyspark.sql import DataFrame, Observation, SparkSession
+from pyspark.sql.functions import (
+    broadcast, col, collect_set, count, format_string, lit, month, sum as sum_, when, year,
+)
+
+FAILED_MASK_COL = "dq_failed_rules_mask"
+PARTITION_COLS = ["year", "month"]
+
+# Output columns of the curated zone (missing source columns are skipped)
+CURATED_COLUMNS = [
+    "VendorID","tpep_pickup_datetime","tpep_dropoff_datetime","passenger_count",
+    "trip_distance","RatecodeID","PULocationID","DOLocationID","payment_type",
+    "fare_amount","tip_amount","total_amount",
+    "PU_Borough","PU_Zone","PU_service_zone",
+    "DO_Borough","DO_Zone","DO_service_zone",
+    "year","month"
+]
+
+def configure_adaptive(spark: SparkSession, target_file_mb: int = 128):
+    # AQE sizes the shuffle before the write: the rebalance in write_curated splits/coalesces
+    # each year/month into ~target_file_mb files instead of one file per input split
+    spark.conf.set("spark.sql.adaptive.enabled", "true")
+    spark.conf.set("spark.sql.adaptive.coalescePartitions.enabled", "true")
+    spark.conf.set("spark.sql.adaptive.advisoryPartitionSizeInBytes", f"{target_file_mb}m")
+
+def read_zones(spark: SparkSession, path: str) -> DataFrame:
+    zones = spark.read.option("header", True).csv(path)
+    return zones.withColumn("LocationID", col("LocationID").cast("int"))
+
+def month_bounds(process_month: str):
+    start = datetime.strptime(process_month, "%Y-%m")
+    end = start.replace(year=start.year + start.month // 12, month=start.month % 12 + 1)
+    return start, end
+
+def prepare_trips(trips: DataFrame, process_month: str = None) -> DataFrame:
+    """Schema alignment, optional single-month filter and year/month partition columns."""
+    # Casts are no-ops when the Parquet already has these types
+    trips = trips.withColumn("PULocationID", col("PULocationID").cast("int")) \
+                 .withColumn("DOLocationID", col("DOLocationID").cast("int")) \
+                 .withColumn("tpep_pickup_datetime", col("tpep_pickup_datetime").cast("timestamp")) \
+                 .withColumn("tpep_dropoff_datetime", col("tpep_dropoff_datetime").cast("timestamp"))
+
+    if process_month:
+        # Keeps stray out-of-month timestamps from replacing older curated partitions;
+        # the range predicate is pushed into the Parquet scan (row-group pruning)
+        start, end = month_bounds(process_month)
+        ts = col("tpep_pickup_datetime")
+        trips = trips.filter((ts >= lit(start)) & (ts < lit(end)))
+
+    return trips.withColumn("year", year(col("tpep_pickup_datetime"))) \
+                .withColumn("month", month(col("tpep_pickup_datetime")))
+
+def quality_gate(trips: DataFrame, rules, name: str = "quality_gate"):
+    """Bitmask of failed rules per row, with row counts observed in the same pass.
+
+    Returns (masked rows, passing rows without the mask, Observation). The observation
+    fills in when the first action over either frame finishes:
+    {"rows_in", "rows_out" (null on empty input), "partitions": ["YYYY-MM", ...]}.
+    """
+    gate = Observation(name)
+    passed = col(FAILED_MASK_COL) == 0
+    masked = trips.withColumn(FAILED_MASK_COL, rules.spark_failure_bitmask()) \
+                  .observe(gate,
+                           count(lit(1)).alias("rows_in"),
+                           sum_(when(passed, 1).otherwise(0)).alias("rows_out"),
+                           collect_set(when(passed, format_string("%04d-%02d", col("year"), col("month"))))
+                           .alias("partitions"))
+    return masked, masked.filter(passed).drop(FAILED_MASK_COL), gate
+
+def enrich_zones(trips: DataFrame, zones: DataFrame) -> DataFrame:
+    # PU and DO attributes from one broadcast of the (small) zone lookup; both joins
+    # reuse the same broadcast exchange
+    zones_b = broadcast(zones.select("LocationID", "Borough", "Zone", "service_zone"))
+    pu, do = zones_b.alias("pu"), zones_b.alias("do")
+    return trips.alias("t") \
+        .join(pu, col("t.PULocationID") == col("pu.LocationID"), "left") \
+        .join(do, col("t.DOLocationID") == col("do.LocationID"), "left") \
+        .select(
+            "t.*",
+            col("pu.Borough").alias("PU_Borough"),
+            col("pu.Zone").alias("PU_Zone"),
+            col("pu.service_zone").alias("PU_service_zone"),
+            col("do.Borough").alias("DO_Borough"),
+            col("do.Zone").alias("DO_Zone"),
+            col("do.service_zone").alias("DO_service_zone"),
+        )
+
+def select_curated(df: DataFrame) -> DataFrame:
+    return df.select(*[c for c in CURATED_COLUMNS if c in df.columns])
+
+def write_curated(df: DataFrame, path: str):
+    # Dynamic overwrite replaces only the year/month partitions present in df; the rest of
+    # the curated history is left untouched
+    df.hint("rebalance", *PARTITION_COLS) \
+      .write.mode("overwrite") \
+      .option("partitionOverwriteMode", "dynamic") \
+      .partitionBy(*PARTITION_COLS) \
+      .parquet(path)
+
+def curated_pipeline(trips: DataFrame, zones: DataFrame, rules, process_month: str = None):
+    """trips/zones as read -> (curated DataFrame, quality-gate Observation); no quarantine."""
+    trips = prepare_trips(trips, process_month)
+    _, good, gate = quality_gate(trips, rules.for_columns(trips.columns))
+    return select_curated(enrich_zones(good, zones)), gate
+
+def gate_counts(gate: Observation):
+    m = gate.get
+    return m["rows_in"], m["rows_out"] or 0, sorted(m["partitions"])
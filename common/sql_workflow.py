@@ -0,0 +1,410 @@
+"""DAG runner for the SQL workflow files over a psycopg2 connection pool.
+
+Each step (normally one SQL file) runs in its own transaction on a pooled connection.
+Independent steps run concurrently, so a full rebuild takes about as long as its
+longest dependency chain.
+
+Dependencies are inferred from the SQL itself:
+  - objects a step writes: CREATE (schema/table/view/MV/function/procedure/index target),
+    INSERT/UPDATE/DELETE/TRUNCATE/ALTER/DROP/REFRESH targets
+  - objects a step reads: every schema-qualified name in a known schema (plus the schema)
+  - routine bodies ($$...$$ of CREATE FUNCTION/PROCEDURE) count only where the routine is
+    invoked (CALL / SELECT), not where it is defined
+Two steps that touch the same object, where at least one writes it, keep their list
+order. Dynamic SQL cannot be seen, so a step can add explicit edges with header lines:
+    -- depends: sql/20_views/*.sql
+
+Every step is logged to analytics.sql_workflow_run (wall time, rows affected, content
+hash). With skip_unchanged, a step that only defines objects (no data statements) is
+skipped when its hash matches its last successful run and everything it creates still
+exists.
+
+Usage:
+    steps = [Step.from_file(p) for p in SQL_FILES]
+    pool = ThreadedConnectionPool(1, workers, dsn)
+    results = run_workflow(pool, steps, run_id, workers=4, skip_unchanged=True)
+"""
+import re
+import time
+import fnmatch
+import hashlib
+from datetime import date
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+# Schemas whose qualified names are treated as objects (aliases like c.relname are not);
+# schemas created by the workflow itself are added automatically
+KNOWN_SCHEMAS = {"analytics", "staging", "dq", "mdm"}
+
+RUN_TABLE = "analytics.sql_workflow_run"
+RUN_DDL = f"""
+CREATE SCHEMA IF NOT EXISTS analytics;
+CREATE TABLE IF NOT EXISTS {RUN_TABLE} (
+  run_id TEXT NOT NULL,
+  step TEXT NOT NULL,
+  content_hash TEXT NOT NULL,
+  status TEXT NOT NULL CHECK (status IN ('OK','SKIPPED','FAILED')),
+  started_at TIMESTAMPTZ NOT NULL,
+  finished_at TIMESTAMPTZ NOT NULL,
+  wall_ms NUMERIC NOT NULL,
+  rows_affected BIGINT,
+  error TEXT,
+  PRIMARY KEY (run_id, step)
+);
+"""
+
+_NAME = r"((?:[a-z_][a-z0-9_$]*\.)?[a-z_][a-z0-9_$]*)"
+_CREATE = re.compile(
+    r"\bcreate\s+(?:or\s+replace\s+)?(?:unlogged\s+|temp\s+|temporary\s+)?"
+    r"(schema|table|view|materialized\s+view|function|procedure)\s+(?:if\s+not\s+exists\s+)?" + _NAME)
+_CREATE_INDEX = re.compile(
+    r"\bcreate\s+(?:unique\s+)?index\s+(?:concurrently\s+)?(?:if\s+not\s+exists\s+)?"
+    r"(?:[a-z_][a-z0-9_$]*\s+)?on\s+(?:only\s+)?" + _NAME)
+_WRITES = [re.compile(p + _NAME) for p in (
+    r"\binsert\s+into\s+",
+    r"\bupdate\s+(?:only\s+)?",
+    r"\bdelete\s+from\s+(?:only\s+)?",
+    r"\bmerge\s+into\s+",
+    r"\btruncate\s+(?:table\s+)?(?:only\s+)?",
+    r"\balter\s+(?:table|materialized\s+view|view)\s+(?:if\s+exists\s+)?(?:only\s+)?",
+    r"\bdrop\s+(?:table|view|materialized\s+view|index|function|procedure)\s+(?:if\s+exists\s+)?",
+    r"\brefresh\s+materialized\s+view\s+(?:concurrently\s+)?",
+)]
+_DEPENDS = re.compile(r"^\s*--\s*depends:\s*(.+)$", re.IGNORECASE | re.MULTILINE)
+_CREATE_TABLE_AS = re.compile(r"^create\s+(?:unlogged\s+|temp\s+|temporary\s+)?table\b.*\bas\s+(?:select|with|values)\b",
+                              re.DOTALL)
+# Statements that only define objects; anything else (DML, CALL, DO, SELECT, REFRESH...) is data work
+_DEFINITION_VERBS = {"create", "alter", "drop", "comment", "grant", "revoke", "set"}
+_DML_VERBS = {"insert", "update", "delete", "merge", "with"}
+
+def segments(sql: str):
+    """Split SQL into ("code" | "string" | "ident" | "comment" | "dollar", text) pieces."""
+    out, i, n = [], 0, len(sql)
+    start = 0
+
+    def flush(upto):
+        if upto > start:
+            out.append(("code", sql[start:upto]))
+
+    while i < n:
+        c = sql[i]
+        if c == "-" and sql.startswith("--", i):
+            flush(i)
+            j = sql.find("\n", i)
+            j = n if j < 0 else j
+            out.append(("comment", sql[i:j]))
+            i = start = j
+        elif c == "/" and sql.startswith("/*", i):
+            flush(i)
+            j = sql.find("*/", i + 2)
+            j = n if j < 0 else j + 2
+            out.append(("comment", sql[i:j]))
+            i = start = j
+        elif c in ("'", '"'):
+            flush(i)
+            j = i + 1
+            while j < n:
+                if sql[j] == c:
+                    if j + 1 < n and sql[j + 1] == c:  # doubled quote
+                        j += 2
+                        continue
+                    break
+                j += 1
+            out.append(("string" if c == "'" else "ident", sql[i:j + 1]))
+            i = start = j + 1
+        elif c == "$":
+            m = re.match(r"\$([A-Za-z_][A-Za-z0-9_]*)?\$", sql[i:])
+            if not m or (i > 0 and (sql[i - 1].isalnum() or sql[i - 1] == "_")):
+                i += 1
+                continue
+            flush(i)
+            tag = m.group(0)
+            j = sql.find(tag, i + len(tag))
+            j = n if j < 0 else j + len(tag)
+            out.append(("dollar", sql[i:j]))
+            i = start = j
+        else:
+            i += 1
+    flush(n)
+    return out
+
+def split_statements(sql: str):
+    """Top-level statements (semicolons inside strings, comments and $$ bodies don't count)."""
+    stmts, cur = [], []
+    for kind, text in segments(sql):
+        if kind != "code":
+            cur.append(text)
+            continue
+        parts = text.split(";")
+        for k, part in enumerate(parts):
+            cur.append(part)
+            if k < len(parts) - 1:
+                stmts.append("".join(cur))
+                cur = []
+    stmts.append("".join(cur))
+    return [s.strip() for s in stmts if code_text(s).strip()]
+
+def code_text(sql: str) -> str:
+    # Lowercased code only: strings, quoted identifiers, comments and $$ bodies blanked out
+    return "".join(t if k == "code" else " " for k, t in segments(sql)).lower()
+
+def dollar_bodies(sql: str):
+    return [t[t.index("$", 1) + 1:t.rindex("$", 0, len(t) - 1)] for k, t in segments(sql) if k == "dollar"]
+
+def statement_verb(stmt: str) -> str:
+    words = code_text(stmt).split()
+    return words[0] if words else ""
+
+class Effects:
+    def __init__(self):
+        self.reads, self.writes = set(), set()
+        self.created = []        # [(kind, name)] for the existence check of skipped steps
+        self.invokes = set()     # qualified names that may be routines defined elsewhere
+
+    def merge(self, other):
+        self.reads |= other.reads
+        self.writes |= other.writes
+        self.invokes |= other.invokes
+
+def text_effects(code: str, schemas) -> Effects:
+    """Reads/writes of already comment- and string-free, lowercased SQL code."""
+    eff = Effects()
+    for kind, name in _CREATE.findall(code):
+        kind = " ".join(kind.split())
+        eff.writes.add(name)
+        eff.created.append((kind, name))
+    for name in _CREATE_INDEX.findall(code):
+        eff.writes.add(name)
+    for pattern in _WRITES:
+        eff.writes.update(pattern.findall(code))
+    for schema, obj in re.findall(r"\b([a-z_][a-z0-9_$]*)\.([a-z_][a-z0-9_$]*)\b", code):
+        if schema in schemas:
+            eff.reads.add(f"{schema}.{obj}")
+            eff.reads.add(schema)
+            eff.invokes.add(f"{schema}.{obj}")
+    eff.writes = {w for w in eff.writes if "." in w and w.split(".")[0] in schemas
+                  or "." not in w and (("schema", w) in eff.created)}
+    return eff
+
+class Step:
+    def __init__(self, name: str, sql: str, depends=None):
+        self.name = name
+        self.sql = sql
+        self.statements = split_statements(sql)
+        self.depends = list(depends or []) + [d.strip() for line in _DEPENDS.findall(sql)
+                                              for d in line.split(",") if d.strip()]
+        self.hash = hashlib.sha256(sql.encode("utf-8")).hexdigest()
+        self.definition_only = all(
+            statement_verb(s) in _DEFINITION_VERBS and not _CREATE_TABLE_AS.match(code_text(s).strip())
+            for s in self.statements)
+        self.effects = None           # own statements (bodies of DO blocks included)
+        self.routines = {}            # routine name -> Effects of its body
+
+    @classmethod
+    def from_file(cls, path: str, depends=None):
+        return cls(Path(path).as_posix(), Path(path).read_text(encoding="utf-8"), depends)
+
+    def analyze(self, schemas):
+        self.effects = Effects()
+        for stmt in self.statements:
+            code = code_text(stmt)
+            eff = text_effects(code, schemas)
+            self.effects.created.extend(eff.created)
+            routine = re.match(r"\s*create\s+(?:or\s+replace\s+)?(?:function|procedure)\s+" + _NAME, code)
+            body = Effects()
+            for b in dollar_bodies(stmt):
+                body.merge(text_effects(code_text(b), schemas))
+            if routine:
+                # Definition: the routine itself is written; its body runs only where invoked
+                self.routines[routine.group(1)] = body
+                eff.reads.discard(routine.group(1))
+                eff.invokes.discard(routine.group(1))
+            else:
+                eff.merge(body)   # DO blocks execute now
+            self.effects.merge(eff)
+
+def created_schemas(steps):
+    out = set()
+    for s in steps:
+        out.update(re.findall(r"\bcreate\s+schema\s+(?:if\s+not\s+exists\s+)?([a-z_][a-z0-9_$]*)",
+                              code_text(s.sql)))
+    return out
+
+def build_graph(steps):
+    """{step name: set(names it waits for)}; raises on cycles. Explicit targets that are not
+    part of this run are ignored."""
+    schemas = KNOWN_SCHEMAS | created_schemas(steps)
+    for s in steps:
+        s.analyze(schemas)
+
+    # Invoked routines contribute their body's effects (transitively)
+    routines = {name: body for s in steps for name, body in s.routines.items()}
+    def expand(eff, seen):
+        for name in list(eff.invokes):
+            if name in routines and name not in seen:
+                seen.add(name)
+                body = routines[name]
+                eff.reads |= body.reads
+                eff.writes |= body.writes
+                expand(body, seen)
+    for s in steps:
+        expand(s.effects, set())
+
+    names = [s.name for s in steps]
+    deps = {s.name: set() for s in steps}
+    for i, a in enumerate(steps):
+        a_all = a.effects.reads | a.effects.writes
+        for b in steps[i + 1:]:
+            b_all = b.effects.reads | b.effects.writes
+            if (a.effects.writes & b_all) or (b.effects.writes & a_all):
+                deps[b.name].add(a.name)
+    for s in steps:
+        for pattern in s.depends:
+            # step names may carry a prefix (absolute paths in Glue): match on the tail too
+            deps[s.name].update(n for n in names if n != s.name and
+                                (fnmatch.fnmatch(n, pattern) or fnmatch.fnmatch(n, "*/" + pattern)))
+
+    # cycle check (Kahn)
+    indeg = {n: len(d) for n, d in deps.items()}
+    ready = [n for n in names if not indeg[n]]
+    seen = 0
+    while ready:
+        n = ready.pop()
+        seen += 1
+        for m, d in deps.items():
+            if n in d:
+                indeg[m] -= 1
+                if not indeg[m]:
+                    ready.append(m)
+    if seen != len(names):
+        raise ValueError("SQL workflow dependencies contain a cycle: "
+                         + ", ".join(n for n in names if indeg[n]))
+    return deps
+
+def ensure_run_table(pool):
+    conn = pool.getconn()
+    try:
+        with conn.cursor() as cur:
+            cur.execute(RUN_DDL)
+        conn.commit()
+    finally:
+        pool.putconn(conn)
+
+def last_success_hash(cur, step: str):
+    cur.execute(f"SELECT content_hash FROM {RUN_TABLE} WHERE step = %s AND status IN ('OK','SKIPPED') "
+                "ORDER BY started_at DESC LIMIT 1;", (step,))
+    row = cur.fetchone()
+    return row[0] if row else None
+
+def objects_exist(cur, created) -> bool:
+    for kind, name in created:
+        if kind == "schema":
+            cur.execute("SELECT 1 FROM pg_namespace WHERE nspname = %s;", (name,))
+        elif kind in ("function", "procedure"):
+            schema, _, proc = name.rpartition(".")
+            cur.execute("SELECT 1 FROM pg_proc p JOIN pg_namespace n ON n.oid = p.pronamespace "
+                        "WHERE p.proname = %s AND (%s = '' OR n.nspname = %s) LIMIT 1;", (proc, schema, schema))
+        else:
+            cur.execute("SELECT 1 WHERE to_regclass(%s) IS NOT NULL;", (name,))
+        if not cur.fetchone():
+            return False
+    return True
+
+def record(cur, run_id, step, status, started, finished, rows, error=None):
+    cur.execute(
+        f"INSERT INTO {RUN_TABLE} (run_id, step, content_hash, status, started_at, finished_at, wall_ms, "
+        "rows_affected, error) VALUES (%s, %s, %s, %s, to_timestamp(%s), to_timestamp(%s), %s, %s, %s) "
+        "ON CONFLICT (run_id, step) DO UPDATE SET status = EXCLUDED.status, finished_at = EXCLUDED.finished_at, "
+        "wall_ms = EXCLUDED.wall_ms, rows_affected = EXCLUDED.rows_affected, error = EXCLUDED.error;",
+        (run_id, step.name, step.hash, status, started, finished, round((finished - started) * 1000, 1), rows, error),
+    )
+
+def run_step(pool, step: Step, run_id: str, skip_unchanged: bool):
+    conn = pool.getconn()
+    started = time.time()
+    rows = 0
+    try:
+        conn.autocommit = False
+        with conn.cursor() as cur:
+            if skip_unchanged and step.definition_only and last_success_hash(cur, step.name) == step.hash \
+                    and objects_exist(cur, step.effects.created):
+                record(cur, run_id, step, "SKIPPED", started, time.time(), None)
+                conn.commit()
+                return "SKIPPED", time.time() - started, None
+            try:
+                for stmt in step.statements:
+                    cur.execute(stmt)
+                    if statement_verb(stmt) in _DML_VERBS and cur.rowcount > 0:
+                        rows += cur.rowcount
+                conn.commit()
+            except Exception as e:
+                conn.rollback()
+                record(cur, run_id, step, "FAILED", started, time.time(), None, str(e)[:2000])
+                conn.commit()
+                raise
+            record(cur, run_id, step, "OK", started, time.time(), rows)
+            conn.commit()
+        for notice in conn.notices:
+            print(f"  [{step.name}] {notice.strip()}")
+        return "OK", time.time() - started, rows
+    finally:
+        del conn.notices[:]
+        conn.reset()  # drop session SETs made by the step before the connection is reused
+        pool.putconn(conn)
+
+def critical_path(deps, seconds):
+    # Longest chain of step durations through the DAG
+    memo = {}
+    def finish(n):
+        if n not in memo:
+            memo[n] = seconds.get(n, 0.0) + max((finish(d) for d in deps[n]), default=0.0)
+        return memo[n]
+    return max((finish(n) for n in deps), default=0.0)
+
+def run_workflow(pool, steps, run_id: str, workers: int = 4, skip_unchanged: bool = False):
+    """Run the steps as a DAG. Returns [(step, status, seconds, rows)] in completion order;
+    stops scheduling new steps after the first failure and re-raises it."""
+    deps = build_graph(steps)
+    by_name = {s.name: s for s in steps}
+    ensure_run_table(pool)
+    for s in steps:
+        waits = ", ".join(sorted(deps[s.name])) or "-"
+        print(f"step {s.name}  (after: {waits})")
+
+    t0 = time.time()
+    done, running, results, failure = set(), {}, [], None
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as ex:
+        while True:
+            if failure is None:
+                for name in [n for n in by_name if n not in done and n not in running.values()]:
+                    if deps[name] <= done:
+                        running[ex.submit(run_step, pool, by_name[name], run_id, skip_unchanged)] = name
+            if not running:
+                break
+            finished, _ = wait(running, return_when=FIRST_COMPLETED)
+            for fut in finished:
+                name = running.pop(fut)
+                try:
+                    status, seconds, rows = fut.result()
+                except Exception as e:
+                    failure = failure or e
+                    print(f"FAILED {name}: {e}")
+                    continue
+                done.add(name)
+                results.append((name, status, seconds, rows))
+                print(f"{status:<7} {name}  {seconds:.2f}s" + (f", {rows} rows" if rows else ""))
+    if failure is not None:
+        raise failure
+
+    wall = time.time() - t0
+    seconds = {n: s for n, _, s, _ in results}
+    print(f"Workflow wall time {wall:.1f}s; serial sum {sum(seconds.values()):.1f}s; "
+          f"critical path {critical_path(deps, seconds):.1f}s")
+    return results
+
+def incremental_call(lookback_days: int, backfill_from: str = None, backfill_to: str = None) -> str:
+    """CALL of the incremental trip_metrics_by_zone_day procedure (011), appended to its step
+    by both runners; backfill dates are YYYY-MM-DD strings, validated before they go in."""
+    lit = lambda d: f"DATE '{date.fromisoformat(d).isoformat()}'" if d else "NULL"
+    return (f"CALL analytics.refresh_trip_metrics_by_zone_day("
+            f"{int(lookback_days)}, {lit(backfill_from)}, {lit(backfill_to)});")
@@ -1,8 +1,22 @@
 import os
+import io
+import re
+import glob
+import time
+import struct
+import hashlib
+import uuid
+from datetime import date, datetime
+from concurrent.futures import ProcessPoolExecutor
 import pandas as pd
 import psycopg2
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.csv as pacsv
+import pyarrow.parquet as pq
 from psycopg2.extras import execute_values
 
+# One path, a comma-separated list or a glob (e.g. "data/yellow_tripdata_2024-*.parquet")
 PARQUET_PATH = os.getenv("TRIPS_PARQUET", "yellow_tripdata_2025-08.parquet")
 
 PG_HOST = os.getenv("PG_HOST", "localhost")
@@ -11,7 +25,25 @@ PG_DB = os.getenv("PG_DB", "postgres")
 PG_USER = os.getenv("PG_USER", "postgres")
 PG_PASS = os.getenv("PG_PASS", "postgres")
 
-TABLE = "staging.yellow_trips"
+TABLE = os.getenv("LOAD_TABLE", "staging.yellow_trips")
+
+# insert = pandas + execute_values (original path)
+# copy   = stream Parquet row groups through pyarrow into COPY FROM STDIN
+# parallel = fan row groups out to LOAD_WORKERS processes, each COPYing into its own
+#            UNLOGGED staging table, then one INSERT ... SELECT into TABLE
+LOAD_MODE = os.getenv("LOAD_MODE", "insert")
+BATCH_ROWS = int(os.getenv("LOAD_BATCH_ROWS", "100000"))
+# 0 = single transaction per file, N = commit after every N row groups.
+# Checkpoint rows commit with their data, so this is also the resume granularity.
+COMMIT_EVERY = int(os.getenv("LOAD_COMMIT_EVERY_ROW_GROUPS", "1"))
+LOAD_WORKERS = int(os.getenv("LOAD_WORKERS", str(os.cpu_count() or 4)))
+
+# Skip row groups already recorded in CHECKPOINT_TABLE (copy/parallel modes)
+LOAD_CHECKPOINT = os.getenv("LOAD_CHECKPOINT", "1") == "1"
+# footer = sha256 of file size + Parquet footer (fast, covers row-group stats)
+# full   = sha256 of the whole file
+LOAD_HASH_MODE = os.getenv("LOAD_HASH_MODE", "footer")
+CHECKPOINT_TABLE = "staging.load_checkpoint"
 
 COLS = [
     "VendorID","tpep_pickup_datetime","tpep_dropoff_datetime","passenger_count",
@@ -20,28 +52,340 @@ COLS = [
     "improvement_surcharge","total_amount","congestion_surcharge","airport_fee","cbd_congestion_fee"
 ]
 
-def main():
-    df = pd.read_parquet(PARQUET_PATH)
-    df = df[[c for c in COLS if c in df.columns]].copy()
+# INT columns in staging.yellow_trips; TLC parquet ships some of them as doubles
+# (e.g. passenger_count=1.0), which COPY would reject.
+INT_COLS = {"VendorID", "passenger_count", "RatecodeID", "PULocationID", "DOLocationID", "payment_type"}
+
+COPY_READ_SIZE = 1 << 20
+
+# staging.yellow_trips is range-partitioned by month on this column (sql/schema.sql);
+# the loader creates the partitions a load needs before writing into it
+PARTITION_KEY = "tpep_pickup_datetime"
+
+MONTH_RE = re.compile(r"yellow_tripdata_(\d{4})-(\d{2})")
 
-    conn = psycopg2.connect(
+CHECKPOINT_DDL = f"""
+CREATE TABLE IF NOT EXISTS {CHECKPOINT_TABLE} (
+  target_table TEXT NOT NULL,
+  source_file TEXT NOT NULL,
+  file_hash TEXT NOT NULL,
+  row_group INT NOT NULL,
+  rows_loaded BIGINT NOT NULL,
+  loaded_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+  PRIMARY KEY (target_table, source_file, file_hash, row_group)
+);
+"""
+
+def connect():
+    return psycopg2.connect(
         host=PG_HOST, port=PG_PORT, dbname=PG_DB, user=PG_USER, password=PG_PASS
     )
-    cur = conn.cursor()
 
-    rows = [tuple(x) for x in df.itertuples(index=False, name=None)]
-    cols_sql = ",".join(df.columns)
-    sql = f"INSERT INTO {TABLE} ({cols_sql}) VALUES %s"
+class ArrowCsvStream:
+    # File-like object for cursor.copy_expert: renders record batches to CSV lazily,
+    # so only one batch is ever held as text.
+    def __init__(self, batches):
+        self._batches = iter(batches)
+        self._buf = b""
+        self._pos = 0
+        self.rows = 0
+
+    def _next_chunk(self):
+        batch = next(self._batches, None)
+        if batch is None:
+            return False
+        sink = io.BytesIO()
+        pacsv.write_csv(batch, sink, write_options=pacsv.WriteOptions(include_header=False))
+        self._buf = sink.getvalue()
+        self._pos = 0
+        self.rows += batch.num_rows
+        return True
+
+    def read(self, size=-1):
+        if self._pos >= len(self._buf) and not self._next_chunk():
+            return b""
+        if size is None or size < 0:
+            size = len(self._buf) - self._pos
+        out = self._buf[self._pos:self._pos + size]
+        self._pos += len(out)
+        return out
+
+def to_copy_batch(batch: pa.RecordBatch) -> pa.RecordBatch:
+    arrays = []
+    for name, arr in zip(batch.schema.names, batch.columns):
+        if name in INT_COLS and not pa.types.is_integer(arr.type):
+            arr = pc.cast(arr, pa.int64(), safe=False)
+        arrays.append(arr)
+    return pa.RecordBatch.from_arrays(arrays, names=batch.schema.names)
+
+def load_columns(pf: pq.ParquetFile):
+    names = set(pf.schema_arrow.names)
+    return [c for c in COLS if c in names]
+
+def copy_row_group(cur, pf: pq.ParquetFile, row_group: int, cols, table=TABLE):
+    batches = (
+        to_copy_batch(b)
+        for b in pf.iter_batches(batch_size=BATCH_ROWS, row_groups=[row_group], columns=cols)
+    )
+    stream = ArrowCsvStream(batches)
+    sql = f"COPY {table} ({','.join(cols)}) FROM STDIN WITH (FORMAT csv)"
+    cur.copy_expert(sql, stream, size=COPY_READ_SIZE)
+    return stream.rows
+
+def input_paths():
+    paths = []
+    for part in PARQUET_PATH.split(","):
+        part = part.strip()
+        if not part:
+            continue
+        matches = sorted(glob.glob(part))
+        paths.extend(matches if matches else [part])
+    return paths
+
+def file_month(path: str):
+    m = MONTH_RE.search(os.path.basename(path))
+    return f"{m.group(1)}-{m.group(2)}" if m else ""
+
+def file_hash(path: str) -> str:
+    h = hashlib.sha256()
+    size = os.path.getsize(path)
+    with open(path, "rb") as f:
+        if LOAD_HASH_MODE == "full":
+            for block in iter(lambda: f.read(1 << 20), b""):
+                h.update(block)
+            return h.hexdigest()
+        # Parquet tail: <footer><4-byte footer length><"PAR1">
+        f.seek(size - 8)
+        footer_len = struct.unpack("<I", f.read(4))[0]
+        f.seek(size - 8 - footer_len)
+        h.update(str(size).encode())
+        h.update(f.read(footer_len))
+    return h.hexdigest()
+
+def is_partitioned(conn, table: str = TABLE) -> bool:
+    with conn.cursor() as cur:
+        cur.execute("SELECT relkind FROM pg_class WHERE oid = to_regclass(%s);", (table,))
+        row = cur.fetchone()
+    return bool(row) and row[0] == "p"
+
+def row_group_months(pf: pq.ParquetFile, rg: int, col_idx: int):
+    # Row-group min/max usually settle it without reading data; otherwise read the one column
+    st = pf.metadata.row_group(rg).column(col_idx).statistics
+    if st is not None and st.has_min_max and isinstance(st.min, datetime) and isinstance(st.max, datetime) \
+            and (st.min.year, st.min.month) == (st.max.year, st.max.month):
+        return {date(st.min.year, st.min.month, 1)}
+    ts = pf.read_row_group(rg, columns=[PARTITION_KEY]).column(0)
+    keys = pc.unique(pc.add(pc.multiply(pc.year(ts), 100), pc.month(ts))).drop_null()
+    return {date(k // 100, k % 100, 1) for k in keys.to_pylist()}
+
+def load_months(paths):
+    # Distinct pickup months actually present (stray old timestamps get their own
+    # partition instead of a run of empty ones between min and max)
+    months = set()
+    for path in paths:
+        pf = pq.ParquetFile(path)
+        if PARTITION_KEY not in pf.schema_arrow.names:
+            continue
+        col_idx = pf.schema_arrow.get_field_index(PARTITION_KEY)
+        for rg in range(pf.num_row_groups):
+            months |= row_group_months(pf, rg, col_idx)
+    return sorted(months)
+
+def ensure_partitions(conn, paths):
+    if not is_partitioned(conn):
+        return
+    months = load_months(paths)
+    with conn.cursor() as cur:
+        for m in months:
+            cur.execute("SELECT staging.ensure_month_partition(%s::regclass, %s);", (TABLE, m))
+    conn.commit()
+    print(f"Partitions ready for {len(months)} month(s): {', '.join(m.strftime('%Y-%m') for m in months)}")
+
+def ensure_checkpoint_table(conn):
+    with conn.cursor() as cur:
+        cur.execute(CHECKPOINT_DDL)
+    conn.commit()
 
-    chunk = 5000
-    for i in range(0, len(rows), chunk):
-        execute_values(cur, sql, rows[i:i+chunk])
+def completed_row_groups(conn, path: str, fhash: str):
+    if not LOAD_CHECKPOINT:
+        return set()
+    with conn.cursor() as cur:
+        cur.execute(
+            f"SELECT row_group FROM {CHECKPOINT_TABLE} "
+            "WHERE target_table=%s AND source_file=%s AND file_hash=%s;",
+            (TABLE, os.path.basename(path), fhash),
+        )
+        return {r[0] for r in cur.fetchall()}
+
+def record_checkpoints(cur, entries):
+    # entries: [(path, file_hash, row_group, rows_loaded), ...]
+    if not LOAD_CHECKPOINT or not entries:
+        return
+    execute_values(
+        cur,
+        f"INSERT INTO {CHECKPOINT_TABLE} (target_table, source_file, file_hash, row_group, rows_loaded) "
+        "VALUES %s ON CONFLICT DO NOTHING;",
+        [(TABLE, os.path.basename(p), h, rg, n) for p, h, rg, n in entries],
+    )
+
+def load_copy(conn):
+    loaded = 0
+    t0 = time.time()
+    if LOAD_CHECKPOINT:
+        ensure_checkpoint_table(conn)
+
+    with conn.cursor() as cur:
+        for path in input_paths():
+            fhash = file_hash(path) if LOAD_CHECKPOINT else ""
+            done = completed_row_groups(conn, path, fhash)
+            pf = pq.ParquetFile(path)
+            cols = load_columns(pf)
+            if done:
+                print(f"{path}: resuming, {len(done)}/{pf.num_row_groups} row groups already loaded")
+            for rg in range(pf.num_row_groups):
+                if rg in done:
+                    continue
+                rows = copy_row_group(cur, pf, rg, cols)
+                record_checkpoints(cur, [(path, fhash, rg, rows)])
+                loaded += rows
+                if COMMIT_EVERY and (rg + 1) % COMMIT_EVERY == 0:
+                    conn.commit()
+                print(f"{path}: copied row group {rg+1}/{pf.num_row_groups} ({loaded} rows, "
+                      f"{loaded / max(time.time() - t0, 1e-9):,.0f} rows/s)")
+            conn.commit()
+    return loaded
+
+def plan_pieces(paths, workers: int, skip=None):
+    # One piece per (file, row group), ordered by month so a worker tends to stay
+    # within one file; pieces are then spread largest-first onto the least-loaded worker.
+    # skip: {path: set(row_group)} already checkpointed.
+    skip = skip or {}
+    pieces = []
+    for path in paths:
+        md = pq.ParquetFile(path).metadata
+        for rg in range(md.num_row_groups):
+            if rg in skip.get(path, ()):
+                continue
+            pieces.append((file_month(path), path, rg, md.row_group(rg).num_rows))
+    pieces.sort()
+
+    buckets = [[] for _ in range(max(1, min(workers, len(pieces))))]
+    loads = [0] * len(buckets)
+    for piece in sorted(pieces, key=lambda p: -p[3]):
+        i = loads.index(min(loads))
+        buckets[i].append(piece)
+        loads[i] += piece[3]
+    return [sorted(b) for b in buckets if b]
+
+def worker_table(run_tag: str, idx: int):
+    schema, _, name = TABLE.rpartition(".")
+    return f"{schema or 'public'}.{name}_load_{run_tag}_{idx}"
+
+def load_worker(idx: int, run_tag: str, pieces):
+    # Runs in a child process: own connection, own UNLOGGED table, one COPY per row group.
+    table = worker_table(run_tag, idx)
+    conn = connect()
+    files = {}
+    loaded = []
+    try:
+        with conn.cursor() as cur:
+            cur.execute(f"CREATE UNLOGGED TABLE {table} (LIKE {TABLE} INCLUDING DEFAULTS);")
+            for _, path, rg, _ in pieces:
+                if path not in files:
+                    files[path] = pq.ParquetFile(path)
+                pf = files[path]
+                loaded.append((path, rg, copy_row_group(cur, pf, rg, load_columns(pf), table=table)))
+        conn.commit()
+    finally:
+        conn.close()
+    return table, loaded
+
+def load_parallel(conn):
+    paths = input_paths()
+    hashes, skip = {}, {}
+    if LOAD_CHECKPOINT:
+        ensure_checkpoint_table(conn)
+        for path in paths:
+            hashes[path] = file_hash(path)
+            skip[path] = completed_row_groups(conn, path, hashes[path])
+
+    buckets = plan_pieces(paths, LOAD_WORKERS, skip=skip)
+    if not buckets:
+        print("All row groups already loaded; nothing to do.")
+        return 0
+    # unique per run (parallel loads may start in the same second, also on other hosts)
+    run_tag = f"{time.strftime('%Y%m%d%H%M%S')}_{uuid.uuid4().hex[:8]}"
+    tables = [worker_table(run_tag, i) for i in range(len(buckets))]
+    print(f"Loading {len(paths)} file(s) as {sum(len(b) for b in buckets)} row groups on {len(buckets)} workers")
+
+    loaded = 0
+    checkpoints = []
+    try:
+        with ProcessPoolExecutor(max_workers=len(buckets)) as pool:
+            futures = [pool.submit(load_worker, i, run_tag, b) for i, b in enumerate(buckets)]
+            for fut in futures:
+                table, pieces = fut.result()
+                rows = sum(n for _, _, n in pieces)
+                loaded += rows
+                checkpoints.extend((p, hashes.get(p, ""), rg, n) for p, rg, n in pieces)
+                print(f"Staged {rows} rows in {table}")
+
+        # Publish all worker tables (and their checkpoints) atomically
+        with conn.cursor() as cur:
+            for table in tables:
+                cur.execute(f"INSERT INTO {TABLE} SELECT * FROM {table};")
+            record_checkpoints(cur, checkpoints)
+        conn.commit()
+    finally:
+        conn.rollback()
+        with conn.cursor() as cur:
+            for table in tables:
+                cur.execute(f"DROP TABLE IF EXISTS {table};")
         conn.commit()
-        print(f"Inserted {min(i+chunk, len(rows))}/{len(rows)}")
+    return loaded
+
+def load_insert(conn):
+    # Same inputs as copy/parallel (list or glob in TRIPS_PARQUET), one file at a time
+    loaded = 0
+    cur = conn.cursor()
+
+    for path in input_paths():
+        df = pd.read_parquet(path)
+        df = df[[c for c in COLS if c in df.columns]].copy()
+
+        rows = [tuple(x) for x in df.itertuples(index=False, name=None)]
+        cols_sql = ",".join(df.columns)
+        sql = f"INSERT INTO {TABLE} ({cols_sql}) VALUES %s"
+
+        chunk = 5000
+        for i in range(0, len(rows), chunk):
+            execute_values(cur, sql, rows[i:i+chunk])
+            conn.commit()
+            print(f"{path}: inserted {min(i+chunk, len(rows))}/{len(rows)}")
+        loaded += len(rows)
 
     cur.close()
-    conn.close()
-    print("Done.")
+    return loaded
+
+def main():
+    conn = connect()
+    t0 = time.time()
+    try:
+        # Month partitions exist before any rows are written (otherwise they go to DEFAULT)
+        ensure_partitions(conn, input_paths())
+        if LOAD_MODE == "copy":
+            rows = load_copy(conn)
+        elif LOAD_MODE == "parallel":
+            rows = load_parallel(conn)
+        elif LOAD_MODE == "insert":
+            rows = load_insert(conn)
+        else:
+            raise SystemExit(f"Unknown LOAD_MODE={LOAD_MODE} (expected insert|copy|parallel)")
+    finally:
+        conn.close()
+
+    elapsed = time.time() - t0
+    print(f"Done. mode={LOAD_MODE} rows={rows} seconds={elapsed:.1f} rows_per_sec={rows / max(elapsed, 1e-9):,.0f}")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
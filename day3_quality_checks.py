@@ -1,19 +1,37 @@
 import os
 import json
 import boto3
-import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
 from pathlib import Path
 from datetime import datetime
 
+from common.quality_rules import load_ruleset
+
 # ---- CONFIG ----
 PARQUET_PATH = os.getenv("TRIPS_PARQUET", "yellow_tripdata_2025-08.parquet")
 ZONES_CSV_PATH = os.getenv("ZONES_CSV", "taxi_zone_lookup.csv")
+RULES_PATH = os.getenv("QUALITY_RULES", "governance/quality_rules.yaml")
 
 # If you set these env vars, report uploads to S3
-BUCKET = os.getenv("NYC_BUCKET")  
+BUCKET = os.getenv("NYC_BUCKET")
 S3_REPORT_PREFIX = os.getenv("S3_REPORT_PREFIX", "metadata/quality_reports/")
 AWS_REGION = os.getenv("AWS_REGION", "us-east-2")
 
+BATCH_ROWS = int(os.getenv("DQ_BATCH_ROWS", "250000"))
+SAMPLE_ROWS = int(os.getenv("DQ_SAMPLE_ROWS", "10"))
+
+# Check names before the report was compiled from the rules YAML; still written (with
+# "alias_of") so existing consumers of the report keep working
+LEGACY_CHECK_NAMES = {
+    "pickup_before_dropoff": "pickup_after_dropoff",
+    "non_negative_trip_distance": "negative_trip_distance",
+    "non_negative_total_amount": "negative_total_amount",
+    "pu_location_in_lookup": "pu_location_missing_in_lookup",
+    "do_location_in_lookup": "do_location_missing_in_lookup",
+}
+
 OUT_DIR = Path("docs")
 OUT_DIR.mkdir(exist_ok=True)
 
@@ -22,73 +40,75 @@ def upload_to_s3(local_path: Path, bucket: str, key: str):
     s3.upload_file(str(local_path), bucket, key)
     return f"s3://{bucket}/{key}"
 
+def jsonable_rows(table: pa.Table):
+    rows = table.to_pylist()
+    for r in rows:
+        for k, v in r.items():
+            if isinstance(v, datetime):
+                r[k] = str(v)
+    return rows
+
 def main():
     ts = datetime.utcnow().strftime("%Y%m%d_%H%M%S")
     report_path = OUT_DIR / f"quality_report_{ts}.json"
 
-    zones = pd.read_csv(ZONES_CSV_PATH)
-    trips = pd.read_parquet(PARQUET_PATH)
+    pf = pq.ParquetFile(PARQUET_PATH)
+    row_count = pf.metadata.num_rows
+
+    rules = (
+        load_ruleset(RULES_PATH, stage="report")
+        .with_lookup_csv("taxi_zone_lookup.csv", ZONES_CSV_PATH)
+        .for_columns(pf.schema_arrow.names)
+    )
+    available = set(pf.schema_arrow.names)
+    sample_cols = {r.name: [c for c in r.sample_columns if c in available] for r in rules}
+
+    # Column pruning: read only what the rules and their samples touch
+    needed = sorted(set(rules.columns) | {c for cols in sample_cols.values() for c in cols})
+    bad_counts = {r.name: 0 for r in rules}
+    samples = {r.name: [] for r in rules}
+
+    # Single pass: every rule evaluated per batch; counts and bounded samples accumulate
+    if needed:
+        for batch in pf.iter_batches(batch_size=BATCH_ROWS, columns=needed):
+            for r in rules:
+                mask = pc.invert(r.arrow_valid(batch))
+                n_bad = pc.sum(mask).as_py() or 0
+                if not n_bad:
+                    continue
+                bad_counts[r.name] += n_bad
+                room = SAMPLE_ROWS - len(samples[r.name])
+                if room > 0:
+                    bad_rows = pa.Table.from_batches([batch]).filter(mask).select(sample_cols[r.name]).slice(0, room)
+                    samples[r.name].extend(jsonable_rows(bad_rows))
 
     report = {
         "generated_utc": datetime.utcnow().isoformat() + "Z",
         "inputs": {
             "parquet": PARQUET_PATH,
-            "zones_csv": ZONES_CSV_PATH
+            "zones_csv": ZONES_CSV_PATH,
+            "rules": RULES_PATH
         },
-        "row_count": int(len(trips)),
+        "row_count": int(row_count),
         "checks": {},
         "samples": {},
     }
 
-    def add_check(name, bad_mask, sample_cols=None):
-        bad_count = int(bad_mask.sum())
+    for name in rules.names:
+        bad_count = int(bad_counts[name])
         report["checks"][name] = {
             "bad_count": bad_count,
-            "bad_pct": round((bad_count / len(trips) * 100) if len(trips) else 0, 6),
+            "bad_pct": round((bad_count / row_count * 100) if row_count else 0, 6),
             "status": "PASS" if bad_count == 0 else "FAIL"
         }
         if bad_count > 0:
-            sample_cols = sample_cols or []
-            sample = trips.loc[bad_mask, sample_cols].head(10).copy()
-            # Convert Timestamps to strings for JSON serialization
-            for col in sample.columns:
-                if pd.api.types.is_datetime64_any_dtype(sample[col]):
-                    sample[col] = sample[col].astype(str)
-            report["samples"][name] = sample.to_dict(orient="records")
-
-    # Check 1: pickup <= dropoff
-    if "tpep_pickup_datetime" in trips.columns and "tpep_dropoff_datetime" in trips.columns:
-        bad = trips["tpep_pickup_datetime"] > trips["tpep_dropoff_datetime"]
-        add_check(
-            "pickup_after_dropoff",
-            bad.fillna(False),
-            sample_cols=["tpep_pickup_datetime", "tpep_dropoff_datetime", "PULocationID", "DOLocationID", "total_amount"]
-        )
-
-    # Check 2: trip_distance >= 0
-    if "trip_distance" in trips.columns:
-        bad = trips["trip_distance"].fillna(0) < 0
-        add_check("negative_trip_distance", bad, sample_cols=["trip_distance", "PULocationID", "DOLocationID"])
-
-    # Check 3: total_amount >= 0
-    if "total_amount" in trips.columns:
-        bad = trips["total_amount"].fillna(0) < 0
-        add_check("negative_total_amount", bad, sample_cols=["total_amount", "fare_amount", "tip_amount", "tolls_amount"])
-
-    # Check 4/5: location IDs exist in zone lookup
-    if "LocationID" in zones.columns:
-        zone_ids = set(zones["LocationID"].dropna().astype(int).tolist())
-
-        if "PULocationID" in trips.columns:
-            pu = trips["PULocationID"].dropna().astype(int)
-            bad = ~pu.isin(zone_ids)
-            # align back to original index
-            bad_mask = trips["PULocationID"].notna() & ~trips["PULocationID"].astype(int).isin(zone_ids)
-            add_check("pu_location_missing_in_lookup", bad_mask, sample_cols=["PULocationID"])
-
-        if "DOLocationID" in trips.columns:
-            bad_mask = trips["DOLocationID"].notna() & ~trips["DOLocationID"].astype(int).isin(zone_ids)
-            add_check("do_location_missing_in_lookup", bad_mask, sample_cols=["DOLocationID"])
+            report["samples"][name] = samples[name]
+
+        legacy = LEGACY_CHECK_NAMES.get(name)
+        if legacy:
+            report["checks"][legacy] = {**report["checks"][name], "alias_of": name}
+            if bad_count > 0:
+                report["samples"][legacy] = samples[name]
 
     report_path.write_text(json.dumps(report, indent=2), encoding="utf-8")
     print(f"Wrote report: {report_path}")
@@ -102,4 +122,4 @@ def main():
         print("NYC_BUCKET not set; skipping S3 upload. (export NYC_BUCKET=your-bucket to enable)")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
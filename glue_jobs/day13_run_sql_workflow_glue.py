@@ -1,7 +1,19 @@
 import sys, os
 from pathlib import Path
 from datetime import datetime
-import psycopg2
+from psycopg2.pool import ThreadedConnectionPool
+
+# Shipped to the job with --extra-py-files (zip of the repo's common/ package)
+from common.sql_workflow import Step, incremental_call, run_workflow
+
+# --TRANSFORM_MODE=incremental swaps the full trip_metrics_by_zone_day rebuild (010) for the
+# watermark-driven procedure (011) and calls it in the same step
+# Files run as a dependency DAG on --WORKFLOW_WORKERS pooled connections, one transaction per
+# file; a failed file rolls back only itself and stops the steps that have not started yet.
+# Timings per file: analytics.sql_workflow_run. --SKIP_UNCHANGED=0 re-runs unchanged
+# definition-only files too.
+FULL_TRANSFORM = "sql/10_transforms/010_trip_metrics_by_zone_day.sql"
+INCREMENTAL_TRANSFORM = "sql/10_transforms/011_trip_metrics_by_zone_day_incremental.sql"
 
 def read_sql(path):
     return Path(path).read_text(encoding="utf-8")
@@ -16,29 +28,32 @@ def main():
     pwd  = args["--PGPASSWORD"]
 
     sql_files = args["--SQL_FILES"].split(",")
+    transform_mode = args.get("--TRANSFORM_MODE", "full")
+    if transform_mode not in ("full", "incremental"):
+        raise ValueError(f"Unknown --TRANSFORM_MODE={transform_mode!r} (expected full|incremental)")
+    lookback_days = int(args.get("--LOOKBACK_DAYS", "2"))
+    backfill = [args.get("--BACKFILL_FROM") or None, args.get("--BACKFILL_TO") or None]
     run_id = "glue_sqlrun_" + datetime.utcnow().strftime("%Y%m%d_%H%M%S")
 
-    conn = psycopg2.connect(host=host, dbname=db, user=user, password=pwd, port=int(args.get("--PGPORT","5432")))
-    conn.autocommit = False
-
-    try:
-        with conn.cursor() as cur:
-            for f in sql_files:
-                cur.execute(read_sql(f))
-        conn.commit()
+    workers = int(args.get("--WORKFLOW_WORKERS", "4"))
+    skip_unchanged = args.get("--SKIP_UNCHANGED", "1") == "1"
 
-        with conn.cursor() as cur:
-            cur.execute(f"CALL dq.run_all_tests('{run_id}');")
-        conn.commit()
-
-        print(f"Glue SQL workflow succeeded. run_id={run_id}")
-
-    except Exception as e:
-        conn.rollback()
-        raise
+    steps = []
+    for f in sql_files:
+        if Path(f).as_posix().endswith(FULL_TRANSFORM) and transform_mode == "incremental":
+            inc = f.replace(FULL_TRANSFORM, INCREMENTAL_TRANSFORM)
+            steps.append(Step(inc, read_sql(inc) + "\n" + incremental_call(lookback_days, *backfill)))
+            continue
+        steps.append(Step(f, read_sql(f)))
+    steps.append(Step("dq.run_all_tests", f"CALL dq.run_all_tests('{run_id}');", depends=["*"]))
 
+    pool = ThreadedConnectionPool(1, workers, host=host, dbname=db, user=user, password=pwd,
+                                  port=int(args.get("--PGPORT","5432")))
+    try:
+        run_workflow(pool, steps, run_id, workers, skip_unchanged)
+        print(f"Glue SQL workflow succeeded. run_id={run_id} transform_mode={transform_mode}")
     finally:
-        conn.close()
+        pool.closeall()
 
 if __name__ == "__main__":
     main()
@@ -7,7 +7,15 @@ from pyspark.context import SparkContext
 from awsglue.context import GlueContext
 from awsglue.job import Job
 
-from pyspark.sql.functions import col, year, month, lit, when
+from pyspark import StorageLevel
+from pyspark.sql.functions import col, lit
+
+# Shipped to the job with --extra-py-files (zip of the repo's common/ package)
+from common.quality_rules import load_ruleset
+from common.spark_transforms import (
+    FAILED_MASK_COL, configure_adaptive, enrich_zones, gate_counts, prepare_trips,
+    quality_gate, read_zones, select_curated, write_curated,
+)
 
 args = getResolvedOptions(sys.argv, [
     "JOB_NAME",
@@ -28,64 +36,55 @@ source_zones = args["SOURCE_ZONES_S3"]     # e.g. s3://bucket/bronze/reference/t
 target_curated = args["TARGET_CURATED_S3"] # e.g. s3://bucket/curated/yellow/
 lineage_s3 = args["LINEAGE_S3"]            # e.g. s3://bucket/lineage/glue/day7_run.json
 
-# Read parquet trips
-trips = spark.read.parquet(source_trips)
-
-# Read zones csv
-zones = spark.read.option("header", True).csv(source_zones)
-zones = zones.withColumn("LocationID", col("LocationID").cast("int"))
-
-trips = trips.withColumn("PULocationID", col("PULocationID").cast("int")) \
-             .withColumn("DOLocationID", col("DOLocationID").cast("int")) \
-             .withColumn("tpep_pickup_datetime", col("tpep_pickup_datetime").cast("timestamp")) \
-             .withColumn("tpep_dropoff_datetime", col("tpep_dropoff_datetime").cast("timestamp"))
-
-# Quality gates (Validated)
-before = trips.count()
-
-trips_q = trips.filter(col("tpep_pickup_datetime").isNotNull()) \
-               .filter(col("tpep_dropoff_datetime").isNotNull()) \
-               .filter(col("tpep_pickup_datetime") <= col("tpep_dropoff_datetime")) \
-               .filter(when(col("trip_distance").isNull(), lit(0)).otherwise(col("trip_distance")) >= 0) \
-               .filter(when(col("total_amount").isNull(), lit(0)).otherwise(col("total_amount")) >= 0)
-
-after = trips_q.count()
-
-# Partition columns
-trips_q = trips_q.withColumn("year", year(col("tpep_pickup_datetime"))) \
-                 .withColumn("month", month(col("tpep_pickup_datetime")))
-
-# Enrich PU
-pu = zones.select(
-    col("LocationID").alias("PU_LocationID"),
-    col("Borough").alias("PU_Borough"),
-    col("Zone").alias("PU_Zone"),
-    col("service_zone").alias("PU_service_zone"),
-)
-trips_q = trips_q.join(pu, trips_q.PULocationID == pu.PU_LocationID, "left")
-
-# Enrich DO
-do = zones.select(
-    col("LocationID").alias("DO_LocationID"),
-    col("Borough").alias("DO_Borough"),
-    col("Zone").alias("DO_Zone"),
-    col("service_zone").alias("DO_service_zone"),
-)
-trips_q = trips_q.join(do, trips_q.DOLocationID == do.DO_LocationID, "left")
-
-# Select only needed columns (optimize output size)
-keep_cols = [
-    "VendorID","tpep_pickup_datetime","tpep_dropoff_datetime","passenger_count",
-    "trip_distance","RatecodeID","PULocationID","DOLocationID","payment_type",
-    "fare_amount","tip_amount","total_amount",
-    "PU_Borough","PU_Zone","PU_service_zone",
-    "DO_Borough","DO_Zone","DO_service_zone",
-    "year","month"
-]
-trips_out = trips_q.select(*[c for c in keep_cols if c in trips_q.columns])
-
-# Write curated parquet partitioned
-trips_out.write.mode("overwrite").partitionBy("year","month").parquet(target_curated)
+# Optional: --QUALITY_RULES s3://bucket/governance/quality_rules.yaml
+# (default: quality_rules.yaml shipped next to the script with --extra-files)
+if "--QUALITY_RULES" in sys.argv:
+    rules_path = getResolvedOptions(sys.argv, ["QUALITY_RULES"])["QUALITY_RULES"]
+else:
+    rules_path = "quality_rules.yaml"
+
+# Optional: --QUARANTINE_S3 s3://bucket/quarantine/yellow/ (rejected rows + failed-rule bitmask)
+quarantine_s3 = getResolvedOptions(sys.argv, ["QUARANTINE_S3"])["QUARANTINE_S3"] \
+    if "--QUARANTINE_S3" in sys.argv else None
+run_id = datetime.utcnow().strftime("%Y%m%d_%H%M%S")
+
+# Optional: --PROCESS_MONTH 2025-08 keeps only trips picked up in that month, so stray
+# out-of-month timestamps cannot replace an older year/month partition of the curated zone
+process_month = getResolvedOptions(sys.argv, ["PROCESS_MONTH"])["PROCESS_MONTH"] \
+    if "--PROCESS_MONTH" in sys.argv else None
+# Optional: --TARGET_FILE_MB 128 (AQE advisory size -> curated file size per year/month)
+target_file_mb = int(getResolvedOptions(sys.argv, ["TARGET_FILE_MB"])["TARGET_FILE_MB"]) \
+    if "--TARGET_FILE_MB" in sys.argv else 128
+
+configure_adaptive(spark, target_file_mb)
+
+# Cast, optional month filter, year/month partition columns (shared with the local runner)
+trips = prepare_trips(spark.read.parquet(source_trips), process_month)
+zones = read_zones(spark, source_zones)
+
+# Quality gates (Validated) compiled from governance/quality_rules.yaml into one filter
+# Each row gets a bitmask of failed rules; good rows (mask=0) and rejects come from one pass,
+# and the row counts are observed during the curated write (no separate count() scans).
+rules = load_ruleset(rules_path, stage="validated").for_columns(trips.columns)
+trips_m, trips_q, gate = quality_gate(trips, rules)
+if quarantine_s3:
+    # Rejects are written after the curated output; keep the masked rows instead of rescanning
+    trips_m = trips_m.persist(StorageLevel.MEMORY_AND_DISK)
+    trips_q = trips_m.filter(col(FAILED_MASK_COL) == 0).drop(FAILED_MASK_COL)
+
+# Enrich PU and DO from one zone broadcast, keep the curated columns, write with
+# dynamic partition overwrite (only this run's year/month partitions are replaced)
+trips_out = select_curated(enrich_zones(trips_q, zones))
+write_curated(trips_out, target_curated)
+
+before, after, partitions_written = gate_counts(gate)
+
+if quarantine_s3 and after < before:
+    rejected = trips_m.filter(col(FAILED_MASK_COL) != 0) \
+                      .withColumn("run_id", lit(run_id))
+    rejected.write.mode("append").partitionBy("year", "month", "run_id").parquet(quarantine_s3)
+if quarantine_s3:
+    trips_m.unpersist()
 
 # Write lineage JSON (simple governance artifact)
 lineage = {
@@ -96,18 +95,27 @@ lineage = {
         "zones": source_zones
     },
     "output": {
-        "curated": target_curated
+        "curated": target_curated,
+        "overwrite_mode": "dynamic",
+        "partitions_written": partitions_written,
+        "target_file_mb": target_file_mb
     },
     "quality_gate": {
-        "rules": ["pickup<=dropoff","trip_distance>=0","total_amount>=0"],
+        "rules": rules.describe(),
         "rows_in": before,
         "rows_out": after,
         "rows_dropped": before - after
     },
+    "quarantine": {
+        "s3": quarantine_s3 if quarantine_s3 and after < before else None,
+        "run_id": run_id,
+        "mask_column": FAILED_MASK_COL,
+        "rule_bits": rules.rule_bits()
+    },
     "transformations": [
         "filter validated rules",
         "add partitions year/month",
-        "join PU and DO zone attributes"
+        "join PU and DO zone attributes (broadcast)"
     ]
 }
 
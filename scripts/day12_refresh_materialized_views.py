@@ -0,0 +1,39 @@
+import os
+import sys
+import time
+from pathlib import Path
+from datetime import datetime
+from psycopg2.pool import ThreadedConnectionPool
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from common.mv_refresh import refresh_all
+
+# Parallel variant of sql/20_views/021_refresh_materialized_views.sql: independent MVs refresh
+# at the same time on separate connections, dependent ones after their sources. MVs whose
+# sources did not change since their last logged refresh are skipped (MV_REFRESH_FORCE=1 to
+# refresh anyway). Durations go to analytics.mv_refresh_log / analytics.vw_mv_refresh_trend.
+# Connection settings come from the usual PGHOST/PGUSER/PGDATABASE/PGPASSWORD/PGPORT.
+
+MV_REFRESH_WORKERS = int(os.getenv("MV_REFRESH_WORKERS", "4"))
+MV_REFRESH_SCHEMA = os.getenv("MV_REFRESH_SCHEMA", "analytics")
+MV_REFRESH_FORCE = os.getenv("MV_REFRESH_FORCE", "0") == "1"
+
+def main():
+    for v in ["PGHOST", "PGUSER", "PGDATABASE"]:
+        if not os.getenv(v):
+            raise SystemExit("Set PGHOST, PGUSER, PGDATABASE (and PGPASSWORD if needed).")
+
+    run_id = "mvrefresh_" + datetime.utcnow().strftime("%Y%m%d_%H%M%S")
+    pool = ThreadedConnectionPool(1, MV_REFRESH_WORKERS, "")
+    t0 = time.time()
+    try:
+        results = refresh_all(pool, MV_REFRESH_SCHEMA, MV_REFRESH_WORKERS, MV_REFRESH_FORCE, run_id)
+    finally:
+        pool.closeall()
+
+    skipped = sum(1 for r in results if r[2].startswith("SKIPPED"))
+    print(f"Refreshed {len(results) - skipped} MV(s), skipped {skipped} unchanged, "
+          f"{time.time() - t0:.1f}s. run_id={run_id}")
+
+if __name__ == "__main__":
+    main()
@@ -1,14 +1,35 @@
-import os, subprocess, time
+import os, sys, time
 from datetime import datetime
 from pathlib import Path
+from psycopg2.pool import ThreadedConnectionPool
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from common.sql_workflow import Step, incremental_call, run_workflow
 
 PGHOST = os.getenv("PGHOST")
 PGUSER = os.getenv("PGUSER")
 PGDATABASE = os.getenv("PGDATABASE")
 PGPORT = os.getenv("PGPORT", "5432")
 
+# full        -> 010 re-aggregates all of analytics.curated_yellow_trips
+# incremental -> 011 + CALL: only trip dates since the watermark (minus lookback) are re-aggregated
+TRANSFORM_MODE = os.getenv("TRANSFORM_MODE", "full")
+LOOKBACK_DAYS = int(os.getenv("LOOKBACK_DAYS", "2"))
+BACKFILL_FROM = os.getenv("BACKFILL_FROM")  # YYYY-MM-DD, incremental mode only
+BACKFILL_TO = os.getenv("BACKFILL_TO")
+
+# Files run as a dependency DAG (common/sql_workflow.py) on pooled connections, one
+# transaction per file; per-step timings land in analytics.sql_workflow_run.
+# SQL_WORKFLOW_WORKERS=1 runs them one at a time.
+SQL_WORKFLOW_WORKERS = int(os.getenv("SQL_WORKFLOW_WORKERS", "4"))
+# Definition-only files (CREATE OR REPLACE ...) unchanged since their last successful run are skipped
+SQL_WORKFLOW_SKIP_UNCHANGED = os.getenv("SQL_WORKFLOW_SKIP_UNCHANGED", "1") == "1"
+
 SQL_FILES = [
+    "sql/00_admin/000_month_partition_functions.sql",
     "sql/00_admin/001_create_analytics_schema.sql",
+    "sql/00_admin/002_partition_curated_yellow_trips.sql",
+    "sql/00_admin/003_mv_refresh_subsystem.sql",
     "sql/30_quality/030_quality_functions.sql",
     "sql/10_transforms/010_trip_metrics_by_zone_day.sql",
     "sql/20_views/020_mv_revenue_by_borough_month.sql",
@@ -16,27 +37,38 @@ SQL_FILES = [
     "sql/30_quality/031_run_all_tests_procedure.sql",
 ]
 
-def run_psql(file_path: str):
-    cmd = ["psql", "-v", "ON_ERROR_STOP=1", "-f", file_path]
-    print("Running:", " ".join(cmd))
-    subprocess.check_call(cmd)
+FULL_TRANSFORM = "sql/10_transforms/010_trip_metrics_by_zone_day.sql"
+INCREMENTAL_TRANSFORM = "sql/10_transforms/011_trip_metrics_by_zone_day_incremental.sql"
 
-def run_tests(run_id: str):
-    cmd = ["psql", "-v", "ON_ERROR_STOP=1", "-c", f"CALL dq.run_all_tests('{run_id}');"]
-    print("Running:", " ".join(cmd))
-    subprocess.check_call(cmd)
+def build_steps(run_id: str):
+    steps = []
+    for f in SQL_FILES:
+        if f == FULL_TRANSFORM and TRANSFORM_MODE == "incremental":
+            sql = Path(INCREMENTAL_TRANSFORM).read_text(encoding="utf-8")
+            steps.append(Step(INCREMENTAL_TRANSFORM,
+                              sql + "\n" + incremental_call(LOOKBACK_DAYS, BACKFILL_FROM, BACKFILL_TO)))
+            continue
+        steps.append(Step.from_file(f))
+    # Tests go last, after every other step
+    steps.append(Step("dq.run_all_tests", f"CALL dq.run_all_tests('{run_id}');", depends=["*"]))
+    return steps
 
 def main():
     for v in [PGHOST, PGUSER, PGDATABASE]:
         if not v:
             raise SystemExit("Set PGHOST, PGUSER, PGDATABASE (and PGPASSWORD if needed).")
 
+    if TRANSFORM_MODE not in ("full", "incremental"):
+        raise SystemExit(f"Unknown TRANSFORM_MODE={TRANSFORM_MODE!r} (expected full|incremental)")
+
     run_id = "sqlrun_" + datetime.utcnow().strftime("%Y%m%d_%H%M%S")
-    for f in SQL_FILES:
-        run_psql(f)
+    pool = ThreadedConnectionPool(1, SQL_WORKFLOW_WORKERS, "")
+    try:
+        run_workflow(pool, build_steps(run_id), run_id, SQL_WORKFLOW_WORKERS, SQL_WORKFLOW_SKIP_UNCHANGED)
+    finally:
+        pool.closeall()
 
-    run_tests(run_id)
-    print(f"SQL workflow complete. run_id={run_id}")
+    print(f"SQL workflow complete. run_id={run_id} transform_mode={TRANSFORM_MODE}")
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,79 @@
+import io
+import os
+from datetime import datetime
+import pandas as pd
+import psycopg2
+
+# Loads a full zone snapshot into mdm.stg_zone_updates with COPY and applies it to
+# mdm.dim_zone_scd2 with one CALL.
+#   SCD2_PROC=set  -> mdm.apply_zone_scd2_from_stage_set  (sql/50_scd/511, set-based)
+#   SCD2_PROC=loop -> mdm.apply_zone_scd2_from_stage      (sql/50_scd/510, row by row)
+
+PG_HOST = os.getenv("PG_HOST", "localhost")
+PG_PORT = int(os.getenv("PG_PORT", "5432"))
+PG_DB   = os.getenv("PG_DB", "postgres")
+PG_USER = os.getenv("PG_USER", "postgres")
+PG_PASS = os.getenv("PG_PASS", "postgres")
+
+SNAPSHOT = os.getenv("ZONES_SNAPSHOT", "taxi_zone_lookup.csv")
+SCD2_PROC = os.getenv("SCD2_PROC", "set")
+CHANGED_BY = os.getenv("CHANGED_BY", "scd2_loader")
+CHANGE_REASON = os.getenv("CHANGE_REASON", "Snapshot load")
+CHANGE_SOURCE = os.getenv("CHANGE_SOURCE", "TLC")
+CHANGE_BATCH_ID = os.getenv("CHANGE_BATCH_ID", datetime.utcnow().strftime("zone_%Y%m%d_%H%M%S"))
+
+PROCS = {
+    "set": "mdm.apply_zone_scd2_from_stage_set",
+    "loop": "mdm.apply_zone_scd2_from_stage",
+}
+
+STAGE_COLS = ["location_id", "borough", "zone", "service_zone", "change_batch_id"]
+
+def connect():
+    return psycopg2.connect(host=PG_HOST, port=PG_PORT, dbname=PG_DB, user=PG_USER, password=PG_PASS)
+
+def read_snapshot(path: str) -> pd.DataFrame:
+    df = pd.read_parquet(path) if path.endswith(".parquet") else pd.read_csv(path)
+    df = df.rename(columns={"LocationID": "location_id", "Borough": "borough",
+                            "Zone": "zone", "service_zone": "service_zone"})
+    df["change_batch_id"] = CHANGE_BATCH_ID
+    # Stage is keyed by location_id: last row of a duplicated key wins
+    return df.drop_duplicates("location_id", keep="last")[STAGE_COLS]
+
+def copy_stage(cur, df: pd.DataFrame):
+    buf = io.StringIO()
+    df.to_csv(buf, index=False, header=False)
+    buf.seek(0)
+    cur.execute("TRUNCATE TABLE mdm.stg_zone_updates;")
+    cur.copy_expert(
+        f"COPY mdm.stg_zone_updates ({', '.join(STAGE_COLS)}) FROM STDIN WITH (FORMAT csv)",
+        buf, size=1 << 20,
+    )
+
+def main():
+    if SCD2_PROC not in PROCS:
+        raise SystemExit(f"Unknown SCD2_PROC={SCD2_PROC!r} (expected one of {sorted(PROCS)})")
+
+    df = read_snapshot(SNAPSHOT)
+    conn = connect()
+    try:
+        with conn.cursor() as cur:
+            t0 = datetime.utcnow()
+            copy_stage(cur, df)
+            cur.execute(f"CALL {PROCS[SCD2_PROC]}(%s, %s, %s);", (CHANGED_BY, CHANGE_REASON, CHANGE_SOURCE))
+            cur.execute("""
+              SELECT COUNT(*) FROM mdm.master_version_audit
+              WHERE domain = 'zone' AND details->>'batch' = %s;
+            """, (CHANGE_BATCH_ID,))
+            versions = cur.fetchone()[0]
+        conn.commit()
+        elapsed = (datetime.utcnow() - t0).total_seconds()
+        for n in conn.notices:
+            print(n.strip())
+        print(f"Applied {len(df)} snapshot rows via {PROCS[SCD2_PROC]} in {elapsed:.2f}s "
+              f"({versions} new versions, batch={CHANGE_BATCH_ID})")
+    finally:
+        conn.close()
+
+if __name__ == "__main__":
+    main()
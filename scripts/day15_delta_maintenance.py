@@ -0,0 +1,203 @@
+import os
+import json
+import time
+from pathlib import Path
+from datetime import datetime
+import numpy as np
+import pyarrow as pa
+
+# Delta table maintenance for the local curated/SCD2 tables: bin-pack compaction,
+# Z-order, log checkpoint + log cleanup, and VACUUM behind a retention guard.
+# File count / size distribution is reported before and after every run.
+#
+#   MAINT_ENGINE=rs     -> deltalake (delta-rs) DeltaTable API, no JVM needed
+#   MAINT_ENGINE=spark  -> delta-spark (OPTIMIZE / ZORDER BY / VACUUM)
+
+MAINT_ENGINE = os.getenv("MAINT_ENGINE", "rs")
+MAINT_ACTIONS = [a.strip() for a in os.getenv("MAINT_ACTIONS", "optimize,checkpoint,vacuum").split(",") if a.strip()]
+TARGET_FILE_MB = int(os.getenv("TARGET_FILE_MB", "128"))
+
+# Tables and their Z-order columns; DELTA_PATHS/ZORDER_COLUMNS override for ad-hoc runs
+TABLES = {
+    "tmp/delta_yellow_curated": ["PULocationID", "tpep_pickup_datetime"],
+    "tmp/delta_zone_scd2": ["location_id"],
+}
+DELTA_PATHS = os.getenv("DELTA_PATHS")
+ZORDER_COLUMNS = os.getenv("ZORDER_COLUMNS")  # comma list; "" disables Z-order (compaction only)
+
+# VACUUM deletes files no longer referenced by versions newer than the retention window;
+# time travel / RESTORE past that window stops working. Below the guard needs VACUUM_FORCE=1.
+VACUUM_RETENTION_HOURS = int(os.getenv("VACUUM_RETENTION_HOURS", "168"))
+VACUUM_MIN_RETENTION_HOURS = 168
+VACUUM_FORCE = os.getenv("VACUUM_FORCE", "0") == "1"
+VACUUM_DRY_RUN = os.getenv("VACUUM_DRY_RUN", "0") == "1"
+
+OUT_JSON = os.getenv("MAINT_OUT", "docs/delta_maintenance_report.json")
+
+def tables_to_maintain():
+    if DELTA_PATHS:
+        paths = [p.strip() for p in DELTA_PATHS.split(",") if p.strip()]
+        return {p: TABLES.get(p, []) for p in paths} if ZORDER_COLUMNS is None else \
+            {p: [c.strip() for c in ZORDER_COLUMNS.split(",") if c.strip()] for p in paths}
+    if ZORDER_COLUMNS is not None:
+        return {p: [c.strip() for c in ZORDER_COLUMNS.split(",") if c.strip()] for p in TABLES}
+    return dict(TABLES)
+
+def size_report(sizes, target_bytes: int):
+    sizes = np.asarray(sizes, dtype=np.int64)
+    if not len(sizes):
+        return {"files": 0, "total_bytes": 0}
+    p = np.percentile(sizes, [10, 50, 90]).astype(int).tolist()
+    return {
+        "files": int(len(sizes)),
+        "total_bytes": int(sizes.sum()),
+        "min_bytes": int(sizes.min()),
+        "p10_bytes": p[0],
+        "p50_bytes": p[1],
+        "p90_bytes": p[2],
+        "max_bytes": int(sizes.max()),
+        # files under a quarter of the target are what compaction is for
+        "small_files": int((sizes < target_bytes // 4).sum()),
+    }
+
+def check_retention():
+    if VACUUM_RETENTION_HOURS < VACUUM_MIN_RETENTION_HOURS and not VACUUM_FORCE:
+        raise SystemExit(
+            f"VACUUM_RETENTION_HOURS={VACUUM_RETENTION_HOURS} is below the {VACUUM_MIN_RETENTION_HOURS}h guard; "
+            "older versions would lose their files. Set VACUUM_FORCE=1 if that is intended.")
+
+# ---- delta-rs ----
+def rs_file_sizes(dt):
+    return pa.table(dt.get_add_actions(flatten=True)).column("size_bytes").to_numpy()
+
+def rs_maintain(path: str, zorder_cols, target_bytes: int):
+    from deltalake import DeltaTable
+
+    dt = DeltaTable(path)
+    out = {"version_before": dt.version(), "before": size_report(rs_file_sizes(dt), target_bytes), "actions": {}}
+
+    if "optimize" in MAINT_ACTIONS:
+        # Z-order rewrites (and bin-packs) every file; plain compaction only merges small ones
+        if zorder_cols:
+            metrics = dt.optimize.z_order(zorder_cols, target_size=target_bytes)
+            out["actions"]["zorder"] = {"columns": zorder_cols, "metrics": metrics}
+        else:
+            metrics = dt.optimize.compact(target_size=target_bytes)
+            out["actions"]["compact"] = {"metrics": metrics}
+    if "checkpoint" in MAINT_ACTIONS:
+        dt = DeltaTable(path)
+        dt.create_checkpoint()
+        dt.cleanup_metadata()  # drop log files older than delta.logRetentionDuration
+        out["actions"]["checkpoint"] = {"version": dt.version()}
+    if "vacuum" in MAINT_ACTIONS:
+        removed = DeltaTable(path).vacuum(
+            retention_hours=VACUUM_RETENTION_HOURS,
+            dry_run=VACUUM_DRY_RUN,
+            enforce_retention_duration=not VACUUM_FORCE,
+        )
+        out["actions"]["vacuum"] = {"retention_hours": VACUUM_RETENTION_HOURS, "dry_run": VACUUM_DRY_RUN,
+                                    "files_removed": len(removed)}
+
+    dt = DeltaTable(path)
+    out["version_after"] = dt.version()
+    out["after"] = size_report(rs_file_sizes(dt), target_bytes)
+    return out
+
+# ---- Spark ----
+def spark_session(target_bytes: int):
+    from pyspark.sql import SparkSession
+    from delta import configure_spark_with_delta_pip
+
+    builder = (
+        SparkSession.builder
+        .appName("Day15 Delta Maintenance")
+        .config("spark.sql.extensions", "io.delta.sql.DeltaSparkSessionExtension")
+        .config("spark.sql.catalog.spark_catalog", "org.apache.spark.sql.delta.catalog.DeltaCatalog")
+        .config("spark.databricks.delta.optimize.maxFileSize", str(target_bytes))
+        .config("spark.databricks.delta.retentionDurationCheck.enabled", str(not VACUUM_FORCE).lower())
+    )
+    return configure_spark_with_delta_pip(builder).getOrCreate()
+
+def spark_file_sizes(spark, path: str):
+    jvm = spark._jvm
+    conf = spark._jsc.hadoopConfiguration()
+    sizes = []
+    for f in spark.read.format("delta").load(path).inputFiles():
+        p = jvm.org.apache.hadoop.fs.Path(f)
+        sizes.append(p.getFileSystem(conf).getFileStatus(p).getLen())
+    return sizes
+
+def spark_maintain(spark, path: str, zorder_cols, target_bytes: int):
+    from delta.tables import DeltaTable
+
+    dt = DeltaTable.forPath(spark, path)
+    version = lambda: dt.history(1).first()["version"]
+    out = {"version_before": version(), "before": size_report(spark_file_sizes(spark, path), target_bytes),
+           "actions": {}}
+
+    if "optimize" in MAINT_ACTIONS:
+        optimizer = dt.optimize()
+        metrics = optimizer.executeZOrderBy(*zorder_cols) if zorder_cols else optimizer.executeCompaction()
+        out["actions"]["zorder" if zorder_cols else "compact"] = {
+            "columns": zorder_cols, "metrics": metrics.first()["metrics"].asDict(recursive=True)}
+    if "checkpoint" in MAINT_ACTIONS:
+        # delta-spark checkpoints every delta.checkpointInterval commits; force one now
+        spark._jvm.org.apache.spark.sql.delta.DeltaLog.forTable(spark._jsparkSession, path).checkpoint()
+        out["actions"]["checkpoint"] = {"version": version()}
+    if "vacuum" in MAINT_ACTIONS:
+        if VACUUM_DRY_RUN:
+            n = spark.sql(f"VACUUM delta.`{path}` RETAIN {VACUUM_RETENTION_HOURS} HOURS DRY RUN").count()
+        else:
+            dt.vacuum(VACUUM_RETENTION_HOURS)
+            n = None
+        out["actions"]["vacuum"] = {"retention_hours": VACUUM_RETENTION_HOURS, "dry_run": VACUUM_DRY_RUN,
+                                    "files_removed": n}
+
+    out["version_after"] = version()
+    out["after"] = size_report(spark_file_sizes(spark, path), target_bytes)
+    return out
+
+def main():
+    target_bytes = TARGET_FILE_MB * 1024 * 1024
+    tables = tables_to_maintain()
+    if MAINT_ENGINE not in ("rs", "spark"):
+        raise SystemExit(f"Unknown MAINT_ENGINE={MAINT_ENGINE!r} (expected rs|spark)")
+    if "vacuum" in MAINT_ACTIONS:
+        check_retention()  # fail before any table is touched
+    spark = spark_session(target_bytes) if MAINT_ENGINE == "spark" else None
+
+    results = {}
+    try:
+        for path, zorder_cols in tables.items():
+            if not Path(path).exists() and "://" not in path:
+                print(f"Skipping {path}: not found")
+                continue
+            t0 = time.time()
+            if spark is not None:
+                r = spark_maintain(spark, path, zorder_cols, target_bytes)
+            else:
+                r = rs_maintain(path, zorder_cols, target_bytes)
+            r["seconds"] = round(time.time() - t0, 2)
+            results[path] = r
+            b, a = r["before"], r["after"]
+            print(f"{path}: files {b['files']} -> {a['files']}, "
+                  f"p50 {b.get('p50_bytes', 0) // 1024} KB -> {a.get('p50_bytes', 0) // 1024} KB, "
+                  f"small files {b.get('small_files', 0)} -> {a.get('small_files', 0)} "
+                  f"(v{r['version_before']} -> v{r['version_after']}, {r['seconds']}s)")
+    finally:
+        if spark is not None:
+            spark.stop()
+
+    report = {
+        "generated_utc": datetime.utcnow().isoformat() + "Z",
+        "engine": MAINT_ENGINE,
+        "actions": MAINT_ACTIONS,
+        "target_file_mb": TARGET_FILE_MB,
+        "tables": results,
+    }
+    Path(OUT_JSON).parent.mkdir(parents=True, exist_ok=True)
+    Path(OUT_JSON).write_text(json.dumps(report, indent=2, default=str), encoding="utf-8")
+    print(f"Wrote maintenance report: {OUT_JSON}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+import os
+import sys
+import json
+import time
+import subprocess
+from pathlib import Path
+from datetime import datetime
+import psycopg2
+import pyarrow.parquet as pq
+
+# Compares the execute_values and COPY paths of day3_load_parquet_to_postgres.py.
+# Each mode runs in its own child process so peak RSS is measured per run.
+
+PARQUET_PATH = os.getenv("TRIPS_PARQUET", "yellow_tripdata_2025-08.parquet")
+BENCH_TABLE = os.getenv("BENCH_TABLE", "staging.yellow_trips_bench")
+MODES = os.getenv("BENCH_MODES", "insert,copy").split(",")
+OUT_JSON = os.getenv("BENCH_OUT", "docs/benchmarks/day3_parquet_load.json")
+
+PG_HOST = os.getenv("PG_HOST", "localhost")
+PG_PORT = int(os.getenv("PG_PORT", "5432"))
+PG_DB = os.getenv("PG_DB", "postgres")
+PG_USER = os.getenv("PG_USER", "postgres")
+PG_PASS = os.getenv("PG_PASS", "postgres")
+
+LOADER = Path(__file__).resolve().parents[1] / "day3_load_parquet_to_postgres.py"
+
+def connect():
+    return psycopg2.connect(host=PG_HOST, port=PG_PORT, dbname=PG_DB, user=PG_USER, password=PG_PASS)
+
+def reset_bench_table():
+    conn = connect()
+    try:
+        with conn.cursor() as cur:
+            cur.execute(f"DROP TABLE IF EXISTS {BENCH_TABLE};")
+            cur.execute(f"CREATE TABLE {BENCH_TABLE} (LIKE staging.yellow_trips INCLUDING DEFAULTS);")
+        conn.commit()
+    finally:
+        conn.close()
+
+def count_rows():
+    conn = connect()
+    try:
+        with conn.cursor() as cur:
+            cur.execute(f"SELECT COUNT(*) FROM {BENCH_TABLE};")
+            return cur.fetchone()[0]
+    finally:
+        conn.close()
+
+def run_mode(mode: str):
+    reset_bench_table()
+    env = {**os.environ, "LOAD_MODE": mode, "LOAD_TABLE": BENCH_TABLE, "TRIPS_PARQUET": PARQUET_PATH,
+           "LOAD_CHECKPOINT": "0"}
+
+    t0 = time.time()
+    proc = subprocess.Popen([sys.executable, str(LOADER)], env=env, stdout=subprocess.DEVNULL)
+    _, status, usage = os.wait4(proc.pid, 0)
+    elapsed = time.time() - t0
+    if os.waitstatus_to_exitcode(status) != 0:
+        raise SystemExit(f"Loader failed in mode={mode}")
+
+    # ru_maxrss is KiB on Linux, bytes on macOS
+    peak_rss_mb = usage.ru_maxrss / (1024 * 1024 if sys.platform == "darwin" else 1024)
+    rows = count_rows()
+    return {
+        "mode": mode,
+        "rows": rows,
+        "seconds": round(elapsed, 2),
+        "rows_per_sec": round(rows / elapsed) if elapsed else None,
+        "peak_rss_mb": round(peak_rss_mb, 1),
+    }
+
+def main():
+    Path(OUT_JSON).parent.mkdir(parents=True, exist_ok=True)
+
+    meta = pq.ParquetFile(PARQUET_PATH).metadata
+    results = [run_mode(m.strip()) for m in MODES if m.strip()]
+
+    report = {
+        "generated_utc": datetime.utcnow().isoformat() + "Z",
+        "input": {"parquet": PARQUET_PATH, "rows": meta.num_rows, "row_groups": meta.num_row_groups},
+        "results": results,
+    }
+
+    with connect() as conn, conn.cursor() as cur:
+        cur.execute(f"DROP TABLE IF EXISTS {BENCH_TABLE};")
+
+    Path(OUT_JSON).write_text(json.dumps(report, indent=2), encoding="utf-8")
+    for r in results:
+        print(f"{r['mode']:>8}: {r['rows']} rows in {r['seconds']}s "
+              f"({r['rows_per_sec']:,} rows/s), peak RSS {r['peak_rss_mb']} MB")
+    print(f"Wrote benchmark report: {OUT_JSON}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+import os
+import sys
+import json
+import time
+import random
+from pathlib import Path
+from datetime import datetime
+import pandas as pd
+
+# Times the fuzzy zone-duplicate backends of day4_match_duplicates.py on synthetic zone
+# lists built from the TLC lookup: real zone names extended with random place words,
+# spread over the real (borough, service_zone) groups, with a share of near-duplicates
+# (typo'd copies of earlier names) planted in the same group.
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+from day4_match_duplicates import MATCH_RULES, add_normalized, fuzzy_candidates
+from common.matching import load_match_config
+
+ZONES_CSV = os.getenv("ZONES_CSV", "taxi_zone_lookup.csv")
+SIZES = [int(x) for x in os.getenv("BENCH_SIZES", "10000,100000,1000000").split(",") if x.strip()]
+BACKENDS = os.getenv("BENCH_BACKENDS", "difflib,rapidfuzz").split(",")
+# difflib is quadratic pure Python: only run it up to this many names
+DIFFLIB_MAX = int(os.getenv("BENCH_DIFFLIB_MAX", "10000"))
+DUP_RATE = float(os.getenv("BENCH_DUP_RATE", "0.05"))
+SEED = int(os.getenv("BENCH_SEED", "42"))
+OUT_JSON = os.getenv("BENCH_OUT", "docs/benchmarks/day4_zone_matching.json")
+
+def typo(rng, s):
+    if len(s) < 3:
+        return s
+    i = rng.randrange(len(s) - 1)
+    op = rng.choice("dsi")
+    if op == "d":
+        return s[:i] + s[i+1:]
+    if op == "s":
+        return s[:i] + s[i+1] + s[i] + s[i+2:]
+    return s[:i] + rng.choice("abcdefghijklmnopqrstuvwxyz") + s[i:]
+
+def place_word(rng):
+    syllables = ["ber", "ton", "wood", "ville", "mar", "ash", "glen", "ford", "lin", "dale",
+                 "ham", "ridge", "oak", "stone", "bro", "kes", "wick", "ly", "ra", "mont"]
+    return "".join(rng.choice(syllables) for _ in range(rng.randint(2, 3))).title()
+
+def synthetic_zones(base: pd.DataFrame, n: int, seed: int = SEED) -> pd.DataFrame:
+    rng = random.Random(seed)
+    groups = base.dropna(subset=["Zone"]).groupby(["Borough", "service_zone"])["Zone"].apply(list).to_dict()
+    keys = list(groups)
+    rows = []
+    for i in range(n):
+        if rows and rng.random() < DUP_RATE:
+            src = rows[rng.randrange(len(rows))]
+            borough, service, zone = src["Borough"], src["service_zone"], typo(rng, src["Zone"])
+        else:
+            borough, service = rng.choice(keys)
+            zone = f"{rng.choice(groups[(borough, service)])} {place_word(rng)} {place_word(rng)}"
+        rows.append({"LocationID": i + 1, "Borough": borough, "Zone": zone, "service_zone": service})
+    return pd.DataFrame(rows)
+
+def run(df: pd.DataFrame, backend: str, config):
+    t0 = time.time()
+    df = add_normalized(df.copy(), config)
+    fuzzy = fuzzy_candidates(df, config, backend=backend)
+    elapsed = time.time() - t0
+    return {
+        "backend": backend,
+        "names": len(df),
+        "fuzzy_pairs": len(fuzzy),
+        "seconds": round(elapsed, 2),
+        "names_per_sec": round(len(df) / elapsed) if elapsed else None,
+    }
+
+def main():
+    Path(OUT_JSON).parent.mkdir(parents=True, exist_ok=True)
+    base = pd.read_csv(ZONES_CSV)
+    config = load_match_config(MATCH_RULES)
+
+    results = []
+    for n in SIZES:
+        df = synthetic_zones(base, n)
+        for backend in (b.strip() for b in BACKENDS if b.strip()):
+            if backend == "difflib" and n > DIFFLIB_MAX:
+                results.append({"backend": backend, "names": n, "skipped": f"> BENCH_DIFFLIB_MAX={DIFFLIB_MAX}"})
+                continue
+            r = run(df, backend, config)
+            results.append(r)
+            print(f"{backend:>10} n={n:>8}: {r['fuzzy_pairs']} pairs in {r['seconds']}s")
+
+    report = {
+        "generated_utc": datetime.utcnow().isoformat() + "Z",
+        "input": {"zones_csv": ZONES_CSV, "sizes": SIZES, "dup_rate": DUP_RATE, "seed": SEED,
+                  "similarity_threshold": config.review_threshold},
+        "results": results,
+    }
+    Path(OUT_JSON).write_text(json.dumps(report, indent=2), encoding="utf-8")
+    print(f"Wrote benchmark report: {OUT_JSON}")
+
+if __name__ == "__main__":
+    main()
@@ -1,31 +1,99 @@
 import os
-import re
+import sys
 import json
 from pathlib import Path
 from datetime import datetime
 import pandas as pd
 from difflib import SequenceMatcher
 
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from common.matching import find_matches, load_match_config
+
 ZONES_CSV = os.getenv("ZONES_CSV", "taxi_zone_lookup.csv")
 OUT_JSON = os.getenv("DUP_OUT", "docs/zone_duplicate_candidates.json")
+MATCH_RULES = os.getenv("MATCH_RULES", "governance/match_merge.yaml")
 
-def norm_text(s: str) -> str:
-    s = "" if pd.isna(s) else str(s)
-    s = s.strip().lower()
-    s = re.sub(r"\s+", " ", s)
-    s = re.sub(r"[^a-z0-9 ]", "", s)
-    return s
+# difflib   = pure-Python SequenceMatcher over every pair in a group (reference)
+# rapidfuzz = shared common.matching fast path: configured fields/scorers, batched cdist
+#             with the threshold as score_cutoff
+MATCH_BACKEND = os.getenv("MATCH_BACKEND", "rapidfuzz")
+# Groups up to this size are compared all-vs-all; larger ones are token/prefix blocked first
+FULL_GROUP_MAX = int(os.getenv("MATCH_FULL_GROUP_MAX", "5000"))
+ZONE_BLOCKING = os.getenv("MATCH_BLOCKING", "token,prefix")
+MAX_BLOCK_SIZE = int(os.getenv("MATCH_MAX_BLOCK_SIZE", "5000"))
+MATCH_WORKERS = int(os.getenv("MATCH_WORKERS", str(os.cpu_count() or 1)))
 
 def sim(a: str, b: str) -> float:
     return SequenceMatcher(None, a, b).ratio()
 
+def add_normalized(df, config):
+    # Same compiled normalization as every other matching domain, once per column
+    for col, out in (("Borough", "borough_n"), ("Zone", "zone_n"), ("service_zone", "service_n")):
+        df[out] = config.normalizer.list(df[col])
+    return df
+
+def pairs_difflib(names, threshold):
+    n = len(names)
+    for i in range(n):
+        for j in range(i+1, n):
+            a = names[i]
+            b2 = names[j]
+            if not a or not b2:
+                continue
+            score = sim(a, b2)
+            if score >= threshold and a != b2:
+                yield i, j, score
+
+def fuzzy_entry(za, zb, score):
+    return {
+        "type": "fuzzy_zone_duplicate",
+        "borough": za["Borough"],
+        "service_zone": za["service_zone"],
+        "score": round(score, 4),
+        "a": za,
+        "b": zb
+    }
+
+def fuzzy_difflib(df, config):
+    fuzzy = []
+    for (b, s), g in df.groupby(["borough_n", "service_n"]):
+        zones = g[["LocationID","Zone","zone_n","Borough","service_zone"]].to_dict(orient="records")
+        if len(zones) < 2:
+            continue
+        for i, j, score in pairs_difflib([z["zone_n"] for z in zones], config.review_threshold):
+            fuzzy.append(fuzzy_entry(zones[i], zones[j], score))
+    return fuzzy
+
+def fuzzy_rapidfuzz(df, config):
+    columns = {c: df[c] for c in {f.column for f in config.fields} | set(config.block_on)}
+    matches, stats = find_matches(config, columns, blocking=ZONE_BLOCKING, workers=MATCH_WORKERS,
+                                  max_block_size=MAX_BLOCK_SIZE, full_group_max=FULL_GROUP_MAX)
+    print(f"Matching stats: {stats}")
+
+    zones = df[["LocationID","Zone","zone_n","Borough","service_zone"]].to_dict(orient="records")
+    group = list(zip(df["borough_n"], df["service_n"]))
+    pos = {i: n for n, i in enumerate(sorted(range(len(df)), key=lambda i: group[i]))}
+    fuzzy = []
+    # Report order: by group, then record order (as the difflib reference)
+    for m in sorted(matches, key=lambda m: (group[m.left], pos[m.left], pos[m.right])):
+        a, b = zones[m.left], zones[m.right]
+        if a["zone_n"] != b["zone_n"]:  # identical names are exact duplicates, reported above
+            fuzzy.append(fuzzy_entry(a, b, m.confidence))
+    return fuzzy
+
+BACKENDS = {"difflib": fuzzy_difflib, "rapidfuzz": fuzzy_rapidfuzz}
+
+def fuzzy_candidates(df, config, backend=MATCH_BACKEND):
+    # Same borough+service_zone, zone strings very similar
+    if backend not in BACKENDS:
+        raise SystemExit(f"Unknown MATCH_BACKEND={backend!r} (expected one of {sorted(BACKENDS)})")
+    return BACKENDS[backend](df, config)
+
 def main():
     Path("docs").mkdir(exist_ok=True)
 
-    df = pd.read_csv(ZONES_CSV)
-    df["borough_n"] = df["Borough"].map(norm_text)
-    df["zone_n"] = df["Zone"].map(norm_text)
-    df["service_n"] = df["service_zone"].map(norm_text)
+    config = load_match_config(MATCH_RULES)
+    df = add_normalized(pd.read_csv(ZONES_CSV), config)
 
     # 1) Exact duplicate candidates on normalized composite
     df["composite"] = df["borough_n"] + "|" + df["zone_n"] + "|" + df["service_n"]
@@ -41,33 +109,14 @@ def main():
             })
 
     # 2) Fuzzy: same borough+service_zone, zone strings very similar
-    fuzzy = []
-    threshold = 0.92
-    for (b, s), g in df.groupby(["borough_n", "service_n"]):
-        zones = g[["LocationID","Zone","zone_n","Borough","service_zone"]].to_dict(orient="records")
-        n = len(zones)
-        if n < 2:
-            continue
-        for i in range(n):
-            for j in range(i+1, n):
-                a = zones[i]["zone_n"]
-                b2 = zones[j]["zone_n"]
-                if not a or not b2:
-                    continue
-                score = sim(a, b2)
-                if score >= threshold and a != b2:
-                    fuzzy.append({
-                        "type": "fuzzy_zone_duplicate",
-                        "borough": zones[i]["Borough"],
-                        "service_zone": zones[i]["service_zone"],
-                        "score": round(score, 4),
-                        "a": zones[i],
-                        "b": zones[j]
-                    })
+    threshold = config.review_threshold
+    fuzzy = fuzzy_candidates(df, config)
 
     report = {
         "generated_utc": datetime.utcnow().isoformat() + "Z",
         "input": ZONES_CSV,
+        "backend": MATCH_BACKEND,
+        "similarity_threshold": threshold,
         "exact_candidates": exact,
         "fuzzy_candidates": fuzzy,
         "counts": {
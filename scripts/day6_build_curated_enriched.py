@@ -1,7 +1,11 @@
 import os
 import json
 import boto3
+import numpy as np
 import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
 from pathlib import Path
 from datetime import datetime
 
@@ -15,16 +19,76 @@ OUT_LOCAL = os.getenv("CURATED_OUT", "tmp/curated_yellow_2025-08_enriched.parque
 S3_KEY = os.getenv("CURATED_S3_KEY", "curated/yellow/2025/08/yellow_tripdata_2025-08_curated.parquet")
 LINEAGE_KEY = os.getenv("CURATED_LINEAGE_KEY", "lineage/yellow/2025/08/build_curated.json")
 
-def main():
-    if not BUCKET:
-        raise SystemExit("Set NYC_BUCKET env var.")
-
-    Path("tmp").mkdir(exist_ok=True)
-
-    zones = pd.read_csv(ZONES_CSV)
-    zones = zones.rename(columns={"LocationID":"LocationID","Borough":"Borough","Zone":"Zone","service_zone":"service_zone"})
-    zones = zones[["LocationID","Borough","Zone","service_zone"]].copy()
-
+# merge  = two pandas merges against the zone table (original path)
+# stream = per row group gather from dense LocationID-indexed arrays into
+#          dictionary-encoded (categorical) zone columns
+ENRICH_MODE = os.getenv("ENRICH_MODE", "merge")
+
+ZONE_ATTRS = ["Borough", "Zone", "service_zone"]
+
+# Minutes per duration unit, for trip_duration_minutes on Arrow timestamps
+UNITS_PER_MINUTE = {"s": 60, "ms": 60_000, "us": 60_000_000, "ns": 60_000_000_000}
+
+class ZoneDictionary:
+    # ~265 zones: per attribute, an int32 code array indexed by LocationID plus the
+    # distinct values. Enriching a batch is then one numpy gather per column.
+    def __init__(self, zones: pd.DataFrame):
+        zones = zones.dropna(subset=["LocationID"])
+        ids = zones["LocationID"].astype(np.int64).to_numpy()
+        self.size = int(ids.max()) + 1 if len(ids) else 0
+        self.known = np.zeros(self.size, dtype=bool)
+        self.known[ids] = True
+        self.attrs = {}
+        for attr in ZONE_ATTRS:
+            cat = pd.Categorical(zones[attr])
+            codes = np.full(self.size, -1, dtype=np.int32)
+            codes[ids] = cat.codes
+            self.attrs[attr] = (codes, pa.array(cat.categories.astype(str), type=pa.string()))
+
+    def columns(self, location_ids, prefix: str):
+        keys = pc.cast(pc.fill_null(location_ids, -1), pa.int64(), safe=False).to_numpy(zero_copy_only=False)
+        in_range = (keys >= 0) & (keys < self.size)
+        safe = np.where(in_range, keys, 0)
+        found = in_range & self.known[safe]
+
+        out = {f"{prefix}LocationID": pa.array(np.where(found, keys, 0).astype(np.int32), mask=~found)}
+        for attr, (codes, dictionary) in self.attrs.items():
+            idx = codes[safe]
+            valid = found & (idx >= 0)
+            indices = pa.array(np.where(valid, idx, 0), type=pa.int32(), mask=~valid)
+            out[f"{prefix}{attr}"] = pa.DictionaryArray.from_arrays(indices, dictionary)
+        return out
+
+def trip_duration_minutes(table):
+    pickup, dropoff = table.column("tpep_pickup_datetime"), table.column("tpep_dropoff_datetime")
+    unit = pickup.type.unit
+    delta = pc.cast(pc.subtract(dropoff, pickup), pa.int64())
+    return pc.divide(pc.cast(delta, pa.float64()), float(UNITS_PER_MINUTE[unit]))
+
+def enrich_stream(zone_dict: ZoneDictionary):
+    pf = pq.ParquetFile(VALIDATED_LOCAL)
+    has_ts = {"tpep_pickup_datetime", "tpep_dropoff_datetime"} <= set(pf.schema_arrow.names)
+    writer = None
+    rows = 0
+    try:
+        for rg in range(pf.num_row_groups):
+            table = pf.read_row_group(rg)
+            for prefix, id_col in [("PU_", "PULocationID"), ("DO_", "DOLocationID")]:
+                for name, arr in zone_dict.columns(table.column(id_col), prefix).items():
+                    table = table.append_column(name, arr)
+            if has_ts:
+                table = table.append_column("trip_duration_minutes", trip_duration_minutes(table))
+
+            if writer is None:
+                writer = pq.ParquetWriter(OUT_LOCAL, table.schema)
+            writer.write_table(table)
+            rows += table.num_rows
+    finally:
+        if writer is not None:
+            writer.close()
+    return rows
+
+def enrich_merge(zones: pd.DataFrame):
     df = pd.read_parquet(VALIDATED_LOCAL)
 
     # Enrich PU
@@ -49,6 +113,24 @@ def main():
         df["trip_duration_minutes"] = dur
 
     df.to_parquet(OUT_LOCAL, index=False)
+    return len(df)
+
+def main():
+    if not BUCKET:
+        raise SystemExit("Set NYC_BUCKET env var.")
+
+    Path("tmp").mkdir(exist_ok=True)
+
+    zones = pd.read_csv(ZONES_CSV)
+    zones = zones[["LocationID","Borough","Zone","service_zone"]].copy()
+
+    if ENRICH_MODE == "stream":
+        rows = enrich_stream(ZoneDictionary(zones))
+    elif ENRICH_MODE == "merge":
+        rows = enrich_merge(zones)
+    else:
+        raise SystemExit(f"Unknown ENRICH_MODE={ENRICH_MODE} (expected merge|stream)")
+    print(f"Enriched {rows} rows ({ENRICH_MODE}) -> {OUT_LOCAL}")
 
     s3 = boto3.client("s3", region_name=AWS_REGION)
     s3.upload_file(OUT_LOCAL, BUCKET, S3_KEY)
@@ -60,7 +142,8 @@ def main():
             {"local_parquet": VALIDATED_LOCAL},
             {"local_csv": ZONES_CSV}
         ],
-        "output": {"s3": f"s3://{BUCKET}/{S3_KEY}"},
+        "output": {"s3": f"s3://{BUCKET}/{S3_KEY}", "rows": rows},
+        "mode": ENRICH_MODE,
         "transformations": [
             "join PULocationID to zones",
             "join DOLocationID to zones",
@@ -1,37 +1,52 @@
 import os
-import pandas as pd
+import sys
 from pathlib import Path
+import pyarrow.dataset as ds
+import pyarrow.compute as pc
 from deltalake import write_deltalake, DeltaTable
 
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from common import delta_access  # noqa: E402
+
 CURATED_LOCAL = os.getenv("CURATED_LOCAL", "tmp/curated_yellow_2025-08_enriched.parquet")
 DELTA_PATH = os.getenv("DELTA_PATH", "tmp/delta_yellow_curated")
+# Example audit filter for the pushed-down time-travel read
+AUDIT_PU_LOCATION = int(os.getenv("AUDIT_PU_LOCATION", "132"))
+
+def curated_batches():
+    # Streamed record batches; the curated file is never held in memory as a whole
+    dataset = ds.dataset(CURATED_LOCAL, format="parquet")
+    return dataset.scanner().to_reader()
 
 def main():
     Path("tmp").mkdir(exist_ok=True)
 
-    df = pd.read_parquet(CURATED_LOCAL)
-
     # Write initial version (v0)
-    write_deltalake(DELTA_PATH, df, mode="overwrite")
+    write_deltalake(DELTA_PATH, curated_batches(), mode="overwrite")
     print(f"Delta written at: {DELTA_PATH} (version 0)")
 
-    # Simulate a change: add a column (or update a few rows)
-    df2 = df.copy()
-    df2["audit_note"] = "day6_append"
-    # Ensure columns match original schema for append
-    df2 = df2[df.columns.tolist()]
-    write_deltalake(DELTA_PATH, df2, mode="append")
+    # Simulate a change: append the same curated rows again (same schema)
+    write_deltalake(DELTA_PATH, curated_batches(), mode="append")
     print("Appended data (creates new version)")
 
     dt = DeltaTable(DELTA_PATH)
     print("Current version:", dt.version())
 
-    # Time travel reads
-    dt_v0 = DeltaTable(DELTA_PATH, version=0)
-    dt_v1 = DeltaTable(DELTA_PATH, version=1)
-
-    print("Rows v0:", dt_v0.to_pandas().shape[0])
-    print("Rows v1:", dt_v1.to_pandas().shape[0])
+    # Time travel stats straight from the Delta log (numRecords of each add action)
+    for v in (0, 1):
+        s = delta_access.version_stats(DELTA_PATH, v)
+        print(f"Rows v{v}: {s['rows']} ({s['files']} files, {s['bytes']} bytes)")
+
+    diff = delta_access.diff_versions(DELTA_PATH, 0, 1)
+    print(f"Diff v0 -> v1: +{len(diff['files_added'])} files / +{diff['rows_added']} rows, "
+          f"-{len(diff['files_removed'])} files / -{diff['rows_removed']} rows")
+
+    # Audit read against v0: only two columns, filter pushed into the Parquet scan
+    if "PULocationID" in dt.schema().to_arrow().names:
+        flt = pc.field("PULocationID") == AUDIT_PU_LOCATION
+        t = delta_access.read_version(DELTA_PATH, 0, ["PULocationID", "total_amount"], flt)
+        print(f"v0 trips from PULocationID={AUDIT_PU_LOCATION}: {t.num_rows}, "
+              f"total_amount={pc.sum(t.column('total_amount')).as_py()}")
 
     # Show delta history (audit trail)
     hist = dt.history()
@@ -1,10 +1,17 @@
 import os
+import sys
 import json
 import boto3
 import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from pyarrow import fs as pafs
 from pathlib import Path
 from datetime import datetime
 
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from common.quality_rules import load_ruleset
+
 AWS_REGION = os.getenv("AWS_REGION", "us-east-1")
 BUCKET = os.getenv("NYC_BUCKET")
 
@@ -13,47 +20,131 @@ OUT_LOCAL = os.getenv("VALIDATED_OUT", "tmp/validated_yellow_2025-08.parquet")
 
 S3_KEY = os.getenv("VALIDATED_S3_KEY", "validated/yellow/2025/08/yellow_tripdata_2025-08_validated.parquet")
 LINEAGE_KEY = os.getenv("LINEAGE_S3_KEY", "lineage/yellow/2025/08/promote_validated.json")
-
-def main():
-    if not BUCKET:
-        raise SystemExit("Set NYC_BUCKET env var.")
-
-    Path("tmp").mkdir(exist_ok=True)
-
+RULES_PATH = os.getenv("QUALITY_RULES", "governance/quality_rules.yaml")
+
+# pandas = load whole file, filter, write tmp/ copy, upload (original path)
+# stream = filter row group by row group with pyarrow and write straight into an
+#          S3 multipart upload; peak memory ~ one row group, no local temp file.
+#          Uploads go to temporary keys (closing the stream completes the upload even
+#          when the write failed) and are copied to the final keys only on success.
+PROMOTE_MODE = os.getenv("PROMOTE_MODE", "pandas")
+
+# Rejected rows (plus a bitmask of the rules they failed) go to the quarantine prefix
+# in the same pass, so stewards can replay failures without rescanning raw data.
+QUARANTINE = os.getenv("QUARANTINE", "1") == "1"
+QUARANTINE_PREFIX = os.getenv("QUARANTINE_S3_PREFIX", "quarantine/yellow/stage=validated/year=2025/month=08/")
+QUARANTINE_LOCAL = os.getenv("QUARANTINE_OUT", "tmp/quarantine_yellow_2025-08.parquet")
+FAILED_MASK_COL = "dq_failed_rules_mask"
+
+RUN_ID = datetime.utcnow().strftime("%Y%m%d_%H%M%S")
+QUARANTINE_KEY = f"{QUARANTINE_PREFIX}run_id={RUN_ID}/rejected.parquet"
+
+def promote_pandas(s3):
     df = pd.read_parquet(TRIPS_PARQUET)
 
-    # Basic quality gates (Validated zone)
-    mask = pd.Series(True, index=df.index)
-
-    if "tpep_pickup_datetime" in df.columns and "tpep_dropoff_datetime" in df.columns:
-        mask &= df["tpep_pickup_datetime"] <= df["tpep_dropoff_datetime"]
-
-    if "trip_distance" in df.columns:
-        mask &= df["trip_distance"].fillna(0) >= 0
-
-    if "total_amount" in df.columns:
-        mask &= df["total_amount"].fillna(0) >= 0
+    # Quality gates (Validated zone) compiled from governance/quality_rules.yaml
+    rules = load_ruleset(RULES_PATH, stage="validated").for_columns(df.columns)
+    failed = rules.pandas_failure_bitmask(df)
+    mask = failed == 0
 
     before = len(df)
     dfv = df.loc[mask].copy()
     after = len(dfv)
 
     dfv.to_parquet(OUT_LOCAL, index=False)
+    s3.upload_file(OUT_LOCAL, BUCKET, S3_KEY)
+
+    if QUARANTINE and after < before:
+        rejected = df.loc[~mask].assign(**{FAILED_MASK_COL: failed[~mask]})
+        rejected.to_parquet(QUARANTINE_LOCAL, index=False)
+        s3.upload_file(QUARANTINE_LOCAL, BUCKET, QUARANTINE_KEY)
+    return rules, before, after
+
+def tmp_key(key: str) -> str:
+    return f"{key}.inprogress-{RUN_ID}"
+
+def promote_stream(s3):
+    pf = pq.ParquetFile(TRIPS_PARQUET)
+    rules = load_ruleset(RULES_PATH, stage="validated").for_columns(pf.schema_arrow.names)
+
+    before = pf.metadata.num_rows
+    after = 0
+    s3fs = pafs.S3FileSystem(region=AWS_REGION)
+    q_sink = q_writer = None
+    q_schema = pf.schema_arrow.append(pa.field(FAILED_MASK_COL, pa.int64()))
+    written = []  # temporary keys with an upload started
+    try:
+        try:
+            # open_output_stream uploads parts as the buffer fills (S3 multipart upload)
+            written.append(S3_KEY)
+            with s3fs.open_output_stream(f"{BUCKET}/{tmp_key(S3_KEY)}") as sink:
+                with pq.ParquetWriter(sink, pf.schema_arrow) as writer:
+                    for rg in range(pf.num_row_groups):
+                        table = pf.read_row_group(rg)
+                        failed = rules.arrow_failure_bitmask(table)
+                        ok = failed.to_numpy() == 0
+                        kept = table.filter(pa.array(ok))
+                        if kept.num_rows:
+                            writer.write_table(kept)
+                        after += kept.num_rows
+
+                        if QUARANTINE and kept.num_rows < table.num_rows:
+                            if q_writer is None:
+                                written.append(QUARANTINE_KEY)
+                                q_sink = s3fs.open_output_stream(f"{BUCKET}/{tmp_key(QUARANTINE_KEY)}")
+                                q_writer = pq.ParquetWriter(q_sink, q_schema)
+                            bad = pa.array(~ok)
+                            rejected = table.filter(bad).append_column(FAILED_MASK_COL, failed.filter(bad))
+                            q_writer.write_table(rejected)
+
+                        print(f"Row group {rg+1}/{pf.num_row_groups}: kept {kept.num_rows}/{table.num_rows}")
+        finally:
+            if q_writer is not None:
+                q_writer.close()
+                q_sink.close()
+    except BaseException:
+        # Whatever got uploaded is truncated: never publish it under the final keys
+        for key in written:
+            s3.delete_object(Bucket=BUCKET, Key=tmp_key(key))
+        raise
+
+    # Publish: server-side copy (multipart for large objects), then drop the temporary key
+    for key in written:
+        s3.copy({"Bucket": BUCKET, "Key": tmp_key(key)}, BUCKET, key)
+        s3.delete_object(Bucket=BUCKET, Key=tmp_key(key))
+    return rules, before, after
+
+def main():
+    if not BUCKET:
+        raise SystemExit("Set NYC_BUCKET env var.")
+
+    Path("tmp").mkdir(exist_ok=True)
 
     s3 = boto3.client("s3", region_name=AWS_REGION)
-    s3.upload_file(OUT_LOCAL, BUCKET, S3_KEY)
+    if PROMOTE_MODE == "stream":
+        rules, before, after = promote_stream(s3)
+    elif PROMOTE_MODE == "pandas":
+        rules, before, after = promote_pandas(s3)
+    else:
+        raise SystemExit(f"Unknown PROMOTE_MODE={PROMOTE_MODE} (expected pandas|stream)")
 
     lineage = {
-        "run_id": datetime.utcnow().strftime("%Y%m%d_%H%M%S"),
+        "run_id": RUN_ID,
         "stage": "validated_promotion",
         "input": {"local_parquet": TRIPS_PARQUET},
+        "mode": PROMOTE_MODE,
         "output": {"s3": f"s3://{BUCKET}/{S3_KEY}"},
         "quality_gate": {
-            "rules": ["pickup<=dropoff", "trip_distance>=0", "total_amount>=0"],
+            "rules": rules.describe(),
             "rows_in": before,
             "rows_out": after,
             "rows_dropped": before - after
         },
+        "quarantine": {
+            "s3": f"s3://{BUCKET}/{QUARANTINE_KEY}" if QUARANTINE and after < before else None,
+            "mask_column": FAILED_MASK_COL,
+            "rule_bits": rules.rule_bits()
+        },
         "timestamp_utc": datetime.utcnow().isoformat() + "Z"
     }
 
@@ -64,6 +155,8 @@ def main():
     print(f"Validated dataset uploaded: s3://{BUCKET}/{S3_KEY}")
     print(f"Lineage uploaded: s3://{BUCKET}/{LINEAGE_KEY}")
     print(f"Rows in: {before} Rows out: {after} Dropped: {before-after}")
+    if QUARANTINE and after < before:
+        print(f"Quarantined rows uploaded: s3://{BUCKET}/{QUARANTINE_KEY}")
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,246 @@
+import os
+import sys
+import json
+import time
+import shutil
+import urllib.request
+from pathlib import Path
+from datetime import datetime, timedelta
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from common.quality_rules import load_ruleset
+from common.spark_transforms import configure_adaptive, curated_pipeline, gate_counts, read_zones, write_curated
+
+# Local regression benchmark for the shared curated transform (common/spark_transforms.py):
+# generates multi-month synthetic trips, runs the same pipeline the Glue job runs on
+# local[*], and records wall time, per-stage task time / shuffle / spill (Spark REST API)
+# and output file counts per year/month.
+#
+#   scenario "full":      every generated month into an empty output
+#   scenario "one_month": the last month again (PROCESS_MONTH) into the same output;
+#                         other partitions must be left as they were
+#
+# BENCH_BASELINE=<previous report.json> compares wall time / shuffle / spill and exits 1
+# when a scenario is more than BENCH_TOLERANCE worse.
+
+MASTER = os.getenv("BENCH_MASTER", "local[*]")
+START_MONTH = os.getenv("BENCH_START_MONTH", "2025-06")
+MONTHS = int(os.getenv("BENCH_MONTHS", "3"))
+ROWS_PER_MONTH = int(os.getenv("BENCH_ROWS_PER_MONTH", "1000000"))
+BAD_RATE = float(os.getenv("BENCH_BAD_RATE", "0.02"))     # rows failing a validated rule
+STRAY_RATE = float(os.getenv("BENCH_STRAY_RATE", "0.0005"))  # pickups outside the file's month
+RUNS = int(os.getenv("BENCH_RUNS", "1"))
+TARGET_FILE_MB = int(os.getenv("TARGET_FILE_MB", "128"))
+SEED = int(os.getenv("BENCH_SEED", "42"))
+ZONES_CSV = os.getenv("ZONES_CSV", "taxi_zone_lookup.csv")
+RULES_PATH = os.getenv("QUALITY_RULES", "governance/quality_rules.yaml")
+WORK_DIR = Path(os.getenv("BENCH_DIR", "tmp/bench_spark_transform"))
+OUT_JSON = os.getenv("BENCH_OUT", "docs/benchmarks/day7_spark_transform.json")
+BASELINE = os.getenv("BENCH_BASELINE")
+TOLERANCE = float(os.getenv("BENCH_TOLERANCE", "0.25"))
+
+def month_starts():
+    first = datetime.strptime(START_MONTH, "%Y-%m")
+    out = []
+    for i in range(MONTHS):
+        m = first.month - 1 + i
+        out.append(first.replace(year=first.year + m // 12, month=m % 12 + 1))
+    return out
+
+def synthetic_month(rng, start: datetime, n: int) -> pa.Table:
+    days = ((start.replace(day=28) + timedelta(days=4)).replace(day=1) - start).days
+    offsets = rng.integers(0, days * 86400, n)
+    stray = rng.random(n) < STRAY_RATE
+    offsets[stray] = -rng.integers(1, 400 * 86400, int(stray.sum()))  # late-arriving old trips
+    pickup = np.datetime64(start, "s") + offsets.astype("timedelta64[s]")
+    duration = rng.integers(60, 3600, n).astype("timedelta64[s]")
+    dropoff = pickup + duration
+    distance = np.round(rng.gamma(2.0, 1.5, n), 2)
+    fare = np.round(3.0 + distance * 2.5, 2)
+    tip = np.round(fare * rng.choice([0.0, 0.15, 0.2], n), 2)
+    total = fare + tip + 1.0
+
+    bad = rng.random(n) < BAD_RATE
+    kind = rng.integers(0, 3, n)
+    dropoff = np.where(bad & (kind == 0), pickup - duration, dropoff)  # dropoff before pickup
+    distance = np.where(bad & (kind == 1), -distance, distance)
+    total = np.where(bad & (kind == 2), -total, total)
+
+    return pa.table({
+        "VendorID": rng.integers(1, 3, n).astype(np.int32),
+        "tpep_pickup_datetime": pa.array(pickup, pa.timestamp("us")),
+        "tpep_dropoff_datetime": pa.array(dropoff, pa.timestamp("us")),
+        "passenger_count": rng.integers(1, 5, n).astype(np.float64),
+        "trip_distance": distance,
+        "RatecodeID": np.ones(n),
+        "PULocationID": rng.integers(1, 266, n).astype(np.int32),
+        "DOLocationID": rng.integers(1, 266, n).astype(np.int32),
+        "payment_type": rng.integers(1, 5, n).astype(np.int64),
+        "fare_amount": fare,
+        "tip_amount": tip,
+        "total_amount": total,
+    })
+
+def generate_inputs():
+    rng = np.random.default_rng(SEED)
+    trips_dir = WORK_DIR / "trips"
+    paths = {}
+    for start in month_starts():
+        key = start.strftime("%Y-%m")
+        path = trips_dir / f"{start:%Y}" / f"{start:%m}" / f"yellow_tripdata_{key}.parquet"
+        if not path.exists():
+            path.parent.mkdir(parents=True, exist_ok=True)
+            pq.write_table(synthetic_month(rng, start, ROWS_PER_MONTH), path, row_group_size=256_000)
+        paths[key] = str(path)
+
+    zones = ZONES_CSV
+    if not Path(zones).exists():
+        zones = str(WORK_DIR / "taxi_zone_lookup.csv")
+        boroughs = ["Manhattan", "Queens", "Brooklyn", "Bronx", "Staten Island", "EWR"]
+        lines = ["LocationID,Borough,Zone,service_zone"]
+        lines += [f"{i},{boroughs[i % len(boroughs)]},Zone {i},Boro Zone" for i in range(1, 266)]
+        Path(zones).write_text("\n".join(lines) + "\n", encoding="utf-8")
+    return paths, zones
+
+def rest_json(spark, route: str):
+    url = f"{spark.sparkContext.uiWebUrl}/api/v1/applications/{spark.sparkContext.applicationId}/{route}"
+    with urllib.request.urlopen(url, timeout=30) as r:
+        return json.loads(r.read().decode("utf-8"))
+
+STAGE_METRICS = ["executorRunTime", "inputBytes", "outputBytes", "shuffleReadBytes", "shuffleWriteBytes",
+                 "memoryBytesSpilled", "diskBytesSpilled"]
+
+def stage_metrics(spark, group: str):
+    tracker = spark.sparkContext.statusTracker()
+    stage_ids = sorted({s for j in tracker.getJobIdsForGroup(group) for s in tracker.getJobInfo(j).stageIds})
+    stages = []
+    for sid in stage_ids:
+        for attempt in rest_json(spark, f"stages/{sid}"):
+            if attempt.get("status") != "COMPLETE":
+                continue  # skipped (reused shuffle) or still being reported
+            stages.append({"stage_id": sid, "name": attempt.get("name", "")[:80],
+                           "tasks": attempt.get("numTasks"),
+                           **{k: attempt.get(k, 0) for k in STAGE_METRICS}})
+    totals = {k: int(sum(s[k] for s in stages)) for k in STAGE_METRICS}
+    return stages, totals
+
+def output_files(out_path: Path):
+    per_partition = {}
+    for f in out_path.rglob("*.parquet"):
+        rel = f.parent.relative_to(out_path)
+        p = per_partition.setdefault(str(rel), {"files": 0, "bytes": 0})
+        p["files"] += 1
+        p["bytes"] += f.stat().st_size
+    return dict(sorted(per_partition.items()))
+
+def run_scenario(spark, name: str, trips_paths, zones_path, out_path: Path, process_month=None):
+    rules = load_ruleset(RULES_PATH, stage="validated")
+    group = f"bench-{name}-{time.time_ns()}"
+    spark.sparkContext.setJobGroup(group, name)
+    t0 = time.time()
+    trips = spark.read.parquet(*trips_paths)
+    out, gate = curated_pipeline(trips, read_zones(spark, zones_path), rules, process_month)
+    write_curated(out, str(out_path))
+    rows_in, rows_out, partitions = gate_counts(gate)
+    wall = time.time() - t0
+    spark.sparkContext.setJobGroup("", "")
+
+    time.sleep(1.0)  # let the listener bus publish the last stage's metrics
+    stages, totals = stage_metrics(spark, group)
+    files = output_files(out_path)
+    return {
+        "scenario": name,
+        "process_month": process_month,
+        "wall_seconds": round(wall, 3),
+        "rows_in": rows_in,
+        "rows_out": rows_out,
+        "partitions_written": partitions,
+        "stage_totals": totals,
+        "stages": stages,
+        "output_partitions": files,
+        "output_files": sum(p["files"] for p in files.values()),
+    }
+
+def compare(report, baseline):
+    regressions = []
+    base = {r["scenario"]: r for r in baseline.get("runs", [])}
+    for r in report["runs"]:
+        b = base.get(r["scenario"])
+        if not b:
+            continue
+        checks = {"wall_seconds": (r["wall_seconds"], b["wall_seconds"])}
+        for k in ("shuffleWriteBytes", "diskBytesSpilled", "memoryBytesSpilled"):
+            checks[k] = (r["stage_totals"][k], b["stage_totals"][k])
+        checks["output_files"] = (r["output_files"], b["output_files"])
+        for k, (now, was) in checks.items():
+            if was and now > was * (1 + TOLERANCE):
+                regressions.append(f"{r['scenario']}: {k} {was} -> {now}")
+    return regressions
+
+def main():
+    from pyspark.sql import SparkSession
+
+    WORK_DIR.mkdir(parents=True, exist_ok=True)
+    trips, zones = generate_inputs()
+    months = sorted(trips)
+
+    spark = (
+        SparkSession.builder
+        .master(MASTER)
+        .appName("Day7 Spark transform benchmark")
+        .config("spark.ui.enabled", "true")
+        .config("spark.sql.session.timeZone", "UTC")
+        .getOrCreate()
+    )
+    configure_adaptive(spark, TARGET_FILE_MB)
+
+    runs = []
+    try:
+        for i in range(RUNS):
+            out_path = WORK_DIR / f"curated_run{i}"
+            shutil.rmtree(out_path, ignore_errors=True)
+            full = run_scenario(spark, "full", [trips[m] for m in months], zones, out_path)
+            one = run_scenario(spark, "one_month", [trips[months[-1]]], zones, out_path, months[-1])
+            # Dynamic overwrite must leave the other months' files exactly as they were
+            untouched = {k: v for k, v in full["output_partitions"].items()
+                         if k != "year={}/month={}".format(*map(int, months[-1].split("-")))}
+            one["other_partitions_unchanged"] = all(
+                one["output_partitions"].get(k) == v for k, v in untouched.items())
+            for r in (full, one):
+                r["run"] = i
+                runs.append(r)
+                print(f"run {i} {r['scenario']:<9}: {r['wall_seconds']:.2f}s, rows {r['rows_in']} -> {r['rows_out']}, "
+                      f"shuffle write {r['stage_totals']['shuffleWriteBytes'] // (1024 * 1024)} MB, "
+                      f"spill {r['stage_totals']['diskBytesSpilled'] // (1024 * 1024)} MB, "
+                      f"{r['output_files']} files")
+    finally:
+        spark.stop()
+
+    report = {
+        "generated_utc": datetime.utcnow().isoformat() + "Z",
+        "master": MASTER,
+        "months": months,
+        "rows_per_month": ROWS_PER_MONTH,
+        "bad_rate": BAD_RATE,
+        "stray_rate": STRAY_RATE,
+        "target_file_mb": TARGET_FILE_MB,
+        "runs": runs,
+    }
+    Path(OUT_JSON).parent.mkdir(parents=True, exist_ok=True)
+    Path(OUT_JSON).write_text(json.dumps(report, indent=2), encoding="utf-8")
+    print(f"Wrote benchmark report: {OUT_JSON}")
+
+    if BASELINE:
+        regressions = compare(report, json.loads(Path(BASELINE).read_text(encoding="utf-8")))
+        for line in regressions:
+            print("REGRESSION", line)
+        if regressions:
+            raise SystemExit(1)
+        print(f"No regressions vs {BASELINE} (tolerance {TOLERANCE:.0%})")
+
+if __name__ == "__main__":
+    main()
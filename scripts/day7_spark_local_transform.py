@@ -1,12 +1,18 @@
 import os
+import sys
+from pathlib import Path
 from pyspark.sql import SparkSession
-from pyspark.sql.functions import (
-    col, year, month, to_timestamp, when, lit
-)
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from common.quality_rules import load_ruleset
+from common.spark_transforms import configure_adaptive, curated_pipeline, gate_counts, read_zones, write_curated
 
 TRIPS_PARQUET = os.getenv("TRIPS_PARQUET", "yellow_tripdata_2025-08.parquet")
 ZONES_CSV = os.getenv("ZONES_CSV", "taxi_zone_lookup.csv")
 OUT_PATH = os.getenv("OUT_PATH", "tmp/curated_spark_local")  # folder output
+RULES_PATH = os.getenv("QUALITY_RULES", "governance/quality_rules.yaml")
+PROCESS_MONTH = os.getenv("PROCESS_MONTH")  # e.g. 2025-08 (same as the Glue job's --PROCESS_MONTH)
+TARGET_FILE_MB = int(os.getenv("TARGET_FILE_MB", "128"))
 
 def main():
     spark = (
@@ -14,65 +20,19 @@ def main():
         .appName("NYC Taxi Day7 Local Spark")
         .getOrCreate()
     )
+    configure_adaptive(spark, TARGET_FILE_MB)
 
+    # Same cast/filter/enrich/partition pipeline as glue_jobs/day7_glue_taxi_curated.py
     trips = spark.read.parquet(TRIPS_PARQUET)
-    zones = spark.read.option("header", True).csv(ZONES_CSV)
-
-    # Cast zone key
-    zones = zones.withColumn("LocationID", col("LocationID").cast("int"))
-
-    # Basic schema alignment
-    trips = trips.withColumn("PULocationID", col("PULocationID").cast("int")) \
-                 .withColumn("DOLocationID", col("DOLocationID").cast("int"))
-
-    # Parse timestamps (Glue often already has timestamp types; local parquet likely does too)
-    # This is safe in either case.
-    trips = trips.withColumn("tpep_pickup_datetime", col("tpep_pickup_datetime").cast("timestamp")) \
-                 .withColumn("tpep_dropoff_datetime", col("tpep_dropoff_datetime").cast("timestamp"))
-
-    # Quality gates (Validated rules)
-    trips_q = trips.filter(col("tpep_pickup_datetime").isNotNull()) \
-                   .filter(col("tpep_dropoff_datetime").isNotNull()) \
-                   .filter(col("tpep_pickup_datetime") <= col("tpep_dropoff_datetime")) \
-                   .filter(when(col("trip_distance").isNull(), lit(0)).otherwise(col("trip_distance")) >= 0) \
-                   .filter(when(col("total_amount").isNull(), lit(0)).otherwise(col("total_amount")) >= 0)
-
-    # Partition columns
-    trips_q = trips_q.withColumn("year", year(col("tpep_pickup_datetime"))) \
-                     .withColumn("month", month(col("tpep_pickup_datetime")))
-
-    # Enrich PU
-    pu = zones.select(
-        col("LocationID").alias("PU_LocationID"),
-        col("Borough").alias("PU_Borough"),
-        col("Zone").alias("PU_Zone"),
-        col("service_zone").alias("PU_service_zone"),
-    )
-    trips_q = trips_q.join(pu, trips_q.PULocationID == pu.PU_LocationID, "left")
-
-    # Enrich DO
-    do = zones.select(
-        col("LocationID").alias("DO_LocationID"),
-        col("Borough").alias("DO_Borough"),
-        col("Zone").alias("DO_Zone"),
-        col("service_zone").alias("DO_service_zone"),
-    )
-    trips_q = trips_q.join(do, trips_q.DOLocationID == do.DO_LocationID, "left")
-
-    # Optimization basics: select only needed cols (edit list as needed)
-    keep_cols = [
-        "VendorID","tpep_pickup_datetime","tpep_dropoff_datetime","passenger_count",
-        "trip_distance","RatecodeID","PULocationID","DOLocationID","payment_type",
-        "fare_amount","tip_amount","total_amount",
-        "PU_Borough","PU_Zone","PU_service_zone",
-        "DO_Borough","DO_Zone","DO_service_zone",
-        "year","month"
-    ]
-    trips_out = trips_q.select(*[c for c in keep_cols if c in trips_q.columns])
+    zones = read_zones(spark, ZONES_CSV)
+    rules = load_ruleset(RULES_PATH, stage="validated")
+    trips_out, gate = curated_pipeline(trips, zones, rules, PROCESS_MONTH)
 
-    # Write partitioned parquet
-    trips_out.write.mode("overwrite").partitionBy("year","month").parquet(OUT_PATH)
+    # Write partitioned parquet (dynamic overwrite of the year/month partitions present)
+    write_curated(trips_out, OUT_PATH)
 
+    rows_in, rows_out, partitions = gate_counts(gate)
+    print(f"Quality gate: {rows_in} in, {rows_out} out, {rows_in - rows_out} dropped; partitions {partitions}")
     print(f"Wrote curated dataset locally to: {OUT_PATH}")
     spark.stop()
 
@@ -15,6 +15,14 @@ def main():
         "--SOURCE_ZONES_S3": os.getenv("SOURCE_ZONES_S3"),
         "--TARGET_CURATED_S3": os.getenv("TARGET_CURATED_S3"),
         "--LINEAGE_S3": os.getenv("LINEAGE_S3"),
+        "--QUALITY_RULES": os.getenv("QUALITY_RULES_S3"),
+        "--QUARANTINE_S3": os.getenv("QUARANTINE_S3"),
+        # e.g. 2025-08: only that pickup month is (re)written in the curated zone
+        "--PROCESS_MONTH": os.getenv("PROCESS_MONTH"),
+        "--TARGET_FILE_MB": os.getenv("TARGET_FILE_MB"),
+        # s3://.../common.zip (rule compiler) and s3://.../quality_rules.yaml
+        "--extra-py-files": os.getenv("GLUE_EXTRA_PY_FILES"),
+        "--extra-files": os.getenv("GLUE_EXTRA_FILES"),
     }
     # remove None
     args = {k: v for k, v in args.items() if v}
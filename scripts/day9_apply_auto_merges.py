@@ -1,5 +1,11 @@
-import os, json
+import os, sys, json
+import yaml
 import psycopg2
+from psycopg2.extras import execute_values
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from common.matching.clusters import clusters_from_pairs
 
 PG_HOST = os.getenv("PG_HOST", "localhost")
 PG_PORT = int(os.getenv("PG_PORT", "5432"))
@@ -10,6 +16,13 @@ PG_PASS = os.getenv("PG_PASS", "postgres")
 AUTO_THRESHOLD = float(os.getenv("AUTO_THRESHOLD", "0.95"))
 APPROVED_BY = os.getenv("APPROVED_BY", "auto_merge_bot")
 
+# loop  = one pair at a time (smaller id survives)
+# batch = union-find clusters over all AUTO_MERGE pairs, survivorship from VENDOR_RULES,
+#         applied with a few set-based statements in one transaction
+# Both modes record retired -> golden ids in mdm.vendor_xref (sql/day9_vendor_xref.sql).
+MERGE_MODE = os.getenv("MERGE_MODE", "loop")
+RULES_PATH = os.getenv("VENDOR_RULES", "governance/mdm/vendor_match_rules.yaml")
+
 def connect():
     return psycopg2.connect(host=PG_HOST, port=PG_PORT, dbname=PG_DB, user=PG_USER, password=PG_PASS)
 
@@ -18,66 +31,217 @@ def longest(a, b):
     b = "" if b is None else str(b)
     return a if len(a) >= len(b) else b
 
+def fetch_auto_merge_items(conn):
+    with conn.cursor() as cur:
+        cur.execute("""
+          SELECT review_id, left_vendor_id, right_vendor_id, confidence, rationale
+          FROM mdm.vendor_review_queue
+          WHERE status='OPEN' AND recommendation='AUTO_MERGE' AND confidence >= %s
+          ORDER BY confidence DESC;
+        """, (AUTO_THRESHOLD,))
+        return cur.fetchall()
+
+def load_survivorship():
+    cfg = yaml.safe_load(open(RULES_PATH, "r", encoding="utf-8"))
+    return cfg.get("survivorship", {})
+
+def pick_survivor(members, vendors, strategy):
+    # prefer_active_record: active vendors not already deprecated/retired win, then smallest id
+    if strategy == "prefer_active_record":
+        def inactive(vid):
+            v = vendors.get(vid, {})
+            return not v.get("is_active", False) or v.get("lifecycle_state") in ("DEPRECATED", "RETIRED")
+        return min(members, key=lambda vid: (inactive(vid), vid))
+    if strategy in (None, "lowest_id"):
+        return min(members)
+    raise ValueError(f"Unsupported auto_merge_strategy {strategy!r}")
+
+def survive_field(values, rule):
+    if rule == "longest_non_null":
+        values = [v for v in values if v is not None and str(v) != ""]
+        # longest wins; ties go to the first value (the survivor's own)
+        return max(values, key=lambda v: len(str(v)), default=None)
+    raise ValueError(f"Unsupported field rule {rule!r}")
+
+def plan_merges(items, vendors, survivorship):
+    """Resolve AUTO_MERGE pairs into clusters and survivors, entirely in memory.
+
+    Returns (survivor rows, retired rows, queue rows):
+      survivors: [(vendor_id, vendor_name)]
+      retired:   [(vendor_id, survivor_id, confidence)]
+      reviews:   [(review_id, decision_notes)]
+    """
+    strategy = survivorship.get("auto_merge_strategy")
+    field_rules = survivorship.get("field_rules", {"vendor_name": "longest_non_null"})
+
+    best_conf = {}
+    for _, left_id, right_id, conf, _ in items:
+        for vid in (left_id, right_id):
+            best_conf[vid] = max(best_conf.get(vid, conf), conf)
+
+    survivor_of, survivors, retired = {}, [], []
+    for members in clusters_from_pairs((l, r) for _, l, r, _, _ in items):
+        survivor = pick_survivor(members, vendors, strategy)
+        ordered = [survivor] + [m for m in members if m != survivor]
+        name = survive_field([vendors.get(m, {}).get("vendor_name") for m in ordered],
+                             field_rules.get("vendor_name", "longest_non_null"))
+        survivors.append((survivor, name))
+        for m in members:
+            survivor_of[m] = survivor
+            if m != survivor:
+                retired.append((m, survivor, best_conf[m]))
+
+    reviews = []
+    for review_id, left_id, right_id, _, _ in items:
+        survivor = survivor_of[left_id]
+        deprecated = ",".join(str(v) for v in sorted({left_id, right_id} - {survivor})) or "-"
+        reviews.append((review_id, f"Survivor={survivor}, Deprecated={deprecated}"))
+    return survivors, retired, reviews
+
+def flatten_xref(cur):
+    # Re-point chains (an earlier survivor merged again) so every lookup is one hop
+    cur.execute("SELECT mdm.fn_flatten_vendor_xref();")
+    print(f"Crosswalk: {cur.fetchone()[0]} mappings re-pointed to their golden record")
+
+def apply_batch(conn, items):
+    ids = sorted({vid for _, l, r, _, _ in items for vid in (l, r)})
+    with conn.cursor() as cur:
+        cur.execute("""
+          SELECT v.vendor_id, v.vendor_name, v.is_active, l.lifecycle_state
+          FROM mdm.dim_vendor v
+          LEFT JOIN mdm.vendor_lifecycle l ON l.vendor_id = v.vendor_id
+          WHERE v.vendor_id = ANY(%s);
+        """, (ids,))
+        vendors = {vid: {"vendor_name": name, "is_active": active, "lifecycle_state": state}
+                   for vid, name, active, state in cur.fetchall()}
+
+    survivors, retired, reviews = plan_merges(items, vendors, load_survivorship())
+
+    with conn.cursor() as cur:
+        cur.execute("""
+          CREATE TEMP TABLE tmp_merge_survivor (vendor_id INT PRIMARY KEY, vendor_name TEXT) ON COMMIT DROP;
+          CREATE TEMP TABLE tmp_merge_retired (vendor_id INT PRIMARY KEY, survivor_id INT NOT NULL, confidence NUMERIC) ON COMMIT DROP;
+          CREATE TEMP TABLE tmp_merge_review (review_id BIGINT PRIMARY KEY, decision_notes TEXT) ON COMMIT DROP;
+        """)
+        execute_values(cur, "INSERT INTO tmp_merge_survivor VALUES %s;", survivors, page_size=5000)
+        execute_values(cur, "INSERT INTO tmp_merge_retired VALUES %s;", retired, page_size=5000)
+        execute_values(cur, "INSERT INTO tmp_merge_review VALUES %s;", reviews, page_size=5000)
+
+        # Survivors (audit trigger still fires once per updated row)
+        cur.execute("""
+          UPDATE mdm.dim_vendor v
+          SET vendor_name=s.vendor_name, updated_by=%s, approved_by=%s, approved_at=NOW(), version=v.version+1, updated_at=NOW()
+          FROM tmp_merge_survivor s
+          WHERE v.vendor_id = s.vendor_id;
+        """, ("auto_merge", APPROVED_BY))
+
+        # Deprecate retired in lifecycle table (do not delete for compliance)
+        cur.execute("""
+          INSERT INTO mdm.vendor_lifecycle(vendor_id, lifecycle_state, state_reason, updated_by, approved_by, approved_at)
+          SELECT vendor_id, 'DEPRECATED',
+                 'Auto-merged into vendor_id=' || survivor_id || ' (conf=' || confidence || ')', %s, %s, NOW()
+          FROM tmp_merge_retired
+          ON CONFLICT (vendor_id) DO UPDATE SET
+            lifecycle_state='DEPRECATED',
+            state_reason=EXCLUDED.state_reason,
+            updated_at=NOW(),
+            updated_by=EXCLUDED.updated_by,
+            approved_by=EXCLUDED.approved_by,
+            approved_at=NOW();
+        """, ("auto_merge", APPROVED_BY))
+
+        cur.execute("""
+          UPDATE mdm.vendor_review_queue q
+          SET status='MERGED', reviewed_at=NOW(), reviewed_by=%s, decision_notes=r.decision_notes
+          FROM tmp_merge_review r
+          WHERE q.review_id = r.review_id;
+        """, (APPROVED_BY,))
+
+        cur.execute("""
+          INSERT INTO mdm.vendor_xref (source_vendor_id, golden_vendor_id, merge_confidence, merged_by)
+          SELECT vendor_id, survivor_id, confidence, %s FROM tmp_merge_retired
+          ON CONFLICT (source_vendor_id) DO UPDATE SET
+            golden_vendor_id=EXCLUDED.golden_vendor_id,
+            merge_confidence=EXCLUDED.merge_confidence,
+            merged_at=NOW(),
+            merged_by=EXCLUDED.merged_by;
+        """, (APPROVED_BY,))
+        flatten_xref(cur)
+    conn.commit()
+    print(f"Applied {len(items)} auto merges as {len(survivors)} clusters "
+          f"({len(retired)} vendors deprecated; audit logged via trigger).")
+
+def apply_loop(conn, items):
+    with conn.cursor() as cur:
+        for review_id, left_id, right_id, conf, rationale in items:
+            # Choose survivor (simple): smaller id survives
+            survivor = min(left_id, right_id)
+            retired  = max(left_id, right_id)
+
+            # Fetch names
+            cur.execute("SELECT vendor_name FROM mdm.dim_vendor WHERE vendor_id=%s;", (survivor,))
+            s_name = cur.fetchone()[0]
+            cur.execute("SELECT vendor_name FROM mdm.dim_vendor WHERE vendor_id=%s;", (retired,))
+            r_name = cur.fetchone()[0]
+
+            new_name = longest(s_name, r_name)
+
+            # Update survivor (causes audit trigger UPDATE)
+            cur.execute("""
+              UPDATE mdm.dim_vendor
+              SET vendor_name=%s, updated_by=%s, approved_by=%s, approved_at=NOW(), version=version+1, updated_at=NOW()
+              WHERE vendor_id=%s;
+            """, (new_name, "auto_merge", APPROVED_BY, survivor))
+
+            # Deprecate retired in lifecycle table (do not delete for compliance)
+            cur.execute("""
+              INSERT INTO mdm.vendor_lifecycle(vendor_id, lifecycle_state, state_reason, updated_by, approved_by, approved_at)
+              VALUES (%s,'DEPRECATED',%s,%s,%s,NOW())
+              ON CONFLICT (vendor_id) DO UPDATE SET
+                lifecycle_state='DEPRECATED',
+                state_reason=EXCLUDED.state_reason,
+                updated_at=NOW(),
+                updated_by=EXCLUDED.updated_by,
+                approved_by=EXCLUDED.approved_by,
+                approved_at=NOW();
+            """, (retired, f"Auto-merged into vendor_id={survivor} (conf={conf})", "auto_merge", APPROVED_BY))
+
+            # Mark queue row merged
+            cur.execute("""
+              UPDATE mdm.vendor_review_queue
+              SET status='MERGED', reviewed_at=NOW(), reviewed_by=%s, decision_notes=%s
+              WHERE review_id=%s;
+            """, (APPROVED_BY, f"Survivor={survivor}, Deprecated={retired}", review_id))
+
+            # Crosswalk retired -> survivor
+            cur.execute("""
+              INSERT INTO mdm.vendor_xref (source_vendor_id, golden_vendor_id, merge_confidence, merged_by)
+              VALUES (%s,%s,%s,%s)
+              ON CONFLICT (source_vendor_id) DO UPDATE SET
+                golden_vendor_id=EXCLUDED.golden_vendor_id,
+                merge_confidence=EXCLUDED.merge_confidence,
+                merged_at=NOW(),
+                merged_by=EXCLUDED.merged_by;
+            """, (retired, survivor, conf, APPROVED_BY))
+        flatten_xref(cur)
+
+    conn.commit()
+    print(f"Applied {len(items)} auto merges (audit logged via trigger).")
+
 def main():
     conn = connect()
     try:
-        with conn.cursor() as cur:
-            cur.execute("""
-              SELECT review_id, left_vendor_id, right_vendor_id, confidence, rationale
-              FROM mdm.vendor_review_queue
-              WHERE status='OPEN' AND recommendation='AUTO_MERGE' AND confidence >= %s
-              ORDER BY confidence DESC;
-            """, (AUTO_THRESHOLD,))
-            items = cur.fetchall()
-
+        items = fetch_auto_merge_items(conn)
         if not items:
             print("No AUTO_MERGE items found.")
             return
 
-        with conn.cursor() as cur:
-            for review_id, left_id, right_id, conf, rationale in items:
-                # Choose survivor (simple): smaller id survives
-                survivor = min(left_id, right_id)
-                retired  = max(left_id, right_id)
-
-                # Fetch names
-                cur.execute("SELECT vendor_name FROM mdm.dim_vendor WHERE vendor_id=%s;", (survivor,))
-                s_name = cur.fetchone()[0]
-                cur.execute("SELECT vendor_name FROM mdm.dim_vendor WHERE vendor_id=%s;", (retired,))
-                r_name = cur.fetchone()[0]
-
-                new_name = longest(s_name, r_name)
-
-                # Update survivor (causes audit trigger UPDATE)
-                cur.execute("""
-                  UPDATE mdm.dim_vendor
-                  SET vendor_name=%s, updated_by=%s, approved_by=%s, approved_at=NOW(), version=version+1, updated_at=NOW()
-                  WHERE vendor_id=%s;
-                """, (new_name, "auto_merge", APPROVED_BY, survivor))
-
-                # Deprecate retired in lifecycle table (do not delete for compliance)
-                cur.execute("""
-                  INSERT INTO mdm.vendor_lifecycle(vendor_id, lifecycle_state, state_reason, updated_by, approved_by, approved_at)
-                  VALUES (%s,'DEPRECATED',%s,%s,%s,NOW())
-                  ON CONFLICT (vendor_id) DO UPDATE SET
-                    lifecycle_state='DEPRECATED',
-                    state_reason=EXCLUDED.state_reason,
-                    updated_at=NOW(),
-                    updated_by=EXCLUDED.updated_by,
-                    approved_by=EXCLUDED.approved_by,
-                    approved_at=NOW();
-                """, (retired, f"Auto-merged into vendor_id={survivor} (conf={conf})", "auto_merge", APPROVED_BY))
-
-                # Mark queue row merged
-                cur.execute("""
-                  UPDATE mdm.vendor_review_queue
-                  SET status='MERGED', reviewed_at=NOW(), reviewed_by=%s, decision_notes=%s
-                  WHERE review_id=%s;
-                """, (APPROVED_BY, f"Survivor={survivor}, Deprecated={retired}", review_id))
-
-        conn.commit()
-        print(f"Applied {len(items)} auto merges (audit logged via trigger).")
-
+        if MERGE_MODE == "batch":
+            apply_batch(conn, items)
+        elif MERGE_MODE == "loop":
+            apply_loop(conn, items)
+        else:
+            raise SystemExit(f"Unknown MERGE_MODE={MERGE_MODE!r} (expected loop|batch)")
     finally:
         conn.close()
 
@@ -1,10 +1,13 @@
-import os, json
-import yaml
+import os, sys, json, hashlib
 import psycopg2
+from psycopg2 import sql
 from psycopg2.extras import execute_values
-from rapidfuzz.distance import JaroWinkler
-from rapidfuzz.fuzz import ratio
-import re
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from common.matching import (
+    blocking_keys, find_matches, load_match_config, match_records_against, parse_methods,
+)
 
 PG_HOST = os.getenv("PG_HOST", "localhost")
 PG_PORT = int(os.getenv("PG_PORT", "5432"))
@@ -15,100 +18,267 @@ PG_PASS = os.getenv("PG_PASS", "postgres")
 RULES_PATH = os.getenv("VENDOR_RULES", "governance/mdm/vendor_match_rules.yaml")
 CREATED_BY = os.getenv("CREATED_BY", "data_engineer")
 
-def norm(s: str, lowercase=True, strip_punct=True, strip_punctuation=None):
-    # Accept both strip_punct and strip_punctuation for compatibility
-    if strip_punctuation is not None:
-        strip_punct = strip_punctuation
-    s = "" if s is None else str(s)
-    if lowercase:
-        s = s.lower()
-    s = s.strip()
-    if strip_punct:
-        s = re.sub(r"[^a-z0-9\s]", "", s)
-    s = re.sub(r"\s+", " ", s)
-    return s
+# Candidate generation: any of token,prefix,phonetic,minhash ("none" = all pairs)
+MATCH_BLOCKING = os.getenv("MATCH_BLOCKING", "token,prefix,minhash")
+MATCH_WORKERS = int(os.getenv("MATCH_WORKERS", str(os.cpu_count() or 1)))
+MAX_BLOCK_SIZE = int(os.getenv("MATCH_MAX_BLOCK_SIZE", "5000"))
+
+# full        = match every vendor against every other (rebuilds the blocking index)
+# incremental = match only vendors changed since the last run against the persisted index
+# Both need sql/day9_vendor_match_incremental.sql (watermark, block index, OPEN-pair key,
+# attribute hash) and sql/day9_vendor_xref.sql. Merged-away vendors (crosswalk entries,
+# DEPRECATED/RETIRED lifecycle) are never matched or indexed again.
+MATCH_MODE = os.getenv("MATCH_MODE", "full")
+MATCH_WATERMARK = os.getenv("MATCH_WATERMARK", "audit")  # audit (mdm.dim_vendor_audit) | updated_at
+PIPELINE = os.getenv("MATCH_PIPELINE", "vendor_dedup")
 
 def connect():
     return psycopg2.connect(host=PG_HOST, port=PG_PORT, dbname=PG_DB, user=PG_USER, password=PG_PASS)
 
-def load_rules():
-    cfg = yaml.safe_load(open(RULES_PATH, "r", encoding="utf-8"))
-    th = cfg["thresholds"]
-    norm_cfg = cfg.get("normalization", {})
-    weights = {f["name"]: float(f["weight"]) for f in cfg["fields"]}
-    return cfg, th, norm_cfg, weights
+# Vendors merged into a golden record: no longer candidates for anything
+RETIRED_VENDORS = """
+  SELECT source_vendor_id FROM mdm.vendor_xref
+  UNION
+  SELECT vendor_id FROM mdm.vendor_lifecycle WHERE lifecycle_state IN ('DEPRECATED','RETIRED')
+"""
 
-def fetch_vendors(conn):
+def fetch_vendors(conn, config, vendor_ids=None):
+    # vendor_id plus every column the match rules score on (live vendors only)
+    cols = sorted({f.column for f in config.fields} | {"vendor_name"})
+    query = sql.SQL("SELECT vendor_id, {} FROM mdm.dim_vendor WHERE vendor_id NOT IN ({})").format(
+        sql.SQL(", ").join(sql.Identifier(c) for c in cols), sql.SQL(RETIRED_VENDORS))
     with conn.cursor() as cur:
-        cur.execute("SELECT vendor_id, vendor_name FROM mdm.dim_vendor;")
-        return cur.fetchall()  # [(id, name), ...]
-
-def compute_confidence(a_name, b_name):
-    # Two signals:
-    # - ratio: normalized Levenshtein similarity (0..100)
-    # - jaro-winkler: (0..1)
-    lev = ratio(a_name, b_name) / 100.0
-    jw  = JaroWinkler.normalized_similarity(a_name, b_name)
-    # Combine (simple probabilistic-ish ensemble)
-    conf = 0.55 * jw + 0.45 * lev
-    return max(0.0, min(1.0, conf)), {"lev_ratio": lev, "jaro_winkler": jw}
+        if vendor_ids is None:
+            cur.execute(query)
+        else:
+            cur.execute(query + sql.SQL(" AND vendor_id = ANY(%s)"), (list(vendor_ids),))
+        return [{"vendor_id": int(r[0]), **dict(zip(cols, r[1:]))} for r in cur.fetchall()]
 
-def main():
-    cfg, th, norm_cfg, weights = load_rules()
-    auto_t = float(th["auto_merge"])
-    review_t = float(th["steward_review"])
+def columns_of(rows, config):
+    return {f.column: [r[f.column] for r in rows] for f in config.fields}
 
-    conn = connect()
-    try:
-        vendors = fetch_vendors(conn)
-        # Normalize once
-        rows = []
-        for vid, vname in vendors:
-            rows.append({"vendor_id": int(vid), "vendor_name": vname})
-
-        # Candidate generation (simple): compare all pairs if small set
-        # If large, add blocking keys (e.g., first letter, token)
-        candidates = []
-        n = len(rows)
-        for i in range(n):
-            for j in range(i+1, n):
-                a = rows[i]
-                b = rows[j]
-                a_n = norm(a["vendor_name"], **norm_cfg)
-                b_n = norm(b["vendor_name"], **norm_cfg)
-                if not a_n or not b_n:
-                    continue
-
-                conf, details = compute_confidence(a_n, b_n)
-
-                if conf >= auto_t:
-                    rec = "AUTO_MERGE"
-                elif conf >= review_t:
-                    rec = "STEWARD_REVIEW"
-                else:
-                    rec = "MANUAL"
-
-                # Only keep review-worthy pairs (optional: keep everything)
-                if conf >= review_t:
-                    candidates.append((
-                        a["vendor_id"], b["vendor_id"], conf, rec,
-                        json.dumps({"a_name": a["vendor_name"], "b_name": b["vendor_name"], **details})
-                    ))
-
-        print(f"Found {len(candidates)} candidates with conf >= {review_t}")
+def attr_hash(a, b, config):
+    # Normalized values of every scored field on both sides: a decision stays valid until one changes
+    values = [[config.normalizer(r[f.column]) for f in config.fields] for r in (a, b)]
+    return hashlib.sha256(json.dumps(values).encode("utf-8")).hexdigest()
+
+def queue_row(a, b, match, config):
+    # Pair key is unordered: the smaller vendor_id always goes left
+    if a["vendor_id"] > b["vendor_id"]:
+        a, b = b, a
+    return (
+        a["vendor_id"], b["vendor_id"], match.confidence, config.recommendation(match.confidence),
+        json.dumps({"a_name": a["vendor_name"], "b_name": b["vendor_name"],
+                    **match.parts, "fields": match.fields}),
+        CREATED_BY,
+        attr_hash(a, b, config),
+    )
+
+def upsert_candidates(cur, candidates, reopen_changed: bool):
+    # One OPEN row per pair (ux_vendor_review_open_pair): re-scoring refreshes it in place.
+    # MERGED pairs never come back. APPROVED/REJECTED pairs stay out of the queue unless
+    # reopen_changed and a matched attribute changed since the decision (decisions recorded
+    # before match_attr_hash existed count as unchanged).
+    changed = "AND (d.match_attr_hash IS NULL OR d.match_attr_hash = v.match_attr_hash)" if reopen_changed else ""
+    upsert_sql = f"""
+    INSERT INTO mdm.vendor_review_queue
+      (left_vendor_id, right_vendor_id, confidence, recommendation, rationale, created_by, match_attr_hash)
+    SELECT v.left_vendor_id, v.right_vendor_id, v.confidence, v.recommendation, v.rationale, v.created_by,
+           v.match_attr_hash
+    FROM (VALUES %s) AS v(left_vendor_id, right_vendor_id, confidence, recommendation, rationale, created_by,
+                          match_attr_hash)
+    WHERE NOT EXISTS (
+        SELECT 1 FROM mdm.vendor_review_queue d
+        WHERE LEAST(d.left_vendor_id, d.right_vendor_id) = v.left_vendor_id
+          AND GREATEST(d.left_vendor_id, d.right_vendor_id) = v.right_vendor_id
+          AND (d.status = 'MERGED' OR (d.status IN ('APPROVED','REJECTED') {changed})))
+    ON CONFLICT ((LEAST(left_vendor_id, right_vendor_id)), (GREATEST(left_vendor_id, right_vendor_id)))
+      WHERE status = 'OPEN'
+    DO UPDATE SET confidence = EXCLUDED.confidence,
+                  recommendation = EXCLUDED.recommendation,
+                  rationale = EXCLUDED.rationale,
+                  match_attr_hash = EXCLUDED.match_attr_hash;
+    """
+    execute_values(cur, upsert_sql, candidates, page_size=500,
+                   template="(%s::int, %s::int, %s::numeric, %s, %s::jsonb, %s, %s)")
+
+def index_rows(rows, methods, config):
+    # Blocking keys come from the normalized primary match field (vendor_name)
+    minhash = config.minhash_lsh() if "minhash" in methods else None
+    names = config.normalizer.list([r[config.primary.column] for r in rows])
+    return [(k, r["vendor_id"]) for r, name in zip(rows, names) if name
+            for k in blocking_keys(name, methods, minhash)]
+
+def blocking_spec(config):
+    # What the persisted index was built with; the LSH shape is part of it (blocking.minhash)
+    methods = parse_methods(MATCH_BLOCKING)
+    return ",".join(config.minhash_lsh().signature() if m == "minhash" else m for m in methods)
+
+def high_water(conn):
+    # Captured BEFORE reading vendors so changes racing the run are picked up next time.
+    # audit_id comes from a sequence, so a writer can hold a lower id and commit after a plain
+    # MAX() read; that row would then sit below the watermark forever. The SHARE lock waits
+    # for in-flight writers and holds off new ones (their ids come after the cutoff); it is
+    # released straight away by committing this short transaction.
+    # updated_at (NOW() = writer's transaction start) has no such guarantee: best effort only.
+    with conn.cursor() as cur:
+        if MATCH_WATERMARK == "audit":
+            cur.execute("LOCK TABLE mdm.dim_vendor_audit IN SHARE MODE;")
+            cur.execute("SELECT COALESCE(MAX(audit_id), 0) FROM mdm.dim_vendor_audit;")
+            hw = cur.fetchone()[0], None
+        else:
+            cur.execute("LOCK TABLE mdm.dim_vendor IN SHARE MODE;")
+            cur.execute("SELECT MAX(updated_at) FROM mdm.dim_vendor;")
+            hw = 0, cur.fetchone()[0]
+    conn.commit()
+    return hw
+
+def read_watermark(cur):
+    cur.execute("""
+      SELECT last_audit_id, last_updated_at, blocking
+      FROM mdm.vendor_match_watermark WHERE pipeline = %s;
+    """, (PIPELINE,))
+    return cur.fetchone()
+
+def write_watermark(cur, audit_id, updated_at, blocking):
+    cur.execute("""
+      INSERT INTO mdm.vendor_match_watermark (pipeline, last_audit_id, last_updated_at, blocking, updated_at)
+      VALUES (%s, %s, %s, %s, NOW())
+      ON CONFLICT (pipeline) DO UPDATE
+      SET last_audit_id = EXCLUDED.last_audit_id,
+          last_updated_at = EXCLUDED.last_updated_at,
+          blocking = EXCLUDED.blocking,
+          updated_at = NOW();
+    """, (PIPELINE, audit_id, updated_at, blocking))
+
+def changed_vendor_ids(cur, wm, hw):
+    last_audit_id, last_updated_at, _ = wm
+    if MATCH_WATERMARK == "audit":
+        # Inserts, updates and deletes since the watermark (deletes only drop index entries)
+        cur.execute("""
+          SELECT DISTINCT COALESCE(new_row->>'vendor_id', old_row->>'vendor_id')::int
+          FROM mdm.dim_vendor_audit
+          WHERE audit_id > %s AND audit_id <= %s;
+        """, (last_audit_id, hw[0]))
+    else:
+        cur.execute("""
+          SELECT vendor_id FROM mdm.dim_vendor
+          WHERE (%s::timestamptz IS NULL OR updated_at > %s) AND updated_at <= %s;
+        """, (last_updated_at, last_updated_at, hw[1]))
+    return [r[0] for r in cur.fetchall()]
+
+def run_full(conn, config):
+    methods = parse_methods(MATCH_BLOCKING)
+    hw = high_water(conn)
+    rows = fetch_vendors(conn, config)
+
+    # Blocked candidate generation on the primary field, then every configured field is
+    # scored per pair and combined with the YAML weights
+    matches, stats = find_matches(
+        config,
+        columns_of(rows, config),
+        blocking=methods,
+        workers=MATCH_WORKERS,
+        max_block_size=MAX_BLOCK_SIZE,
+    )
+    print(f"Matching stats: {stats}")
 
+    candidates = [queue_row(rows[m.left], rows[m.right], m, config) for m in matches]
+    print(f"Found {len(candidates)} candidates with conf >= {config.review_threshold}")
+
+    with conn.cursor() as cur:
         if candidates:
-            with conn.cursor() as cur:
-                # Avoid duplicates by clearing OPEN items first (optional). Keep simple:
-                insert_sql = """
-                INSERT INTO mdm.vendor_review_queue
-                  (left_vendor_id, right_vendor_id, confidence, recommendation, rationale, created_by)
-                VALUES %s;
-                """
-                execute_values(cur, insert_sql, candidates, page_size=500)
+            upsert_candidates(cur, candidates, reopen_changed=False)
+        # Persist the blocking index + watermark so the next run can be incremental
+        cur.execute("TRUNCATE mdm.vendor_block_index;")
+        execute_values(cur, "INSERT INTO mdm.vendor_block_index (block_key, vendor_id) VALUES %s;",
+                       index_rows(rows, methods, config), page_size=5000)
+        write_watermark(cur, *hw, blocking_spec(config))
+    conn.commit()
+    print(f"Upserted {len(candidates)} review candidates; blocking index rebuilt for {len(rows)} vendors")
+
+def run_incremental(conn, config):
+    methods = parse_methods(MATCH_BLOCKING)
+    with conn.cursor() as cur:
+        wm = read_watermark(cur)
+        if wm is None or wm[2] != blocking_spec(config):
+            print("No watermark / blocking index for these methods yet; bootstrapping with a full run")
+            conn.rollback()
+            return run_full(conn, config)
+
+        hw = high_water(conn)
+        changed = changed_vendor_ids(cur, wm, hw)
+        if not changed:
+            print("No vendor changes since the last run")
+            write_watermark(cur, *hw, blocking_spec(config))
             conn.commit()
-            print("Inserted review candidates into mdm.vendor_review_queue")
+            return
+
+        rows = fetch_vendors(conn, config, changed)
+
+        # Refresh the index for changed vendors (deleted and merged-away vendors drop out);
+        # merges change the lifecycle/crosswalk, not dim_vendor, so purge those every run
+        cur.execute("DELETE FROM mdm.vendor_block_index WHERE vendor_id = ANY(%s);", (changed,))
+        cur.execute("DELETE FROM mdm.vendor_block_index WHERE vendor_id IN (" + RETIRED_VENDORS + ");")
+        keyed = index_rows(rows, methods, config)
+        if keyed:
+            execute_values(cur, "INSERT INTO mdm.vendor_block_index (block_key, vendor_id) VALUES %s;",
+                           keyed, page_size=5000)
+
+        # Everyone sharing a usable (not oversized) block with a changed vendor
+        cur.execute("""
+          WITH usable AS (
+            SELECT block_key FROM mdm.vendor_block_index
+            WHERE block_key = ANY(%s)
+            GROUP BY block_key
+            HAVING COUNT(*) <= %s OR block_key = 'all'
+          )
+          SELECT bi.block_key, bi.vendor_id
+          FROM mdm.vendor_block_index bi
+          JOIN usable u ON u.block_key = bi.block_key;
+        """, (sorted({k for k, _ in keyed}), MAX_BLOCK_SIZE))
+        members = {}
+        for key, vid in cur.fetchall():
+            members.setdefault(key, set()).add(vid)
+        master = {r["vendor_id"]: r for r in fetch_vendors(conn, config, set().union(*members.values()))}
 
+        keys_by_vendor = {}
+        for key, vid in keyed:
+            keys_by_vendor.setdefault(vid, set()).add(key)
+
+        found, compared = {}, 0
+        for r in rows:
+            cand_ids = sorted(set().union(*(members.get(k, ()) for k in keys_by_vendor.get(r["vendor_id"], ())))
+                              - {r["vendor_id"]})
+            cands = [master[c] for c in cand_ids if c in master]
+            compared += len(cands)
+            if not cands:
+                continue
+            for m in match_records_against(config, columns_of([r], config), columns_of(cands, config)):
+                row = queue_row(r, cands[m.right], m, config)
+                found[(row[0], row[1])] = row
+        candidates = list(found.values())
+        print(f"Changed vendors: {len(changed)}; comparisons: {compared}; "
+              f"found {len(candidates)} candidates with conf >= {config.review_threshold}")
+
+        # A changed vendor re-opens review of decided pairs whose matched attributes changed
+        if candidates:
+            upsert_candidates(cur, candidates, reopen_changed=True)
+        write_watermark(cur, *hw, blocking_spec(config))
+    conn.commit()
+    print(f"Upserted {len(candidates)} review candidates into mdm.vendor_review_queue")
+
+def main():
+    config = load_match_config(RULES_PATH)
+
+    conn = connect()
+    try:
+        if MATCH_MODE == "incremental":
+            run_incremental(conn, config)
+        elif MATCH_MODE == "full":
+            run_full(conn, config)
+        else:
+            raise SystemExit(f"Unknown MATCH_MODE={MATCH_MODE!r} (expected full|incremental)")
     finally:
         conn.close()
 
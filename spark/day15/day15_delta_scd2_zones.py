@@ -1,7 +1,7 @@
 import os
 from datetime import datetime, timezone
 from pyspark.sql import SparkSession
-from pyspark.sql.functions import col, lit, sha2, concat_ws, current_timestamp
+from pyspark.sql.functions import coalesce, col, lit, sha2, concat_ws, current_timestamp
 from delta import configure_spark_with_delta_pip
 from delta.tables import DeltaTable
 
@@ -9,6 +9,16 @@ ZONES_CSV = os.getenv("ZONES_CSV", "taxi_zone_lookup.csv")
 DELTA_PATH = os.getenv("DELTA_PATH", "tmp/delta_zone_scd2")
 RUN_ID = os.getenv("RUN_ID", datetime.now(timezone.utc).strftime("%Y%m%d_%H%M%S"))
 
+# two_step     = MERGE to expire changed rows, then append new versions (two commits)
+# single_merge = staged-union "mergeKey" MERGE: expire + insert in one atomic commit
+SCD2_MODE = os.getenv("SCD2_MODE", "two_step")
+# Layout (single_merge): partition by is_current at creation so the current-row scan and
+# the MERGE only touch the current partition; Z-order current files on location_id after
+# each run; collect file stats on the keys used for data skipping
+PARTITION_BY_CURRENT = os.getenv("SCD2_PARTITION_BY_CURRENT", "0") == "1"
+ZORDER = os.getenv("SCD2_ZORDER", "0") == "1"
+STATS_COLUMNS = os.getenv("SCD2_STATS_COLUMNS", "location_id,is_current,attr_hash")
+
 def spark_session():
     builder = (
         SparkSession.builder
@@ -43,12 +53,101 @@ def main():
          .withColumn("effective_to", lit(None).cast("timestamp")) \
          .withColumn("is_current", lit(True))
 
-        init.write.format("delta").mode("overwrite").save(DELTA_PATH)
+        writer = init.write.format("delta").mode("overwrite")
+        if SCD2_MODE == "single_merge" and PARTITION_BY_CURRENT:
+            writer = writer.partitionBy("is_current")
+        writer.save(DELTA_PATH)
+        if SCD2_MODE == "single_merge":
+            set_stats_columns(spark)
         print(f"Created Delta SCD2 table at {DELTA_PATH}")
         spark.stop()
         return
 
     dt = DeltaTable.forPath(spark, DELTA_PATH)
+    if SCD2_MODE == "single_merge":
+        apply_single_merge(spark, dt, incoming)
+    elif SCD2_MODE == "two_step":
+        apply_two_step(dt, incoming)
+    else:
+        raise SystemExit(f"Unknown SCD2_MODE={SCD2_MODE!r} (expected two_step|single_merge)")
+
+    # Show time travel versions
+    hist = spark.sql(f"DESCRIBE HISTORY delta.`{DELTA_PATH}`")
+    hist.show(truncate=False)
+
+    spark.stop()
+
+def set_stats_columns(spark):
+    # Data skipping: min/max stats only on the columns MERGE and current-row reads filter on
+    if STATS_COLUMNS:
+        spark.sql(f"ALTER TABLE delta.`{DELTA_PATH}` "
+                  f"SET TBLPROPERTIES ('delta.dataSkippingStatsColumns' = '{STATS_COLUMNS}')")
+
+def is_partitioned_by_current(spark):
+    detail = spark.sql(f"DESCRIBE DETAIL delta.`{DELTA_PATH}`").select("partitionColumns").first()
+    return "is_current" in (detail[0] or [])
+
+def apply_single_merge(spark, dt, incoming):
+    # One timestamp for the expire and the insert: current_timestamp() is fixed per query
+    # (a lit() of a naive datetime would be read in the driver's local time zone)
+    now = current_timestamp()
+    partitioned = is_partitioned_by_current(spark)
+    if PARTITION_BY_CURRENT and not partitioned:
+        print("SCD2_PARTITION_BY_CURRENT=1 only applies when the table is created; existing layout kept")
+
+    # Only the current partition / files with is_current stats are read
+    current_df = dt.toDF().filter(col("is_current") == True).select("location_id", "attr_hash", "version_number")
+
+    changes = incoming.alias("i").join(current_df.alias("c"), on="location_id", how="left") \
+        .filter(col("c.location_id").isNull() | (col("i.attr_hash") != col("c.attr_hash"))) \
+        .select(
+            col("location_id"),
+            col("i.borough").alias("borough"),
+            col("i.zone").alias("zone"),
+            col("i.service_zone").alias("service_zone"),
+            col("i.attr_hash").alias("attr_hash"),
+            col("i.change_batch_id").alias("change_batch_id"),
+            coalesce(col("c.version_number") + lit(1), lit(1)).cast("int").alias("version_number"),
+            col("c.location_id").isNotNull().alias("is_update"),
+        )
+
+    # mergeKey = location_id  -> matches the current row, which gets expired
+    #                            (new keys don't match and are inserted as version 1)
+    # mergeKey = NULL         -> never matches: inserts the new version of a changed key
+    staged = changes.withColumn("merge_key", col("location_id")).unionByName(
+        changes.filter(col("is_update")).withColumn("merge_key", lit(None).cast("int"))
+    )
+
+    (
+        dt.alias("t").merge(staged.alias("s"), "t.is_current = true AND t.location_id = s.merge_key")
+        .whenMatchedUpdate(
+            condition="t.attr_hash <> s.attr_hash",
+            set={"is_current": "false", "effective_to": now},
+        )
+        .whenNotMatchedInsert(values={
+            "location_id": "s.location_id",
+            "borough": "s.borough",
+            "zone": "s.zone",
+            "service_zone": "s.service_zone",
+            "attr_hash": "s.attr_hash",
+            "change_batch_id": "s.change_batch_id",
+            "version_number": "s.version_number",
+            "effective_from": now,
+            "effective_to": lit(None).cast("timestamp"),
+            "is_current": "true",
+        })
+        .execute()
+    )
+    print("Applied SCD2 changes in Delta (single MERGE commit).")
+
+    if ZORDER:
+        optimizer = dt.optimize()
+        if partitioned:
+            optimizer = optimizer.where("is_current = true")
+        optimizer.executeZOrderBy("location_id")
+        print("Z-ordered current files by location_id.")
+
+def apply_two_step(dt, incoming):
     current_df = dt.toDF().filter(col("is_current") == True)
 
     # identify changed records
@@ -90,11 +189,5 @@ def main():
     new_rows.write.format("delta").mode("append").save(DELTA_PATH)
     print("Applied SCD2 changes in Delta.")
 
-    # Show time travel versions
-    hist = spark.sql(f"DESCRIBE HISTORY delta.`{DELTA_PATH}`")
-    hist.show(truncate=False)
-
-    spark.stop()
-
 if __name__ == "__main__":
     main()
@@ -0,0 +1,95 @@
+import os
+import sys
+import json
+import time
+import shutil
+from pathlib import Path
+from datetime import datetime
+from pyspark.sql.functions import col, rand, sha2, concat_ws, lit
+
+# Compares the two rollback paths of day15_delta_rollback_restore.py on a synthetic local
+# Delta table of roughly BENCH_GB gigabytes:
+#   v0 = full table, v1 = small update; overwrite-rollback to v0 (v2);
+#   v3 = small update again; RESTORE to v0 (v4)
+# Each rollback is timed and its commit metrics (files/bytes written) taken from history.
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+from day15_delta_rollback_restore import rollback_overwrite, rollback_restore, spark_session
+
+BENCH_PATH = os.getenv("BENCH_DELTA_PATH", "tmp/bench_delta_rollback")
+BENCH_GB = float(os.getenv("BENCH_GB", "10"))
+SAMPLE_ROWS = int(os.getenv("BENCH_SAMPLE_ROWS", "1000000"))
+OUT_JSON = os.getenv("BENCH_OUT", "docs/benchmarks/day15_delta_rollback.json")
+
+def synthetic(spark, rows: int):
+    # Random doubles + a hash string: compresses poorly, so bytes/row is stable
+    return (
+        spark.range(rows)
+        .withColumn("PULocationID", (rand(1) * 265).cast("int"))
+        .withColumn("DOLocationID", (rand(2) * 265).cast("int"))
+        .withColumn("trip_distance", rand(3) * 30)
+        .withColumn("fare_amount", rand(4) * 100)
+        .withColumn("total_amount", rand(5) * 120)
+        .withColumn("trip_key", sha2(concat_ws("|", col("id"), rand(6)), 256))
+    )
+
+def dir_bytes(path: str) -> int:
+    return sum(p.stat().st_size for p in Path(path).rglob("*.parquet"))
+
+def rows_for_target(spark) -> int:
+    sample_path = f"{BENCH_PATH}_sample"
+    synthetic(spark, SAMPLE_ROWS).write.format("delta").mode("overwrite").save(sample_path)
+    per_row = dir_bytes(sample_path) / SAMPLE_ROWS
+    shutil.rmtree(sample_path, ignore_errors=True)
+    return int(BENCH_GB * 1024 ** 3 / per_row)
+
+def small_update(spark):
+    from delta.tables import DeltaTable
+    DeltaTable.forPath(spark, BENCH_PATH).update(
+        condition=col("id") < 1000, set={"fare_amount": lit(0.0)}
+    )
+
+def last_commit(spark):
+    h = spark.sql(f"DESCRIBE HISTORY delta.`{BENCH_PATH}` LIMIT 1").first()
+    return {"version": h["version"], "operation": h["operation"],
+            "operation_metrics": dict(h["operationMetrics"] or {})}
+
+def timed(label, fn):
+    t0 = time.time()
+    fn()
+    return {"path": label, "seconds": round(time.time() - t0, 2)}
+
+def main():
+    spark = spark_session()
+    Path(OUT_JSON).parent.mkdir(parents=True, exist_ok=True)
+    shutil.rmtree(BENCH_PATH, ignore_errors=True)
+
+    rows = rows_for_target(spark)
+    t0 = time.time()
+    synthetic(spark, rows).write.format("delta").save(BENCH_PATH)
+    build_s = round(time.time() - t0, 2)
+    size = dir_bytes(BENCH_PATH)
+    print(f"Built {rows:,} rows / {size / 1024 ** 3:.2f} GB in {build_s}s")
+
+    results = []
+    small_update(spark)
+    r = timed("overwrite", lambda: rollback_overwrite(spark, BENCH_PATH, 0))
+    results.append({**r, **last_commit(spark)})
+
+    small_update(spark)
+    r = timed("restore", lambda: rollback_restore(spark, BENCH_PATH, 0))
+    results.append({**r, **last_commit(spark)})
+
+    report = {
+        "generated_utc": datetime.utcnow().isoformat() + "Z",
+        "table": {"path": BENCH_PATH, "rows": rows, "bytes": size, "build_seconds": build_s},
+        "results": results,
+    }
+    Path(OUT_JSON).write_text(json.dumps(report, indent=2, default=str), encoding="utf-8")
+    for r in results:
+        print(f"{r['path']:>10}: {r['seconds']}s ({r['operation']} v{r['version']})")
+    print(f"Wrote benchmark report: {OUT_JSON}")
+    spark.stop()
+
+if __name__ == "__main__":
+    main()
@@ -1,9 +1,18 @@
 import os
 from pyspark.sql import SparkSession
 from delta import configure_spark_with_delta_pip
+from delta.tables import DeltaTable
 
 DELTA_PATH = os.getenv("DELTA_PATH", "tmp/delta_zone_scd2")
 TARGET_VERSION = int(os.getenv("TARGET_VERSION", "0"))
+# Optional: restore to a point in time instead of a version (e.g. "2025-09-01 00:00:00")
+TARGET_TIMESTAMP = os.getenv("TARGET_TIMESTAMP")
+
+# overwrite = read the old version and rewrite every row as a new version (copies all data)
+# restore   = RESTORE: a metadata-only commit that re-adds the old version's files and
+#             removes the newer ones; cost scales with log entries, not data size.
+#             Fails if the old files were already vacuumed.
+RESTORE_MODE = os.getenv("RESTORE_MODE", "overwrite")
 
 def spark_session():
     builder = (
@@ -14,16 +23,34 @@ def spark_session():
     )
     return configure_spark_with_delta_pip(builder).getOrCreate()
 
-def main():
-    spark = spark_session()
-
+def rollback_overwrite(spark, path: str, version: int):
     # Read an older version
-    old = spark.read.format("delta").option("versionAsOf", TARGET_VERSION).load(DELTA_PATH)
-    print(f"Loaded version {TARGET_VERSION} rowcount={old.count()}")
+    old = spark.read.format("delta").option("versionAsOf", version).load(path)
+    print(f"Loaded version {version} rowcount={old.count()}")
 
     # Restore by overwriting current table with that snapshot (simple rollback strategy)
-    old.write.format("delta").mode("overwrite").option("overwriteSchema", "true").save(DELTA_PATH)
-    print(f"Rolled back Delta table by overwriting with version {TARGET_VERSION}")
+    old.write.format("delta").mode("overwrite").option("overwriteSchema", "true").save(path)
+    print(f"Rolled back Delta table by overwriting with version {version}")
+
+def rollback_restore(spark, path: str, version: int, timestamp: str = None):
+    dt = DeltaTable.forPath(spark, path)
+    metrics = dt.restoreToTimestamp(timestamp) if timestamp else dt.restoreToVersion(version)
+    m = metrics.first().asDict()
+    target = f"timestamp {timestamp}" if timestamp else f"version {version}"
+    print(f"Restored Delta table to {target}: "
+          f"{m.get('num_restored_file')} files re-added, {m.get('num_removed_file')} files removed, "
+          f"{m.get('num_of_files_after_restore')} files / {m.get('table_size_after_restore')} bytes after restore")
+    return m
+
+def main():
+    spark = spark_session()
+
+    if RESTORE_MODE == "restore":
+        rollback_restore(spark, DELTA_PATH, TARGET_VERSION, TARGET_TIMESTAMP)
+    elif RESTORE_MODE == "overwrite":
+        rollback_overwrite(spark, DELTA_PATH, TARGET_VERSION)
+    else:
+        raise SystemExit(f"Unknown RESTORE_MODE={RESTORE_MODE!r} (expected overwrite|restore)")
 
     spark.stop()
 
@@ -0,0 +1,84 @@
+-- Monthly range-partition helpers for tables partitioned on tpep_pickup_datetime
+-- (staging.yellow_trips from sql/schema.sql, analytics.curated_yellow_trips from 002).
+-- Idempotent: runs first in the SQL workflow and is included by sql/schema.sql.
+--   staging.ensure_month_partition(parent, month)   create/attach <parent>_yYYYYmMM
+--   staging.detach_month_partition(parent, month)   retire a month (metadata only)
+CREATE SCHEMA IF NOT EXISTS staging;
+
+-- Creates <parent>_yYYYYmMM for the month containing p_month (idempotent). Rows of that
+-- month already sitting in the DEFAULT partition are moved into the new table first,
+-- otherwise attaching it would fail.
+CREATE OR REPLACE FUNCTION staging.ensure_month_partition(p_parent REGCLASS, p_month DATE)
+RETURNS TEXT
+LANGUAGE plpgsql
+AS $$
+DECLARE
+  v_lo TIMESTAMP := date_trunc('month', p_month)::timestamp;
+  v_hi TIMESTAMP := date_trunc('month', p_month)::timestamp + INTERVAL '1 month';
+  v_schema TEXT;
+  v_part TEXT;
+  v_default REGCLASS;
+BEGIN
+  SELECT n.nspname, c.relname || to_char(v_lo, '"_y"YYYY"m"MM')
+  INTO v_schema, v_part
+  FROM pg_class c JOIN pg_namespace n ON n.oid = c.relnamespace
+  WHERE c.oid = p_parent;
+
+  IF to_regclass(format('%I.%I', v_schema, v_part)) IS NOT NULL THEN
+    RETURN v_part;
+  END IF;
+
+  -- concurrent loaders asking for the same month: one creates, the others re-check
+  PERFORM pg_advisory_xact_lock(p_parent::oid::bigint);
+  IF to_regclass(format('%I.%I', v_schema, v_part)) IS NOT NULL THEN
+    RETURN v_part;
+  END IF;
+
+  SELECT i.inhrelid::regclass INTO v_default
+  FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid
+  WHERE i.inhparent = p_parent AND pg_get_expr(c.relpartbound, c.oid) = 'DEFAULT';
+
+  IF v_default IS NULL THEN
+    EXECUTE format('CREATE TABLE %I.%I PARTITION OF %s FOR VALUES FROM (%L) TO (%L)',
+                   v_schema, v_part, p_parent, v_lo, v_hi);
+  ELSE
+    -- ATTACH needs every CHECK constraint of the parent on the new table
+    EXECUTE format('CREATE TABLE %I.%I (LIKE %s INCLUDING DEFAULTS INCLUDING CONSTRAINTS)',
+                   v_schema, v_part, p_parent);
+    EXECUTE format('WITH moved AS (DELETE FROM %s WHERE tpep_pickup_datetime >= %L AND tpep_pickup_datetime < %L RETURNING *) '
+                   'INSERT INTO %I.%I SELECT * FROM moved',
+                   v_default, v_lo, v_hi, v_schema, v_part);
+    -- A CHECK matching the bound lets ATTACH skip its validation scan (under lock);
+    -- it is redundant once attached, so it is dropped again
+    EXECUTE format('ALTER TABLE %I.%I ADD CONSTRAINT %I CHECK (tpep_pickup_datetime IS NOT NULL '
+                   'AND tpep_pickup_datetime >= %L AND tpep_pickup_datetime < %L)',
+                   v_schema, v_part, v_part || '_bound', v_lo, v_hi);
+    EXECUTE format('ALTER TABLE %s ATTACH PARTITION %I.%I FOR VALUES FROM (%L) TO (%L)',
+                   p_parent, v_schema, v_part, v_lo, v_hi);
+    EXECUTE format('ALTER TABLE %I.%I DROP CONSTRAINT %I', v_schema, v_part, v_part || '_bound');
+  END IF;
+
+  RAISE NOTICE 'created partition %.%', v_schema, v_part;
+  RETURN v_part;
+END $$;
+
+-- Detaches a month (metadata only); the table stays for archiving, DROP it when done
+CREATE OR REPLACE FUNCTION staging.detach_month_partition(p_parent REGCLASS, p_month DATE)
+RETURNS TEXT
+LANGUAGE plpgsql
+AS $$
+DECLARE
+  v_schema TEXT;
+  v_part TEXT;
+BEGIN
+  SELECT n.nspname, c.relname || to_char(date_trunc('month', p_month), '"_y"YYYY"m"MM')
+  INTO v_schema, v_part
+  FROM pg_class c JOIN pg_namespace n ON n.oid = c.relnamespace
+  WHERE c.oid = p_parent;
+
+  IF to_regclass(format('%I.%I', v_schema, v_part)) IS NULL THEN
+    RETURN NULL;
+  END IF;
+  EXECUTE format('ALTER TABLE %s DETACH PARTITION %I.%I', p_parent, v_schema, v_part);
+  RETURN v_part;
+END $$;
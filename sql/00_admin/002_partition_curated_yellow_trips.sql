@@ -0,0 +1,53 @@
+-- Monthly range partitioning of analytics.curated_yellow_trips on tpep_pickup_datetime
+-- (same layout as staging.yellow_trips in sql/schema.sql; needs staging.ensure_month_partition
+-- from sql/00_admin/000_month_partition_functions.sql).
+--   first run:  heap table -> partitioned table with one partition per month present + DEFAULT
+--   every run:  rows that landed in the DEFAULT partition get their month partition
+-- Idempotent; runs at the start of scripts/day12_run_sql_workflow.py.
+DO $$
+DECLARE
+  v_kind "char";
+  r RECORD;
+BEGIN
+  SELECT relkind INTO v_kind FROM pg_class WHERE oid = to_regclass('analytics.curated_yellow_trips');
+  IF v_kind IS NULL THEN
+    RAISE NOTICE 'analytics.curated_yellow_trips does not exist; nothing to partition';
+    RETURN;
+  END IF;
+
+  IF v_kind <> 'p' THEN
+    ALTER TABLE analytics.curated_yellow_trips RENAME TO curated_yellow_trips_heap;
+    CREATE TABLE analytics.curated_yellow_trips
+      (LIKE analytics.curated_yellow_trips_heap INCLUDING DEFAULTS INCLUDING CONSTRAINTS)
+      PARTITION BY RANGE (tpep_pickup_datetime);
+    CREATE TABLE analytics.curated_yellow_trips_default
+      PARTITION OF analytics.curated_yellow_trips DEFAULT;
+
+    FOR r IN
+      SELECT DISTINCT date_trunc('month', tpep_pickup_datetime)::date AS m
+      FROM analytics.curated_yellow_trips_heap
+      WHERE tpep_pickup_datetime IS NOT NULL
+      ORDER BY 1
+    LOOP
+      PERFORM staging.ensure_month_partition('analytics.curated_yellow_trips', r.m);
+    END LOOP;
+
+    INSERT INTO analytics.curated_yellow_trips SELECT * FROM analytics.curated_yellow_trips_heap;
+    -- fails (and rolls the conversion back) if views still depend on the heap table
+    DROP TABLE analytics.curated_yellow_trips_heap;
+    RAISE NOTICE 'analytics.curated_yellow_trips converted to monthly partitions';
+  END IF;
+
+  -- New loads that hit no month partition yet: give them one (moves the rows out of DEFAULT)
+  FOR r IN
+    SELECT DISTINCT date_trunc('month', tpep_pickup_datetime)::date AS m
+    FROM analytics.curated_yellow_trips_default
+    WHERE tpep_pickup_datetime IS NOT NULL
+  LOOP
+    PERFORM staging.ensure_month_partition('analytics.curated_yellow_trips', r.m);
+  END LOOP;
+
+  -- Pickup times are append-ordered: BRIN keeps range scans cheap at a few pages per partition
+  CREATE INDEX IF NOT EXISTS brin_curated_yellow_trips_pickup
+    ON analytics.curated_yellow_trips USING brin (tpep_pickup_datetime);
+END $$;
@@ -0,0 +1,294 @@
+-- Materialized view refresh subsystem
+--   analytics.mv_refresh_config  unique key per MV (needed for REFRESH ... CONCURRENTLY), enable flag
+--   analytics.mv_refresh_log     one row per refresh/skip with source signature and duration
+--   analytics.mv_refresh_plan()  MVs with their dependency level (0 = only base tables);
+--                                MVs on the same level are independent and can refresh in parallel
+--   analytics.refresh_mv()       refresh one MV: skipped when its sources are unchanged since the
+--                                last logged refresh, CONCURRENTLY once populated and uniquely indexed
+--   CALL analytics.refresh_materialized_views()   all of them in dependency order (sql/20_views/021)
+-- Parallel driver: scripts/day12_refresh_materialized_views.py (one level at a time, MVs of a
+-- level on separate connections).
+-- Change detection:
+--   analytics.table_change_marker   per-table change sequence, bumped by the writer in the same
+--                                   transaction via analytics.mark_table_changed() (010, 011 and
+--                                   refresh_mv() itself do); committed = visible, nothing lost
+--   sources without a marker fall back to the cumulative table statistics, which other
+--   sessions report late and which are lost on crash / pg_stat_reset(); whenever they cannot
+--   be trusted (track_counts off, reset or restart since the last refresh, no stats row) the
+--   signature is NULL and the MV is refreshed
+-- Anything else that writes an MV source should call mark_table_changed() too.
+
+CREATE TABLE IF NOT EXISTS analytics.mv_refresh_config (
+  mv_name TEXT PRIMARY KEY,               -- schema-qualified
+  unique_columns TEXT[] NOT NULL,
+  enabled BOOLEAN NOT NULL DEFAULT TRUE
+);
+
+INSERT INTO analytics.mv_refresh_config(mv_name, unique_columns)
+VALUES ('analytics.mv_revenue_by_borough_month', ARRAY['month','pu_borough'])
+ON CONFLICT (mv_name) DO NOTHING;
+
+CREATE TABLE IF NOT EXISTS analytics.mv_refresh_log (
+  log_id BIGSERIAL PRIMARY KEY,
+  mv_name TEXT NOT NULL,
+  run_id TEXT,
+  status TEXT NOT NULL CHECK (status IN ('REFRESHED','SKIPPED')),
+  refresh_mode TEXT,                      -- CONCURRENTLY | FULL (NULL when skipped)
+  source_signature TEXT,
+  started_at TIMESTAMPTZ NOT NULL,
+  finished_at TIMESTAMPTZ NOT NULL,
+  duration_ms NUMERIC NOT NULL
+);
+
+CREATE INDEX IF NOT EXISTS ix_mv_refresh_log_mv ON analytics.mv_refresh_log(mv_name, log_id DESC);
+
+CREATE OR REPLACE FUNCTION analytics.mv_qualified_name(p_mv REGCLASS)
+RETURNS TEXT
+LANGUAGE sql STABLE
+AS $$
+  SELECT format('%I.%I', n.nspname, c.relname)
+  FROM pg_class c JOIN pg_namespace n ON n.oid = c.relnamespace
+  WHERE c.oid = p_mv;
+$$;
+
+-- Tables/MVs an MV reads, following plain views down to what they read
+CREATE OR REPLACE FUNCTION analytics.mv_sources(p_mv REGCLASS)
+RETURNS TABLE(source REGCLASS, relkind "char")
+LANGUAGE sql STABLE
+AS $$
+  WITH RECURSIVE deps(relid) AS (
+    SELECT d.refobjid
+    FROM pg_rewrite r
+    JOIN pg_depend d ON d.classid = 'pg_rewrite'::regclass AND d.objid = r.oid
+                    AND d.refclassid = 'pg_class'::regclass
+    WHERE r.ev_class = p_mv AND d.refobjid <> p_mv
+    UNION
+    SELECT d.refobjid
+    FROM deps
+    JOIN pg_class v ON v.oid = deps.relid AND v.relkind = 'v'
+    JOIN pg_rewrite r ON r.ev_class = v.oid
+    JOIN pg_depend d ON d.classid = 'pg_rewrite'::regclass AND d.objid = r.oid
+                    AND d.refclassid = 'pg_class'::regclass
+    WHERE d.refobjid <> v.oid
+  )
+  SELECT c.oid::regclass, c.relkind
+  FROM deps JOIN pg_class c ON c.oid = deps.relid
+  WHERE c.relkind IN ('r', 'p', 'm', 'f');
+$$;
+
+CREATE TABLE IF NOT EXISTS analytics.table_change_marker (
+  table_name TEXT PRIMARY KEY,            -- schema-qualified; partitioned tables by their parent
+  change_seq BIGINT NOT NULL,
+  changed_at TIMESTAMPTZ NOT NULL
+);
+
+-- Call in the transaction that writes p_table; the row lock is held to commit, so keep it to
+-- once per load/transform rather than once per batch
+CREATE OR REPLACE FUNCTION analytics.mark_table_changed(p_table REGCLASS)
+RETURNS VOID
+LANGUAGE sql
+AS $$
+  INSERT INTO analytics.table_change_marker(table_name, change_seq, changed_at)
+  VALUES (analytics.mv_qualified_name(p_table), 1, clock_timestamp())
+  ON CONFLICT (table_name) DO UPDATE
+  SET change_seq = analytics.table_change_marker.change_seq + 1,
+      changed_at = EXCLUDED.changed_at;
+$$;
+
+-- Changes whenever a source is written to. Marked sources contribute their change sequence.
+-- Unmarked ones contribute, per leaf table (partitions included), the relfilenode (TRUNCATE /
+-- rewrite) plus cumulative insert/update/delete counters, including the current transaction's
+-- own not-yet-reported writes; NULL (= always refresh) when those statistics are unreliable.
+CREATE OR REPLACE FUNCTION analytics.mv_source_signature(p_mv REGCLASS)
+RETURNS TEXT
+LANGUAGE plpgsql STABLE
+AS $$
+DECLARE
+  v_last TIMESTAMPTZ;
+  v_marked TEXT;
+  v_stats TEXT;
+  v_missing BOOLEAN;
+BEGIN
+  SELECT string_agg(format('%s:%s', m.table_name, m.change_seq), ',' ORDER BY m.table_name)
+  INTO v_marked
+  FROM analytics.mv_sources(p_mv) s
+  JOIN analytics.table_change_marker m ON m.table_name = analytics.mv_qualified_name(s.source);
+
+  WITH unmarked AS (
+    SELECT s.source, s.relkind
+    FROM analytics.mv_sources(p_mv) s
+    WHERE NOT EXISTS (SELECT 1 FROM analytics.table_change_marker m
+                      WHERE m.table_name = analytics.mv_qualified_name(s.source))
+  ),
+  leaves AS (
+    SELECT u.source AS relid FROM unmarked u WHERE u.relkind <> 'p'
+    UNION
+    SELECT t.relid FROM unmarked u, pg_partition_tree(u.source) t
+    WHERE u.relkind = 'p' AND t.isleaf
+  )
+  SELECT string_agg(
+           format('%s:%s:%s:%s:%s', l.relid::oid, c.relfilenode,
+                  COALESCE(st.n_tup_ins, 0) + pg_stat_get_xact_tuples_inserted(l.relid),
+                  COALESCE(st.n_tup_upd, 0) + pg_stat_get_xact_tuples_updated(l.relid),
+                  COALESCE(st.n_tup_del, 0) + pg_stat_get_xact_tuples_deleted(l.relid)),
+           ',' ORDER BY l.relid::oid),
+         bool_or(st.relid IS NULL)
+  INTO v_stats, v_missing
+  FROM leaves l
+  JOIN pg_class c ON c.oid = l.relid
+  LEFT JOIN pg_stat_all_tables st ON st.relid = l.relid;
+
+  IF v_stats IS NOT NULL THEN
+    SELECT MAX(started_at) INTO v_last FROM analytics.mv_refresh_log
+    WHERE mv_name = analytics.mv_qualified_name(p_mv);
+    IF v_missing
+       OR NOT current_setting('track_counts')::boolean
+       OR v_last IS NULL
+       OR pg_postmaster_start_time() > v_last
+       OR COALESCE((SELECT stats_reset FROM pg_stat_database WHERE datname = current_database()),
+                   '-infinity') > v_last THEN
+      RETURN NULL;
+    END IF;
+  END IF;
+
+  RETURN md5(COALESCE(v_marked, '') || '|' || COALESCE(v_stats, ''));
+END $$;
+
+-- Creates the unique index REFRESH ... CONCURRENTLY needs (from mv_refresh_config) when the
+-- MV has none; returns whether the MV has a usable unique index
+CREATE OR REPLACE FUNCTION analytics.ensure_mv_unique_index(p_mv REGCLASS)
+RETURNS BOOLEAN
+LANGUAGE plpgsql
+AS $$
+DECLARE
+  v_cols TEXT[];
+BEGIN
+  IF EXISTS (
+    SELECT 1 FROM pg_index i
+    WHERE i.indrelid = p_mv AND i.indisunique AND i.indisvalid
+      AND i.indpred IS NULL AND i.indexprs IS NULL
+  ) THEN
+    RETURN TRUE;
+  END IF;
+
+  SELECT unique_columns INTO v_cols
+  FROM analytics.mv_refresh_config
+  WHERE to_regclass(mv_name) = p_mv;
+  IF v_cols IS NULL THEN
+    RETURN FALSE;
+  END IF;
+
+  EXECUTE format('CREATE UNIQUE INDEX IF NOT EXISTS %I ON %s (%s)',
+                 (SELECT relname || '_refresh_ux' FROM pg_class WHERE oid = p_mv),
+                 p_mv,
+                 (SELECT string_agg(quote_ident(c), ', ') FROM unnest(v_cols) c));
+  RETURN TRUE;
+END $$;
+
+-- Refresh order: level = longest chain of MVs below it
+CREATE OR REPLACE FUNCTION analytics.mv_refresh_plan(p_schema TEXT DEFAULT 'analytics')
+RETURNS TABLE(mv REGCLASS, level INT)
+LANGUAGE sql STABLE
+AS $$
+  WITH RECURSIVE mvs AS (
+    SELECT c.oid
+    FROM pg_class c
+    JOIN pg_namespace n ON n.oid = c.relnamespace
+    LEFT JOIN analytics.mv_refresh_config cfg ON to_regclass(cfg.mv_name) = c.oid
+    WHERE c.relkind = 'm'
+      AND (p_schema IS NULL OR n.nspname = p_schema)
+      AND COALESCE(cfg.enabled, TRUE)
+  ),
+  edges AS (
+    SELECT m.oid AS mv, s.source::oid AS dep
+    FROM mvs m, LATERAL analytics.mv_sources(m.oid::regclass) s
+    WHERE s.relkind = 'm'
+  ),
+  lvl(mv, level) AS (
+    SELECT oid, 0 FROM mvs
+    UNION ALL
+    SELECT e.mv, l.level + 1 FROM lvl l JOIN edges e ON e.dep = l.mv
+  )
+  SELECT lvl.mv::regclass, MAX(lvl.level)::int
+  FROM lvl JOIN mvs ON mvs.oid = lvl.mv
+  GROUP BY lvl.mv;
+$$;
+
+CREATE OR REPLACE FUNCTION analytics.refresh_mv(p_mv REGCLASS, p_force BOOLEAN DEFAULT FALSE, p_run_id TEXT DEFAULT NULL)
+RETURNS TEXT
+LANGUAGE plpgsql
+AS $$
+DECLARE
+  v_name TEXT := analytics.mv_qualified_name(p_mv);
+  v_sig TEXT := analytics.mv_source_signature(p_mv);
+  v_start TIMESTAMPTZ := clock_timestamp();
+  v_last TEXT;
+  v_populated BOOLEAN;
+  v_status TEXT := 'REFRESHED';
+  v_mode TEXT;
+BEGIN
+  SELECT m.ispopulated INTO v_populated
+  FROM pg_matviews m
+  WHERE format('%I.%I', m.schemaname, m.matviewname) = v_name;
+
+  SELECT l.source_signature INTO v_last
+  FROM analytics.mv_refresh_log l
+  WHERE l.mv_name = v_name
+  ORDER BY l.log_id DESC
+  LIMIT 1;
+
+  -- a NULL signature (unreliable statistics) never matches
+  IF NOT p_force AND v_populated AND v_last = v_sig THEN
+    v_status := 'SKIPPED';
+  ELSIF v_populated AND analytics.ensure_mv_unique_index(p_mv) THEN
+    -- readers keep the old contents while the diff is computed and applied
+    EXECUTE format('REFRESH MATERIALIZED VIEW CONCURRENTLY %s', p_mv);
+    v_mode := 'CONCURRENTLY';
+  ELSE
+    -- first population (CONCURRENTLY needs a populated MV) or no unique key configured
+    EXECUTE format('REFRESH MATERIALIZED VIEW %s', p_mv);
+    PERFORM analytics.ensure_mv_unique_index(p_mv);
+    v_mode := 'FULL';
+  END IF;
+
+  IF v_status = 'REFRESHED' THEN
+    -- MVs built on this one see the change through its marker
+    PERFORM analytics.mark_table_changed(p_mv);
+  END IF;
+
+  INSERT INTO analytics.mv_refresh_log(mv_name, run_id, status, refresh_mode, source_signature,
+                                       started_at, finished_at, duration_ms)
+  VALUES (v_name, p_run_id, v_status, v_mode, v_sig, v_start, clock_timestamp(),
+          round(EXTRACT(EPOCH FROM clock_timestamp() - v_start)::numeric * 1000, 1));
+  RETURN v_status || COALESCE(' ' || v_mode, '');
+END $$;
+
+CREATE OR REPLACE PROCEDURE analytics.refresh_materialized_views(
+  p_force BOOLEAN DEFAULT FALSE,
+  p_schema TEXT DEFAULT 'analytics',
+  p_run_id TEXT DEFAULT NULL
+)
+LANGUAGE plpgsql
+AS $$
+DECLARE
+  r RECORD;
+BEGIN
+  FOR r IN SELECT p.mv, p.level FROM analytics.mv_refresh_plan(p_schema) p ORDER BY p.level, p.mv::text LOOP
+    RAISE NOTICE 'level % %: %', r.level, r.mv, analytics.refresh_mv(r.mv, p_force, p_run_id);
+  END LOOP;
+END $$;
+
+-- Refresh duration trend per MV (last 30 days)
+CREATE OR REPLACE VIEW analytics.vw_mv_refresh_trend AS
+SELECT
+  mv_name,
+  date_trunc('day', started_at)::date AS day,
+  COUNT(*) FILTER (WHERE status = 'REFRESHED') AS refreshes,
+  COUNT(*) FILTER (WHERE status = 'SKIPPED') AS skips,
+  round(AVG(duration_ms) FILTER (WHERE status = 'REFRESHED'), 1) AS avg_refresh_ms,
+  round((percentile_cont(0.95) WITHIN GROUP (ORDER BY duration_ms)
+         FILTER (WHERE status = 'REFRESHED'))::numeric, 1) AS p95_refresh_ms,
+  MAX(duration_ms) FILTER (WHERE status = 'REFRESHED') AS max_refresh_ms
+FROM analytics.mv_refresh_log
+WHERE started_at >= NOW() - INTERVAL '30 days'
+GROUP BY 1, 2;
@@ -11,6 +11,10 @@ CREATE TABLE IF NOT EXISTS analytics.trip_metrics_by_zone_day (
   PRIMARY KEY (trip_date, pu_location_id)
 );
 
+-- curated_yellow_trips is partitioned by pickup month (sql/00_admin/002): aggregate each
+-- partition separately and append the results instead of one big hash over the whole table
+SET enable_partitionwise_aggregate = on;
+
 WITH base AS (
   SELECT
     (tpep_pickup_datetime::date) AS trip_date,
@@ -43,4 +47,7 @@ DO UPDATE SET
   pu_borough = EXCLUDED.pu_borough,
   trip_count = EXCLUDED.trip_count,
   total_revenue = EXCLUDED.total_revenue,
-  avg_trip_distance = EXCLUDED.avg_trip_distance;
\ No newline at end of file
+  avg_trip_distance = EXCLUDED.avg_trip_distance;
+
+-- Change marker for the MV refresh skip check (sql/00_admin/003), same transaction as the upsert
+SELECT analytics.mark_table_changed('analytics.trip_metrics_by_zone_day');
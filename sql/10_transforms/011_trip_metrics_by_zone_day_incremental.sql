@@ -0,0 +1,131 @@
+-- Incremental variant of 010: only the trip_date range touched since the last run is
+-- re-aggregated and upserted, so a daily run costs one day (+ lookback) of trips.
+--   analytics.transform_watermark: high-water pickup date per transform
+--   range = [high water - lookback days, newest pickup date]   (late arrivals within lookback)
+--   future-dated pickups (present in the TLC files) never count as the newest pickup date,
+--   so a bad row cannot push the high-water mark past the real data
+--   no watermark yet -> whole table once (bootstrap)
+--   p_from / p_to    -> explicit backfill range, e.g. after reloading an old month
+-- Driven by TRANSFORM_MODE=incremental in scripts/day12_run_sql_workflow.py and
+-- glue_jobs/day13_run_sql_workflow_glue.py.
+
+-- Same DDL as 010, so either mode can run first
+CREATE TABLE IF NOT EXISTS analytics.trip_metrics_by_zone_day (
+  trip_date DATE NOT NULL,
+  pu_location_id INT NOT NULL,
+  pu_zone TEXT,
+  pu_borough TEXT,
+  trip_count BIGINT NOT NULL,
+  total_revenue NUMERIC NOT NULL,
+  avg_trip_distance NUMERIC,
+  created_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+  created_by TEXT NOT NULL DEFAULT 'sql_transform_v1',
+  PRIMARY KEY (trip_date, pu_location_id)
+);
+
+CREATE TABLE IF NOT EXISTS analytics.transform_watermark (
+  transform_name TEXT PRIMARY KEY,
+  high_water_date DATE,
+  last_from_date DATE,
+  last_to_date DATE,
+  rows_upserted BIGINT,
+  updated_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+);
+
+-- Range scans use partition pruning plus brin_curated_yellow_trips_pickup (sql/00_admin/002);
+-- an earlier btree on the same column only added maintenance cost next to it
+DROP INDEX IF EXISTS analytics.ix_curated_yellow_trips_pickup;
+
+CREATE OR REPLACE PROCEDURE analytics.refresh_trip_metrics_by_zone_day(
+  p_lookback_days INT DEFAULT 2,
+  p_from DATE DEFAULT NULL,
+  p_to DATE DEFAULT NULL
+)
+LANGUAGE plpgsql
+-- the date range prunes to the touched month partitions; aggregate them partition-wise
+SET enable_partitionwise_aggregate = on
+AS $$
+DECLARE
+  v_name CONSTANT TEXT := 'trip_metrics_by_zone_day';
+  v_high DATE;
+  v_max DATE;
+  v_from DATE;
+  v_to DATE;
+  v_rows BIGINT := 0;
+BEGIN
+  INSERT INTO analytics.transform_watermark(transform_name) VALUES (v_name)
+  ON CONFLICT (transform_name) DO NOTHING;
+
+  -- serializes concurrent runs of this transform
+  SELECT high_water_date INTO v_high
+  FROM analytics.transform_watermark
+  WHERE transform_name = v_name
+  FOR UPDATE;
+
+  -- self-heals a high-water mark raised by future-dated rows before the clamp existed
+  -- (not LEAST(): it would turn a missing watermark into today)
+  IF v_high > CURRENT_DATE THEN
+    v_high := CURRENT_DATE;
+  END IF;
+
+  -- newest real pickup date: only the months from the lookback window on are scanned
+  SELECT MAX(tpep_pickup_datetime)::date INTO v_max
+  FROM analytics.curated_yellow_trips
+  WHERE tpep_pickup_datetime >= COALESCE(v_high - GREATEST(p_lookback_days, 0), '-infinity'::date)::timestamp
+    AND tpep_pickup_datetime < (CURRENT_DATE + 1)::timestamp;
+
+  IF p_from IS NOT NULL THEN
+    v_from := p_from;
+    v_to := COALESCE(p_to, v_max);
+  ELSIF v_high IS NULL THEN
+    SELECT MIN(tpep_pickup_datetime)::date INTO v_from FROM analytics.curated_yellow_trips;
+    v_to := v_max;
+  ELSE
+    v_from := v_high - GREATEST(p_lookback_days, 0);
+    v_to := v_max;
+  END IF;
+
+  IF v_from IS NOT NULL AND v_to IS NOT NULL AND v_from <= v_to THEN
+    WITH agg AS (
+      SELECT
+        (tpep_pickup_datetime::date) AS trip_date,
+        pulocationid AS pu_location_id,
+        MAX(pu_zone) AS pu_zone,
+        MAX(pu_borough) AS pu_borough,
+        COUNT(*) AS trip_count,
+        SUM(COALESCE(total_amount,0)) AS total_revenue,
+        AVG(COALESCE(trip_distance,0)) AS avg_trip_distance
+      FROM analytics.curated_yellow_trips
+      -- sargable range on the raw timestamp: prunes to the touched month partitions, BRIN within them
+      WHERE tpep_pickup_datetime >= v_from::timestamp
+        AND tpep_pickup_datetime < (v_to + 1)::timestamp
+      GROUP BY 1,2
+    )
+    INSERT INTO analytics.trip_metrics_by_zone_day (
+      trip_date, pu_location_id, pu_zone, pu_borough, trip_count, total_revenue, avg_trip_distance
+    )
+    SELECT * FROM agg
+    ON CONFLICT (trip_date, pu_location_id)
+    DO UPDATE SET
+      pu_zone = EXCLUDED.pu_zone,
+      pu_borough = EXCLUDED.pu_borough,
+      trip_count = EXCLUDED.trip_count,
+      total_revenue = EXCLUDED.total_revenue,
+      avg_trip_distance = EXCLUDED.avg_trip_distance;
+    GET DIAGNOSTICS v_rows = ROW_COUNT;
+    -- change marker for the MV refresh skip check (sql/00_admin/003)
+    IF v_rows > 0 THEN
+      PERFORM analytics.mark_table_changed('analytics.trip_metrics_by_zone_day');
+    END IF;
+  END IF;
+
+  UPDATE analytics.transform_watermark
+  SET high_water_date = GREATEST(v_high, v_max),   -- both <= today
+      last_from_date = v_from,
+      last_to_date = v_to,
+      rows_upserted = v_rows,
+      updated_at = NOW()
+  WHERE transform_name = v_name;
+
+  RAISE NOTICE '% refreshed % .. %: % (date, zone) rows upserted', v_name, v_from, v_to, v_rows;
+END $$;
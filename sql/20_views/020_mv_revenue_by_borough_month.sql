@@ -9,5 +9,6 @@ WITH m AS (
 )
 SELECT * FROM m;
 
-CREATE INDEX IF NOT EXISTS idx_mv_rev_borough_month
-ON analytics.mv_revenue_by_borough_month(month, pu_borough);
\ No newline at end of file
+-- The (month, pu_borough) key is now a UNIQUE index created from analytics.mv_refresh_config
+-- (sql/00_admin/003) so the view can be refreshed CONCURRENTLY; the old plain index is redundant
+DROP INDEX IF EXISTS analytics.idx_mv_rev_borough_month;
\ No newline at end of file
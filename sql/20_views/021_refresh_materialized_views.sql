@@ -1 +1,7 @@
-REFRESH MATERIALIZED VIEW analytics.mv_revenue_by_borough_month;
+-- Dependency-ordered refresh of the analytics MVs (sql/00_admin/003): skips MVs whose sources
+-- are unchanged since their last logged refresh, refreshes the rest CONCURRENTLY when possible.
+-- Parallel variant: scripts/day12_refresh_materialized_views.py
+-- The MVs are found at run time (dynamic SQL), so the workflow DAG (common/sql_workflow.py)
+-- needs the edge spelled out:
+-- depends: sql/20_views/*.sql
+CALL analytics.refresh_materialized_views();
@@ -0,0 +1,79 @@
+-- Set-based variant of mdm.apply_zone_scd2_from_stage (510): same result, but the whole
+-- stage is diffed against the current rows in one join instead of one row at a time.
+--   1 diff (hash join stage x current, NULL-safe IS DISTINCT FROM)
+--   1 UPDATE expiring changed current rows
+--   1 INSERT of new versions (new keys get version 1)
+--   1 INSERT ... SELECT into the audit log
+-- Driven by scripts/day15_apply_zone_scd2.py (COPY snapshot into stage, then CALL).
+CREATE OR REPLACE PROCEDURE mdm.apply_zone_scd2_from_stage_set(
+  p_changed_by TEXT,
+  p_default_reason TEXT,
+  p_default_source TEXT
+)
+LANGUAGE plpgsql
+AS $$
+DECLARE
+  v_now TIMESTAMPTZ := NOW();
+  v_by TEXT := COALESCE(p_changed_by, 'system');
+  v_new INT;
+  v_changed INT;
+BEGIN
+  DROP TABLE IF EXISTS tmp_zone_scd2_diff;
+  CREATE TEMP TABLE tmp_zone_scd2_diff ON COMMIT DROP AS
+  SELECT
+    s.location_id, s.borough, s.zone, s.service_zone,
+    s.change_reason, s.change_source, s.change_batch_id,
+    c.zone_sk AS current_sk,
+    c.version_number AS current_version
+  FROM mdm.stg_zone_updates s
+  LEFT JOIN mdm.vw_zone_current c ON c.location_id = s.location_id
+  WHERE c.zone_sk IS NULL
+     OR (c.borough, c.zone, c.service_zone) IS DISTINCT FROM (s.borough, s.zone, s.service_zone);
+
+  ANALYZE tmp_zone_scd2_diff;
+
+  -- expire changed current rows
+  UPDATE mdm.dim_zone_scd2 d
+  SET effective_to = v_now,
+      is_current = FALSE
+  FROM tmp_zone_scd2_diff t
+  WHERE d.zone_sk = t.current_sk;
+  GET DIAGNOSTICS v_changed = ROW_COUNT;
+
+  -- insert new current versions
+  INSERT INTO mdm.dim_zone_scd2(
+    location_id, borough, zone, service_zone,
+    version_number, effective_from, effective_to, is_current,
+    created_by, change_reason, change_source, change_batch_id
+  )
+  SELECT
+    t.location_id, t.borough, t.zone, t.service_zone,
+    COALESCE(t.current_version, 0) + 1, v_now, NULL, TRUE,
+    v_by,
+    COALESCE(t.change_reason, p_default_reason),
+    COALESCE(t.change_source, p_default_source),
+    t.change_batch_id
+  FROM tmp_zone_scd2_diff t;
+  GET DIAGNOSTICS v_new = ROW_COUNT;
+
+  INSERT INTO mdm.master_version_audit(domain, natural_key, action, action_by, details)
+  SELECT
+    'zone', t.location_id::text, 'UPSERT', v_by,
+    CASE WHEN t.current_sk IS NULL
+      THEN jsonb_build_object('type','insert_new_key','version',1,'batch',t.change_batch_id)
+      ELSE jsonb_build_object(
+        'type','attribute_change',
+        'from_version', t.current_version,
+        'to_version', t.current_version + 1,
+        'batch', t.change_batch_id
+      )
+    END
+  FROM tmp_zone_scd2_diff t;
+
+  RAISE NOTICE 'zone scd2: % new keys, % changed keys', v_new - v_changed, v_changed;
+
+  -- Clear stage after apply (same as the row-by-row procedure)
+  TRUNCATE TABLE mdm.stg_zone_updates;
+  DROP TABLE IF EXISTS tmp_zone_scd2_diff;
+END;
+$$;
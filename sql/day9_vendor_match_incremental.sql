@@ -0,0 +1,37 @@
+-- Incremental vendor matching (scripts/day9_vendor_dedup_pipeline.py MATCH_MODE=incremental)
+-- Requires sql/day9_mdm_lifecycle_and_cdc.sql (dim_vendor_audit, vendor_review_queue) and
+-- sql/day9_vendor_xref.sql (merged-away vendors are left out of matching and the block index).
+
+-- High-water mark of processed changes per matching pipeline
+CREATE TABLE IF NOT EXISTS mdm.vendor_match_watermark (
+  pipeline TEXT PRIMARY KEY,
+  last_audit_id BIGINT NOT NULL DEFAULT 0,          -- watermark on mdm.dim_vendor_audit
+  last_updated_at TIMESTAMPTZ,                      -- watermark on mdm.dim_vendor.updated_at
+  blocking TEXT NOT NULL,                           -- blocking methods (and MinHash shape) of the index
+  updated_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+);
+
+-- Persisted blocking index: which vendors share a blocking key
+CREATE TABLE IF NOT EXISTS mdm.vendor_block_index (
+  block_key TEXT NOT NULL,
+  vendor_id INT NOT NULL,
+  PRIMARY KEY (block_key, vendor_id)
+);
+
+CREATE INDEX IF NOT EXISTS idx_vendor_block_index_vendor ON mdm.vendor_block_index(vendor_id);
+
+-- Hash of the pair's normalized matched attributes when it was scored. A decided
+-- (APPROVED/REJECTED) pair is only re-queued when the new hash differs; MERGED never is.
+ALTER TABLE mdm.vendor_review_queue ADD COLUMN IF NOT EXISTS match_attr_hash TEXT;
+
+-- One OPEN queue row per unordered vendor pair: collapse existing duplicates first
+DELETE FROM mdm.vendor_review_queue q
+USING mdm.vendor_review_queue d
+WHERE q.status = 'OPEN' AND d.status = 'OPEN'
+  AND LEAST(q.left_vendor_id, q.right_vendor_id) = LEAST(d.left_vendor_id, d.right_vendor_id)
+  AND GREATEST(q.left_vendor_id, q.right_vendor_id) = GREATEST(d.left_vendor_id, d.right_vendor_id)
+  AND q.review_id < d.review_id;
+
+CREATE UNIQUE INDEX IF NOT EXISTS ux_vendor_review_open_pair
+ON mdm.vendor_review_queue (LEAST(left_vendor_id, right_vendor_id), GREATEST(left_vendor_id, right_vendor_id))
+WHERE status = 'OPEN';
@@ -0,0 +1,59 @@
+-- Vendor crosswalk: every retired source vendor_id -> its golden (surviving) vendor_id.
+-- Maintained by scripts/day9_apply_auto_merges.py; read via common/matching/xref.py.
+-- Golden records are not listed: an id missing from the table resolves to itself.
+CREATE TABLE IF NOT EXISTS mdm.vendor_xref (
+  source_vendor_id INT PRIMARY KEY,
+  golden_vendor_id INT NOT NULL,
+  merge_confidence NUMERIC,
+  merged_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+  merged_by TEXT NOT NULL DEFAULT 'system',
+  CHECK (source_vendor_id <> golden_vendor_id)
+);
+
+CREATE INDEX IF NOT EXISTS idx_vendor_xref_golden ON mdm.vendor_xref(golden_vendor_id);
+
+-- Flatten chains (A->B, B->C  =>  A->C, B->C) so every lookup is a single hop.
+-- Returns the number of rows re-pointed.
+CREATE OR REPLACE FUNCTION mdm.fn_flatten_vendor_xref()
+RETURNS INT AS $$
+DECLARE
+  v_rows INT;
+BEGIN
+  WITH RECURSIVE chain AS (
+    SELECT source_vendor_id, golden_vendor_id, 1 AS depth
+    FROM mdm.vendor_xref
+    UNION ALL
+    SELECT c.source_vendor_id, x.golden_vendor_id, c.depth + 1
+    FROM chain c
+    JOIN mdm.vendor_xref x ON x.source_vendor_id = c.golden_vendor_id
+    WHERE c.depth < 64                       -- guards against accidental cycles
+  ),
+  roots AS (
+    SELECT DISTINCT ON (source_vendor_id) source_vendor_id, golden_vendor_id
+    FROM chain
+    ORDER BY source_vendor_id, depth DESC
+  )
+  UPDATE mdm.vendor_xref x
+  SET golden_vendor_id = r.golden_vendor_id
+  FROM roots r
+  WHERE x.source_vendor_id = r.source_vendor_id
+    AND x.golden_vendor_id <> r.golden_vendor_id
+    AND r.golden_vendor_id <> x.source_vendor_id;
+  GET DIAGNOSTICS v_rows = ROW_COUNT;
+  RETURN v_rows;
+END;
+$$ LANGUAGE plpgsql;
+
+-- One-off backfill from merges applied before the crosswalk existed
+INSERT INTO mdm.vendor_xref (source_vendor_id, golden_vendor_id, merged_at, merged_by)
+SELECT l.vendor_id,
+       substring(l.state_reason FROM 'Auto-merged into vendor_id=([0-9]+)')::int,
+       COALESCE(l.approved_at, l.updated_at),
+       l.updated_by
+FROM mdm.vendor_lifecycle l
+WHERE l.lifecycle_state = 'DEPRECATED'
+  AND l.state_reason ~ 'Auto-merged into vendor_id=[0-9]+'
+  AND substring(l.state_reason FROM 'Auto-merged into vendor_id=([0-9]+)')::int <> l.vendor_id
+ON CONFLICT (source_vendor_id) DO NOTHING;
+
+SELECT mdm.fn_flatten_vendor_xref();
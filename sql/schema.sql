@@ -11,6 +11,11 @@ CREATE TABLE staging.taxi_zone_lookup (
 );
 
 DROP TABLE IF EXISTS staging.yellow_trips;
+-- Monthly range partitions on the pickup time: month-scoped loads, DQ checks and
+-- aggregates touch one partition, and old months are detached instead of deleted.
+-- Partitions are created by day3_load_parquet_to_postgres.py through
+-- staging.ensure_month_partition(); rows without a matching month (NULL or
+-- unexpected pickup times) land in the DEFAULT partition.
 CREATE TABLE staging.yellow_trips (
   VendorID INT,
   tpep_pickup_datetime TIMESTAMP,
@@ -32,4 +37,27 @@ CREATE TABLE staging.yellow_trips (
   congestion_surcharge NUMERIC,
   airport_fee NUMERIC,
   cbd_congestion_fee NUMERIC
-);
\ No newline at end of file
+) PARTITION BY RANGE (tpep_pickup_datetime);
+
+CREATE TABLE staging.yellow_trips_default PARTITION OF staging.yellow_trips DEFAULT;
+
+-- Trips arrive roughly in pickup order, so a BRIN index stays tiny and still skips
+-- most blocks for time-range predicates inside a partition
+CREATE INDEX brin_yellow_trips_pickup ON staging.yellow_trips USING brin (tpep_pickup_datetime);
+
+-- staging.ensure_month_partition() / staging.detach_month_partition() live in an idempotent
+-- admin file shared with the SQL workflow (psql: \ir resolves relative to this file)
+\ir 00_admin/000_month_partition_functions.sql
+
+-- Load progress for day3_load_parquet_to_postgres.py (copy/parallel modes).
+-- Reset together with staging.yellow_trips so reruns reload everything.
+DROP TABLE IF EXISTS staging.load_checkpoint;
+CREATE TABLE staging.load_checkpoint (
+  target_table TEXT NOT NULL,
+  source_file TEXT NOT NULL,
+  file_hash TEXT NOT NULL,
+  row_group INT NOT NULL,
+  rows_loaded BIGINT NOT NULL,
+  loaded_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+  PRIMARY KEY (target_table, source_file, file_hash, row_group)
+);